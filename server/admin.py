@@ -1,21 +1,91 @@
 import contextlib
+import hashlib
 
+from cities_light.models import City
 from django.conf import settings
 from django.contrib import admin
 from django.contrib.admin.models import LogEntry
+from django.contrib.admin.views.autocomplete import AutocompleteJsonView
+from django.contrib.admin.widgets import AutocompleteSelect
 from django.contrib.auth.models import Group, Permission
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+from django.core.exceptions import PermissionDenied
+from django.http import JsonResponse
+from django.urls import path
 
 from server.apps.accounts.admin import CustomUserAdmin
+from server.apps.accounts.backends import versione_permessi
 from server.apps.accounts.models import CustomUser
 from server.apps.main.admin import BlogPostAdmin
+from server.apps.main.logic.autocompletamento import indice_autocompletamento
+from server.apps.main.logic.geo import tabella_geo
 from server.apps.main.models import (
     BlogPost,
     CityProxy,
     CountryProxy,
     DummyModel,
+    LocalizzazioneGeo,
     RegionProxy,
 )
+from server.common.admin import PaginazioneKeysetMixin
+from server.common.cache import cache_condivisa
+from server.common.models import StoricoModifica
+
+
+class CittaAutocompleteJsonView(AutocompleteJsonView):
+    """Autocompletamento dei campi città dall'indice in memoria.
+
+    Accetta gli stessi parametri della vista ``autocomplete`` dell'admin
+    (campo di origine, testo, pagina) ma cerca nel trie di
+    ``server.apps.main.logic.autocompletamento``, senza query.
+    """
+
+    def process_request(self, request):
+        """Come l'autocompletamento dell'admin, solo per le città."""
+        term, model_admin, source_field, to_field_name = (
+            super().process_request(request)
+        )
+        if not issubclass(model_admin.model, City):
+            raise PermissionDenied
+        return term, model_admin, source_field, to_field_name
+
+    def has_perm(self, request, obj=None):
+        """Chi può vedere il modello del campo può sceglierne la città."""
+        source_model = self.source_field.model
+        return super().has_perm(request, obj) or (
+            self.admin_site.is_registered(source_model)
+            and self.admin_site.get_model_admin(
+                source_model
+            ).has_view_permission(request)
+        )
+
+    def get(self, request, *args, **kwargs):
+        """Una pagina di città nel formato atteso da select2."""
+        self.term, self.model_admin, self.source_field, to_field_name = (
+            self.process_request(request)
+        )
+        if not self.has_perm(request):
+            raise PermissionDenied
+        try:
+            pagina = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            pagina = 1
+        citta, altre = indice_autocompletamento().cerca(
+            self.term, pagina, self.paginate_by
+        )
+        return JsonResponse({
+            'results': [
+                self.serialize_result(city, to_field_name) for city in citta
+            ],
+            'pagination': {'more': altre},
+        })
+
+
+class CittaAutocompleteSelect(AutocompleteSelect):
+    """Widget di autocompletamento che usa ``CittaAutocompleteJsonView``."""
+
+    url_name = '%s:autocomplete_citta'
 
 
 class CustomAdminSite(admin.AdminSite):
@@ -25,26 +95,66 @@ class CustomAdminSite(admin.AdminSite):
     site_title = 'Pareri Admin Portal'
     index_title = "Benvenuto nell'area amministrativa"
 
-    def get_app_list(self, request):
+    def get_urls(self):
+        """Aggiunge l'autocompletamento delle città."""
+        return [
+            path(
+                'autocomplete/citta/',
+                self.admin_view(
+                    CittaAutocompleteJsonView.as_view(admin_site=self)
+                ),
+                name='autocomplete_citta',
+            ),
+            *super().get_urls(),
+        ]
+
+    def get_app_list(self, request, app_label=None):
         """Personalizza la lista delle app visibili.
 
-        Lo fa in base ai gruppi dell'utente.
+        Lo fa in base ai gruppi dell'utente. La lista viene calcolata una
+        volta per richiesta: la usano sia l'indice sia il menu di jazzmin.
         """
-        app_list = super().get_app_list(request)
-        # Controlla se l'utente appartiene al gruppo "Full Access Admin"
-        user_has_full_access_group = (
-            request.user.is_superuser
-            and request.user.groups.filter(
-                name=settings.FULL_ACCESS_GROUP_NAME
-            ).exists()
-        )
+        app_list = getattr(request, '_app_list', None)
+        if app_list is None:
+            app_list = self._app_list_autorizzate(request)
+            request._app_list = app_list  # noqa: SLF001
+        if app_label is None:
+            return app_list
+        return [app for app in app_list if app['app_label'] == app_label]
 
-        if user_has_full_access_group:
+    def _app_list_autorizzate(self, request):
+        """Le app del sito visibili all'utente della richiesta."""
+        app_list = super().get_app_list(request)
+        if request.user.is_superuser and self._accesso_completo(request.user):
             return app_list
         # Usa la lista di app autorizzate configurata nelle settings
         authorized = getattr(settings, 'AUTHORIZED_APPS', [])
         return [app for app in app_list if app['app_label'] in authorized]
 
+    def _accesso_completo(self, user):
+        """Se l'utente appartiene al gruppo "Full Access Admin".
+
+        L'esito resta nella cache dei permessi finché non cambia la loro
+        versione, cioè finché non cambiano gruppi o appartenenze; senza
+        una cache condivisa si legge dal database, come i permessi. Solo
+        l'esito dipende dai gruppi: il filtro su ``AUTHORIZED_APPS`` si
+        applica in memoria a ogni richiesta, quindi non entra nella chiave.
+        """
+        nome = settings.FULL_ACCESS_GROUP_NAME
+
+        def appartiene():
+            return user.groups.filter(name=nome).exists()
+
+        if not cache_condivisa(settings.PERMISSIONS_CACHE_ALIAS):
+            return appartiene()
+        chiave = (
+            f'admin:accesso_completo:{user.pk}:{versione_permessi()}:'
+            f'{hashlib.blake2b(nome.encode(), digest_size=8).hexdigest()}'
+        )
+        return caches[settings.PERMISSIONS_CACHE_ALIAS].get_or_set(
+            chiave, appartiene, timeout=settings.PERMISSIONS_CACHE_TTL
+        )
+
 
 custom_admin_site = CustomAdminSite(name='custom_admin')
 
@@ -67,9 +177,12 @@ class GroupAdmin(admin.ModelAdmin):
         return super().formfield_for_manytomany(db_field, request, **kwargs)
 
 
-class PermissionAdmin(admin.ModelAdmin):
+class PermissionAdmin(PaginazioneKeysetMixin, admin.ModelAdmin):
     """Ottimizza la queryset per Permission per evitare N+1 su content_type."""
 
+    # La chiave univoca (content_type, codename) ha già il suo indice
+    keyset_ordering = ('content_type', 'codename')
+
     def get_queryset(self, request):
         """Restituisce una queryset con content_type prefetchato."""
         return super().get_queryset(request).select_related('content_type')
@@ -77,8 +190,46 @@ class PermissionAdmin(admin.ModelAdmin):
 
 custom_admin_site.register(Group, GroupAdmin)
 custom_admin_site.register(Permission, PermissionAdmin)
+
+
+class LogEntryAdmin(PaginazioneKeysetMixin, admin.ModelAdmin):
+    """Admin del registro delle azioni, paginato per id decrescente."""
+
+    # L'id cresce con action_time ed è già indicizzato
+    keyset_ordering = ('-id',)
+
+
+class StoricoModificaAdmin(PaginazioneKeysetMixin, admin.ModelAdmin):
+    """Storico delle modifiche in sola lettura."""
+
+    list_display = (
+        'registrata_at',
+        'content_type',
+        'object_id',
+        'azione',
+        'utente_fullname',
+    )
+    list_filter = ('azione', 'content_type')
+    list_select_related = ('content_type',)
+    # L'id è un UUIDv7: l'ordine per id è quello di registrazione
+    keyset_ordering = ('-id',)
+
+    def has_add_permission(self, request):
+        """Le righe le scrive solo ``BaseModel.save()``."""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """Lo storico non si modifica."""
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        """Lo storico non si elimina: è una tabella in sola aggiunta."""
+        return False
+
+
 custom_admin_site.register(ContentType)
-custom_admin_site.register(LogEntry)
+custom_admin_site.register(LogEntry, LogEntryAdmin)
+custom_admin_site.register(StoricoModifica, StoricoModificaAdmin)
 
 custom_admin_site.register(BlogPost, BlogPostAdmin)
 custom_admin_site.register(DummyModel)
@@ -96,10 +247,11 @@ class RegionFilter(admin.SimpleListFilter):
     parameter_name = 'region'
 
     def lookups(self, request, model_admin):
-        """Restituisce la lista delle regioni disponibili."""
-        regions = RegionProxy.objects.all().order_by('name')
+        """Restituisce la lista delle regioni, dalla tabella in memoria."""
         # Use string ids to align with filter value type and URL params
-        return [(str(region.id), region.name) for region in regions]
+        return [
+            (str(region.id), region.name) for region in tabella_geo().regioni()
+        ]
 
     def queryset(self, request, queryset):
         """Filtra il queryset in base alla regione selezionata."""
@@ -113,13 +265,13 @@ class RegionFilter(admin.SimpleListFilter):
         return queryset.filter(region_id=region_id)
 
 
-class CityProxyAdmin(admin.ModelAdmin):
+class CityProxyAdmin(PaginazioneKeysetMixin, admin.ModelAdmin):
     """Admin per le città italiane."""
 
     list_display = ('name', 'region', 'country')
     list_filter = (RegionFilter,)  # Usa il filtro personalizzato
     search_fields = ('name', 'alternate_names')
-    ordering = ('name',)
+    keyset_ordering = ('name', 'id')
 
     def get_queryset(self, request):
         """Ottimizza la queryset con select_related per evitare N+1."""
@@ -145,9 +297,32 @@ class CountryProxyAdmin(admin.ModelAdmin):
     search_fields = ('name', 'code2', 'code3')
 
 
+class LocalizzazioneGeoAdmin(admin.ModelAdmin):
+    """Esecuzioni della localizzazione, in sola lettura."""
+
+    list_display = (
+        'eseguita_at',
+        'completata_at',
+        'versione',
+        'paesi',
+        'regioni',
+        'citta',
+    )
+    ordering = ('-eseguita_at',)
+
+    def has_add_permission(self, request):
+        """Le righe le scrive solo ``translate_italian_regions``."""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """Le esecuzioni registrate non si modificano."""
+        return False
+
+
 custom_admin_site.register(CityProxy, CityProxyAdmin)
 custom_admin_site.register(RegionProxy, RegionProxyAdmin)
 custom_admin_site.register(CountryProxy, CountryProxyAdmin)
+custom_admin_site.register(LocalizzazioneGeo, LocalizzazioneGeoAdmin)
 
 
 # ============================================================================
@@ -159,9 +334,11 @@ try:
     from django.contrib.admin.sites import AlreadyRegistered
     from django.http import HttpResponseForbidden
 
-    class ForbiddenAddAdmin(admin.ModelAdmin):
+    class ForbiddenAddAdmin(PaginazioneKeysetMixin, admin.ModelAdmin):
         """Admin che restituisce 403 Forbidden sulla pagina di add."""
 
+        keyset_ordering = ('-id',)
+
         def add_view(self, request, form_url='', extra_context=None):
             """Disabilita la pagina di add restituendo 403 Forbidden."""
             return HttpResponseForbidden()
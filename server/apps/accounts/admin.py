@@ -4,17 +4,28 @@ Questo modulo fornisce funzionalità per admin.
 """
 
 from django.contrib import admin
-from django.contrib.admin.models import LogEntry
+from django.contrib.admin.views.main import ChangeList
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import Permission
-from django.db.models import Prefetch
+from django.db.models import Prefetch, prefetch_related_objects
+
+from server.common.admin import AttivitaRecenteMixin
 
 from .forms import CustomUserChangeForm, CustomUserCreationForm
 from .models import CustomUser
 
 
+class UserChangeList(ChangeList):
+    """Users changelist that defers the fields it does not display."""
+
+    def get_queryset(self, request, exclude_parameters=None):
+        """Restrict the filtered queryset to the changelist fields."""
+        queryset = super().get_queryset(request, exclude_parameters)
+        return queryset.only(*self.model_admin.get_changelist_fields(request))
+
+
 @admin.register(CustomUser)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(AttivitaRecenteMixin, UserAdmin):
     """Admin interface for CustomUser model."""
 
     add_form = CustomUserCreationForm
@@ -90,48 +101,48 @@ class CustomUserAdmin(UserAdmin):
     readonly_fields = ('created_by', 'updated_by', 'date_joined', 'last_login')
     filter_horizontal = ('groups', 'user_permissions')
 
-    def get_queryset(self, request):
-        """Return a queryset that prefetches related objects.
-
-        Accessing related permissions/content types in admin templates
-        can cause N+1 queries; prefetch them here to avoid that.
-        """
-        # Prefetch groups and user_permissions, and ensure
-        # Permission.content_type is selected to avoid per-row queries when
-        # templates access it.
-        prefetch_user_perms = Prefetch(
-            'user_permissions',
-            queryset=Permission.objects.select_related('content_type'),
-        )
-        prefetch_group_perms = Prefetch(
-            'groups__permissions',
-            queryset=Permission.objects.select_related('content_type'),
-        )
-
-        return (
-            super()
-            .get_queryset(request)
-            .prefetch_related(
-                'groups', prefetch_user_perms, prefetch_group_perms
-            )
-        )
+    def get_changelist(self, request, **kwargs):
+        """Use the changelist that loads only the displayed columns."""
+        return UserChangeList
 
-    def change_view(self, request, object_id, form_url='', extra_context=None):
-        """Override change_view and provide recent log entries.
+    def get_changelist_fields(self, request):
+        """Model fields loaded by the changelist.
 
-        Recent LogEntry instances are loaded with select_related to avoid
-        N+1 when templates access their content_type and user.
+        The primary key plus the concrete fields in ``list_display``:
+        password, audit columns and relations stay out of the rows.
+        """
+        concrete = {field.name for field in self.opts.concrete_fields}
+        return [
+            self.opts.pk.name,
+            *(
+                name
+                for name in self.get_list_display(request)
+                if name in concrete
+            ),
+        ]
+
+    def get_object(self, request, object_id, from_field=None):
+        """Return the user with groups and permissions prefetched.
+
+        The change form renders the user's groups and permissions
+        (with their content types); prefetching them here avoids N+1
+        queries without weighing on the changelist.
         """
-        extra_context = extra_context or {}
-        recent = (
-            LogEntry.objects.filter(object_id=object_id)
-            .select_related('content_type', 'user')
-            .order_by('-action_time')[:20]
-        )
-        extra_context.setdefault('recent_log_entries', recent)
-        return super().change_view(
-            request, object_id, form_url, extra_context=extra_context
-        )
+        obj = super().get_object(request, object_id, from_field)
+        if obj is not None:
+            prefetch_related_objects(
+                [obj],
+                'groups',
+                Prefetch(
+                    'user_permissions',
+                    queryset=Permission.objects.select_related('content_type'),
+                ),
+                Prefetch(
+                    'groups__permissions',
+                    queryset=Permission.objects.select_related('content_type'),
+                ),
+            )
+        return obj
 
     def formfield_for_manytomany(self, db_field, request, **kwargs):
         """Provide optimized querysets for many-to-many fields used in forms.
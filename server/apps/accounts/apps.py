@@ -18,3 +18,7 @@ class AccountsConfig(AppConfig):
 
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'server.apps.accounts'
+
+    def ready(self):
+        """Collega i segnali che invalidano la cache dei permessi."""
+        from server.apps.accounts import backends  # noqa: F401, PLC0415
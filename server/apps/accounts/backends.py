@@ -0,0 +1,115 @@
+"""Backend di autenticazione con i permessi in cache condivisa.
+
+``ModelBackend`` ricalcola i permessi di utente e gruppi a ogni
+richiesta (li memorizza solo sull'istanza dell'utente). Qui l'insieme
+completo viene salvato nella cache ``PERMISSIONS_CACHE_ALIAS``, con
+chiave l'id dell'utente. Ogni voce porta con sé la versione dei
+permessi: i segnali in fondo al modulo la cambiano quando cambiano
+gruppi, permessi degli utenti o dei gruppi, e le voci con una versione
+diversa vengono ricalcolate.
+
+La cache deve essere condivisa tra i worker (Redis, Memcached): con una
+cache del processo un permesso revocato resterebbe valido negli altri
+worker, quindi ``CachedModelBackend`` si comporta come ``ModelBackend``.
+"""
+
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from server.common.cache import cache_condivisa
+
+_VERSIONE = 'permessi:versione'
+
+
+def _cache():
+    return caches[settings.PERMISSIONS_CACHE_ALIAS]
+
+
+def _chiave(user_obj):
+    # Un superuser ha tutti i permessi: cambiando il flag cambia la voce
+    return f'permessi:{user_obj.pk}:{int(user_obj.is_superuser)}'
+
+
+def _invalida():
+    _cache().set(_VERSIONE, time.time_ns(), timeout=None)
+
+
+def invalida_permessi():
+    """Rende obsolete tutte le voci di permessi in cache.
+
+    Viene ripetuta al commit: una richiesta concorrente che ricalcola i
+    permessi prima del commit legge ancora le righe vecchie e le
+    salverebbe con la nuova versione.
+    """
+    _invalida()
+    if connection.in_atomic_block:
+        transaction.on_commit(_invalida)
+
+
+def versione_permessi():
+    """Versione corrente dei permessi, da usare nelle chiavi di cache."""
+    versione = _cache().get(_VERSIONE)
+    if versione is None:
+        _invalida()
+        versione = _cache().get(_VERSIONE)
+    return versione
+
+
+class CachedModelBackend(ModelBackend):
+    """``ModelBackend`` che legge i permessi dalla cache condivisa.
+
+    Senza una cache condivisa i permessi si leggono dal database.
+    """
+
+    def get_all_permissions(self, user_obj, obj=None):
+        """Permessi di utente e gruppi, dalla cache se aggiornati."""
+        if (
+            not user_obj.is_active
+            or user_obj.is_anonymous
+            or obj is not None
+            or hasattr(user_obj, '_perm_cache')
+            or not cache_condivisa(settings.PERMISSIONS_CACHE_ALIAS)
+        ):
+            return super().get_all_permissions(user_obj, obj)
+
+        cache = _cache()
+        chiave = _chiave(user_obj)
+        # Versione e permessi con un solo accesso alla cache
+        valori = cache.get_many([_VERSIONE, chiave])
+        versione = valori.get(_VERSIONE) or versione_permessi()
+        voce = valori.get(chiave)
+        if voce is not None and voce[0] == versione:
+            user_obj._perm_cache = voce[1]  # noqa: SLF001
+            return voce[1]
+
+        permessi = super().get_all_permissions(user_obj)
+        cache.set(
+            chiave,
+            (versione, permessi),
+            timeout=settings.PERMISSIONS_CACHE_TTL,
+        )
+        return permessi
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def _permessi_modificati(sender, **kwargs):
+    invalida_permessi()
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+@receiver(m2m_changed, sender=get_user_model().user_permissions.through)
+def _relazioni_modificate(sender, action, **kwargs):
+    if action in {'post_add', 'post_remove', 'post_clear'}:
+        invalida_permessi()
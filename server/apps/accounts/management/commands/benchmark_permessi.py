@@ -0,0 +1,73 @@
+"""
+Management command to measure the queries of the admin index.
+
+Renders ``custom_admin_site.index`` for the given user a few times, as
+separate requests (the user is reloaded each time), first with Django's
+``ModelBackend`` and then with ``CachedModelBackend``, and reports the
+queries per request.
+"""
+
+import statistics
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from server.admin import custom_admin_site
+from server.apps.accounts.backends import invalida_permessi
+
+_BACKENDS = {
+    'ModelBackend': 'django.contrib.auth.backends.ModelBackend',
+    'CachedModelBackend': 'server.apps.accounts.backends.CachedModelBackend',
+}
+
+
+class Command(BaseCommand):
+    """Admin index query counts with and without the permission cache."""
+
+    help = 'Counts admin index queries with and without the permission cache'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Define CLI arguments for the management command."""
+        parser.add_argument('email', help='Staff user to render the index.')
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Requests per backend.',
+        )
+
+    def handle(self, *args, **options):
+        """Execute the command."""
+        user_model = get_user_model()
+        try:
+            user_model.objects.get_by_natural_key(options['email'])
+        except user_model.DoesNotExist as exc:
+            raise CommandError(f'User not found: {options["email"]}') from exc
+
+        for name, backend in _BACKENDS.items():
+            # La prima richiesta con la cache vuota la popola
+            invalida_permessi()
+            with override_settings(AUTHENTICATION_BACKENDS=[backend]):
+                counts = [
+                    self._queries(user_model, options['email'])
+                    for _ in range(options['repeat'])
+                ]
+            self.stdout.write(
+                f'{name}: first request {counts[0]} queries, '
+                f'then median {statistics.median(counts[1:] or counts)}'
+            )
+
+    def _queries(self, user_model, email):
+        """Queries of one admin index request for a freshly loaded user."""
+        request = RequestFactory().get('/admin/')
+        request.user = user_model.objects.get_by_natural_key(email)
+        with CaptureQueriesContext(connection) as queries:
+            custom_admin_site.index(request).render()
+        return len(queries)
@@ -8,13 +8,14 @@ support (via django-concurrency).
 from typing import ClassVar
 
 from concurrency.fields import IntegerVersionField
-from crum import get_current_user
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from server.common.audit import autore
+
 
 # Manager personalizzato per il tuo CustomUser
 class CustomUserManager(BaseUserManager):
@@ -163,26 +164,20 @@ class CustomUser(AbstractUser):
     def save(self, *args, **kwargs):
         """Aggiorna i campi di audit (created_by/updated_by) prima del save.
 
-        Usa ``crum.get_current_user`` per recuperare l'utente corrente, se
-        disponibile.
+        L'utente e il suo nome vengono dal contesto di audit
+        (``server.common.audit``), se disponibile.
         """
         if not self.username and self.email:
             self.username = self.email_prefix_display
-        user = get_current_user()
-        if user and not user.is_anonymous:
+        user, fullname = autore()
+        if user is not None:
             # Se il record è nuovo (non ha ancora una chiave primaria)
             if not self.pk:
                 self.created_by = user
-                self.created_by_fullname = (
-                    user.nome_utente
-                    if hasattr(user, 'nome_utente')
-                    else str(user)
-                )
+                self.created_by_fullname = fullname
             # L'utente che ha fatto l'ultima modifica è sempre l'utente corrente
             self.updated_by = user
-            self.updated_by_fullname = (
-                user.nome_utente if hasattr(user, 'nome_utente') else str(user)
-            )
+            self.updated_by_fullname = fullname
 
         super().save(*args, **kwargs)
 
@@ -3,10 +3,28 @@ from typing import ClassVar
 from django import forms
 from django.contrib import admin, messages
 from django.core.exceptions import ValidationError
+from django.db.models import Exists, OuterRef
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
-from server.admin import custom_admin_site
-from server.apps.datoriLavoro.models import DatoreLavoro, DatoreLavoroSede, Sede
+from server.admin import CittaAutocompleteSelect, custom_admin_site
+from server.apps.datoriLavoro.esportazione import (
+    CONTENT_TYPES,
+    datori_da_esportare,
+    esporta,
+)
+from server.apps.datoriLavoro.models import (
+    DatoreLavoro,
+    DatoreLavoroSede,
+    Sede,
+    VerificaPartitaIva,
+)
+from server.common.admin import (
+    PaginazioneKeysetMixin,
+    RicercaTrigrammiMixin,
+    SoloAttiviMixin,
+)
 
 
 class DatoreLavoroSedeInlineFormset(forms.BaseInlineFormSet):
@@ -14,7 +32,11 @@ class DatoreLavoroSedeInlineFormset(forms.BaseInlineFormSet):
 
     # Ripristina la versione più semplice e sicura
     def clean(self):
-        """Ci sia esattamente una sede legale per datore di lavoro."""
+        """Ci sia esattamente una sede legale per datore di lavoro.
+
+        Il vincolo è garantito dal database al commit; qui lo si anticipa
+        per mostrare un messaggio leggibile nel form.
+        """
         super().clean()
 
         # Conta quante forme non eliminate hanno is_sede_legale=True
@@ -94,7 +116,12 @@ class DatoreLavoroAdminForm(forms.ModelForm):
 
 
 @admin.register(DatoreLavoro, site=custom_admin_site)
-class DatoreLavoroAdmin(admin.ModelAdmin):
+class DatoreLavoroAdmin(
+    SoloAttiviMixin,
+    RicercaTrigrammiMixin,
+    PaginazioneKeysetMixin,
+    admin.ModelAdmin,
+):
     """Admin per i Datori di Lavoro."""
 
     form = DatoreLavoroAdminForm
@@ -102,13 +129,42 @@ class DatoreLavoroAdmin(admin.ModelAdmin):
         'ragione_sociale',
         'p_iva',
         'codice_fiscale',
+        'stato_verifica_p_iva',
+        'sede_legale',
     ]
+    list_select_related = ('sede_legale__citta',)
+    list_filter: ClassVar[list[str]] = ['stato_verifica_p_iva']
     search_fields: ClassVar[list[str]] = [
         'ragione_sociale',
         'p_iva',
         'codice_fiscale',
     ]
+    readonly_fields: ClassVar[list[str]] = [
+        'stato_verifica_p_iva',
+        'sede_legale',
+    ]
     inlines: ClassVar[list] = [DatoreLavoroSedeInline]
+    actions: ClassVar[list[str]] = ['esporta_csv', 'esporta_jsonl']
+
+    def _esporta(self, queryset, formato):
+        """Export in streaming, senza caricare il queryset in memoria."""
+        filename = f'datori_{timezone.now():%Y%m%d_%H%M%S}.{formato}'
+        response = StreamingHttpResponse(
+            esporta(datori_da_esportare(queryset), formato),
+            content_type=CONTENT_TYPES[formato],
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @admin.action(description=_('Esporta in CSV (con sedi)'))
+    def esporta_csv(self, request, queryset):
+        """Esporta i datori selezionati in CSV, una riga per sede."""
+        return self._esporta(queryset, 'csv')
+
+    @admin.action(description=_('Esporta in JSONL (con sedi)'))
+    def esporta_jsonl(self, request, queryset):
+        """Esporta i datori selezionati in JSONL, un oggetto per datore."""
+        return self._esporta(queryset, 'jsonl')
 
     def get_inline_instances(self, request, obj=None):
         """
@@ -136,47 +192,6 @@ class DatoreLavoroAdmin(admin.ModelAdmin):
         # di salvare le relazioni.
         super().save_model(request, obj, form, change)
 
-    def save_related(self, request, form, formsets, change):
-        """Override per personalizzare il salvataggio delle relazioni."""
-        # A differenza della versione precedente, qui salviamo
-        # prima il formset, poi recuperiamo i dati per l'aggiornamento.
-
-        # 1. Salva i formset in linea
-        super().save_related(request, form, formsets, change)
-
-        # 2. Esegui la logica di business dopo il salvataggio
-        datore_lavoro = form.instance
-        legal_sede_pk = None
-
-        # Trova la PK della sede legale che l'utente ha selezionato.
-        # Poiché i formset sono già stati salvati,
-        # possiamo interrogare il database.
-        try:
-            legal_sede = datore_lavoro.datorelavorosede_set.get(
-                is_sede_legale=True
-            )
-            legal_sede_pk = legal_sede.pk
-        except DatoreLavoroSede.DoesNotExist:
-            legal_sede_pk = None
-        except DatoreLavoroSede.MultipleObjectsReturned:
-            # Gestisce il caso di errore in cui la validazione lato
-            # client fallisce.
-            # Rimuove tutti i flag tranne il primo (o un altro a tua scelta).
-            legal_sedes = datore_lavoro.datorelavorosede_set.filter(
-                is_sede_legale=True
-            )
-            if legal_sedes.exists():
-                legal_sede_pk = legal_sedes.first().pk
-                legal_sedes.exclude(pk=legal_sede_pk).update(
-                    is_sede_legale=False
-                )
-
-        # Se è stata trovata una sede legale, aggiorna tutte le altre.
-        if legal_sede_pk:
-            datore_lavoro.datorelavorosede_set.all().exclude(
-                pk=legal_sede_pk
-            ).update(is_sede_legale=False)
-
 
 class SedeAdminForm(forms.ModelForm):
     """Form personalizzato per l'admin del modello Sede."""
@@ -201,7 +216,12 @@ class SedeAdminForm(forms.ModelForm):
 
 
 @admin.register(Sede, site=custom_admin_site)
-class SedeAdmin(admin.ModelAdmin):
+class SedeAdmin(
+    SoloAttiviMixin,
+    RicercaTrigrammiMixin,
+    PaginazioneKeysetMixin,
+    admin.ModelAdmin,
+):
     """Admin per il modello Sede."""
 
     list_display = ('nome', 'indirizzo', 'citta')
@@ -209,6 +229,41 @@ class SedeAdmin(admin.ModelAdmin):
     search_fields: ClassVar[list[str]] = ['nome', 'indirizzo', 'citta__name']
     fields = ('nome', 'indirizzo', 'citta')
 
+    def formfield_for_foreignkey(self, db_field, request=None, **kwargs):
+        """La città si sceglie con l'autocompletamento in memoria."""
+        if db_field.name == 'citta':
+            kwargs['widget'] = CittaAutocompleteSelect(
+                db_field, self.admin_site
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_deleted_objects(self, objs, request):
+        """Protegge le sedi legali di datori che mantengono altre sedi.
+
+        Il vincolo differito sulla sede legale fallirebbe solo al commit;
+        l'admin mostra invece la pagina "impossibile eliminare", anche per
+        l'azione di eliminazione multipla.
+        """
+        deleted, model_count, perms_needed, protected = (
+            super().get_deleted_objects(objs, request)
+        )
+        pks = [sede.pk for sede in objs]
+        altre_sedi = DatoreLavoroSede.objects.filter(
+            datore_lavoro=OuterRef('datore_lavoro')
+        ).exclude(sede__in=pks)
+        legali = DatoreLavoroSede.objects.filter(
+            Exists(altre_sedi), sede__in=pks, is_sede_legale=True
+        ).select_related('datore_lavoro', 'sede')
+        protected = [
+            *protected,
+            *(
+                _('%(sede)s: sede legale di %(datore)s, che ha altre sedi')
+                % {'sede': legale.sede, 'datore': legale.datore_lavoro}
+                for legale in legali
+            ),
+        ]
+        return deleted, model_count, perms_needed, protected
+
     def response_add(self, request, obj, post_url_continue=None):
         """Messaggio di successo personalizzato dopo l'aggiunta di una Sede."""
         msg = _("La %(name)s '%(obj)s' è stata creata con successo.") % {
@@ -226,3 +281,28 @@ class SedeAdmin(admin.ModelAdmin):
         }
         self.message_user(request, msg, level=messages.SUCCESS)
         return super().response_change(request, obj)
+
+
+@admin.register(VerificaPartitaIva, site=custom_admin_site)
+class VerificaPartitaIvaAdmin(admin.ModelAdmin):
+    """Admin (in sola lettura) della coda di verifica VIES."""
+
+    list_display = (
+        'p_iva',
+        'datore_lavoro',
+        'tentativi',
+        'prossimo_tentativo_at',
+        'completata_at',
+        'esito',
+    )
+    list_filter: ClassVar[list[str]] = ['esito']
+    search_fields: ClassVar[list[str]] = ['p_iva']
+    list_select_related = ('datore_lavoro',)
+
+    def has_add_permission(self, request):
+        """Le richieste vengono create solo dal salvataggio dei datori."""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """Le richieste sono gestite dal worker, non modificabili."""
+        return False
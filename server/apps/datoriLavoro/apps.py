@@ -7,3 +7,7 @@ class DatorilavoriConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'server.apps.datoriLavoro'
     verbose_name = 'Datori di Lavoro'
+
+    def ready(self):
+        """Registra i controlli di sistema dell'app."""
+        from server.apps.datoriLavoro import checks  # noqa: F401, PLC0415
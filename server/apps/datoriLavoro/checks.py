@@ -0,0 +1,29 @@
+"""Controlli di sistema dell'app Datori di Lavoro."""
+
+from django.conf import settings
+from django.core import checks
+
+from server.common.cache import cache_condivisa
+
+
+@checks.register(checks.Tags.caches)
+def cache_vies_condivisa(app_configs, **kwargs):
+    """La cache VIES deve essere condivisa tra i processi.
+
+    In una cache per processo gli esiti si perdono a ogni riavvio e ogni
+    worker ha il suo circuit breaker: un disservizio VIES viene scoperto
+    da ciascun worker e la chiamata di prova non è più una sola.
+    """
+    if cache_condivisa(settings.VIES_CACHE_ALIAS):
+        return []
+    return [
+        checks.Warning(
+            'La cache VIES non è condivisa tra i processi.',
+            hint=(
+                'Imposta VIES_CACHE_ALIAS su una cache condivisa, per '
+                'esempio DatabaseCache (manage.py createcachetable).'
+            ),
+            obj=settings.VIES_CACHE_ALIAS,
+            id='datoriLavoro.W001',
+        )
+    ]
@@ -0,0 +1,144 @@
+"""Export in streaming dei Datori di Lavoro con sedi e sede legale.
+
+I datori sono letti in ordine di chiave primaria con un cursore lato
+server (``iterator(chunk_size=...)``): la memoria usata dipende dalla
+dimensione del blocco, non dalla tabella. Le sedi di ogni blocco sono
+caricate con un'unica query di prefetch.
+
+Formati:
+
+* ``csv``: una riga per sede associata (una riga senza sede se il
+  datore non ne ha); le colonne coincidono con quelle dell'import.
+* ``jsonl``: un oggetto JSON per datore, con ``sede_legale`` e ``sedi``.
+"""
+
+import csv
+import io
+import json
+from collections.abc import Iterator
+
+from django.db.models import Prefetch, QuerySet
+
+from server.apps.datoriLavoro.models import DatoreLavoro, DatoreLavoroSede
+
+FORMATI = ('csv', 'jsonl')
+
+COLONNE_CSV = (
+    'id',
+    'ragione_sociale',
+    'p_iva',
+    'codice_fiscale',
+    'stato_verifica_p_iva',
+    'is_active',
+    'sede_id',
+    'sede_nome',
+    'indirizzo',
+    'citta',
+    'regione',
+    'is_sede_legale',
+)
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+def datori_da_esportare(
+    queryset: QuerySet | None = None,
+    after: str | None = None,
+    until: str | None = None,
+) -> QuerySet:
+    """Datori ordinati per chiave primaria, con le sedi in prefetch.
+
+    ``after`` (escluso) e ``until`` (incluso) limitano l'intervallo di
+    chiavi primarie, per riprendere o suddividere un export.
+    """
+    if queryset is None:
+        queryset = DatoreLavoro.objects.all()
+    if after:
+        queryset = queryset.filter(pk__gt=after)
+    if until:
+        queryset = queryset.filter(pk__lte=until)
+    sedi = DatoreLavoroSede.objects.select_related(
+        'sede__citta__region'
+    ).order_by('-is_sede_legale', 'pk')
+    return queryset.order_by('pk').prefetch_related(
+        Prefetch('datorelavorosede_set', queryset=sedi)
+    )
+
+
+def _sede(relazione: DatoreLavoroSede) -> dict:
+    citta = relazione.sede.citta
+    return {
+        'id': str(relazione.sede_id),
+        'nome': relazione.sede.nome,
+        'indirizzo': relazione.sede.indirizzo,
+        'citta': citta.name,
+        'regione': citta.region.name if citta.region else '',
+        'is_sede_legale': relazione.is_sede_legale,
+    }
+
+
+def serializza(datore: DatoreLavoro) -> dict:
+    """Rappresentazione di un datore con le sue sedi."""
+    sedi = [_sede(rel) for rel in datore.datorelavorosede_set.all()]
+    return {
+        'id': str(datore.pk),
+        'ragione_sociale': datore.ragione_sociale,
+        'p_iva': datore.p_iva,
+        'codice_fiscale': datore.codice_fiscale,
+        'stato_verifica_p_iva': datore.stato_verifica_p_iva,
+        'is_active': datore.is_active,
+        'sede_legale': next(
+            (sede for sede in sedi if sede['is_sede_legale']), None
+        ),
+        'sedi': sedi,
+    }
+
+
+def _righe_csv(dati: dict) -> list[list]:
+    datore = [dati[col] for col in COLONNE_CSV[:6]]
+    if not dati['sedi']:
+        return [datore + [''] * 6]
+    return [
+        [
+            *datore,
+            sede['id'],
+            sede['nome'],
+            sede['indirizzo'],
+            sede['citta'],
+            sede['regione'],
+            sede['is_sede_legale'],
+        ]
+        for sede in dati['sedi']
+    ]
+
+
+def _csv(rows: list) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def intestazione(formato: str) -> str:
+    """Intestazione del file (vuota per JSONL)."""
+    return _csv([COLONNE_CSV]) if formato == 'csv' else ''
+
+
+def formatta(datore: DatoreLavoro, formato: str) -> str:
+    """Righe del file relative a un datore di lavoro."""
+    dati = serializza(datore)
+    if formato == 'csv':
+        return _csv(_righe_csv(dati))
+    return json.dumps(dati, ensure_ascii=False) + '\n'
+
+
+def esporta(
+    queryset: QuerySet, formato: str, chunk_size: int = 2000
+) -> Iterator[str]:
+    """Genera il contenuto dell'export, un datore alla volta."""
+    if header := intestazione(formato):
+        yield header
+    for datore in queryset.iterator(chunk_size=chunk_size):
+        yield formatta(datore, formato)
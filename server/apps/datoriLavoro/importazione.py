@@ -0,0 +1,298 @@
+"""Import massivo di Datori di Lavoro e relative sedi legali da CSV/XLSX.
+
+Ogni riga del file descrive un datore di lavoro e la sua sede legale:
+
+    ragione_sociale, p_iva, codice_fiscale, sede_nome, indirizzo, citta
+    [, regione]
+
+Il file viene letto in streaming e processato a blocchi: la validazione
+di Partita IVA e Codice Fiscale gira in un pool di processi, le città
+vengono risolte su un indice in memoria e le scritture avvengono con
+``audited_bulk_create`` in una transazione per blocco, firmate
+dall'utente indicato (o da quello della richiesta corrente).
+"""
+
+import csv
+import itertools
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import codicefiscale as cf
+from django.contrib.auth.models import AbstractBaseUser
+from django.db import transaction
+
+from server.apps.datoriLavoro.models import (
+    DatoreLavoro,
+    DatoreLavoroSede,
+    Sede,
+    StatoVerificaPartitaIva,
+    VerificaPartitaIva,
+)
+from server.apps.datoriLavoro.partita_iva import is_p_iva_formalmente_valida
+from server.apps.main.logic.geo import tabella_geo
+from server.common.text import normalizza_testo
+
+COLONNE = (
+    'ragione_sociale',
+    'p_iva',
+    'codice_fiscale',
+    'sede_nome',
+    'indirizzo',
+    'citta',
+    'regione',
+)
+
+
+class FormatoNonSupportatoError(ValueError):
+    """Estensione del file non gestita dall'import."""
+
+
+def _pulisci(row: dict) -> dict[str, str]:
+    """Normalizza le chiavi e i valori di una riga letta dal file."""
+    cleaned = {
+        normalizza_testo(str(key)).replace(' ', '_'): (
+            '' if value is None else str(value).strip()
+        )
+        for key, value in row.items()
+        if key is not None
+    }
+    return {col: cleaned.get(col, '') for col in COLONNE}
+
+
+def _leggi_csv(path: Path) -> Iterator[dict[str, str]]:
+    with path.open(newline='', encoding='utf-8-sig') as handle:
+        sample = handle.read(4096)
+        handle.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        for row in csv.DictReader(handle, dialect=dialect):
+            yield _pulisci(row)
+
+
+def _leggi_xlsx(path: Path) -> Iterator[dict[str, str]]:
+    try:
+        from openpyxl import load_workbook  # noqa: PLC0415
+    except ImportError as exc:
+        raise FormatoNonSupportatoError(
+            "Per importare file XLSX è necessario il pacchetto 'openpyxl'."
+        ) from exc
+    # read_only: le righe vengono lette in streaming dal file
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        for values in rows:
+            yield _pulisci(dict(zip(header, values, strict=False)))
+    finally:
+        workbook.close()
+
+
+def leggi_righe(path: Path) -> Iterator[dict[str, str]]:
+    """Legge in streaming le righe di un file CSV o XLSX."""
+    suffix = path.suffix.lower()
+    if suffix in {'.csv', '.txt'}:
+        return _leggi_csv(path)
+    if suffix == '.xlsx':
+        return _leggi_xlsx(path)
+    raise FormatoNonSupportatoError(f'Formato non supportato: {suffix}')
+
+
+def a_blocchi(
+    rows: Iterable[dict[str, str]], size: int
+) -> Iterator[list[dict[str, str]]]:
+    """Raggruppa le righe in blocchi di ``size`` elementi."""
+    iterator = iter(rows)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def valida_riga(row: dict[str, str]) -> str | None:
+    """Validazione offline di una riga; restituisce l'errore o None.
+
+    È una funzione pura: viene eseguita nei processi del pool.
+    """
+    if not any((row['ragione_sociale'], row['p_iva'], row['codice_fiscale'])):
+        return 'manca ragione sociale, Partita IVA o Codice Fiscale'
+    if row['p_iva'] and not is_p_iva_formalmente_valida(row['p_iva']):
+        return f'Partita IVA non valida: {row["p_iva"]}'
+    if row['codice_fiscale'] and not cf.isvalid(row['codice_fiscale']):
+        return f'Codice Fiscale non valido: {row["codice_fiscale"]}'
+    if not row['citta']:
+        return 'città mancante'
+    return None
+
+
+class IndiceCitta:
+    """Indice in memoria nome città -> id, dalla tabella geografica.
+
+    I nomi sono confrontati con ``normalizza_testo``; in caso di omonimi
+    la colonna ``regione`` permette di scegliere la città corretta.
+    """
+
+    def __init__(self, cities: Iterable[tuple[int, str, str]]) -> None:
+        """Costruisce l'indice da tuple (id, nome, nome regione)."""
+        self._by_name: dict[str, list[tuple[int, str]]] = defaultdict(list)
+        for city_id, name, region in cities:
+            self._by_name[normalizza_testo(name)].append((
+                city_id,
+                normalizza_testo(region or ''),
+            ))
+
+    @classmethod
+    def da_database(cls) -> 'IndiceCitta':
+        """Carica l'indice dalla tabella geografica in memoria."""
+        tabella = tabella_geo()
+        return cls(
+            (city.id, city.name, tabella.nome_regione(city)) for city in tabella
+        )
+
+    def risolvi(self, name: str, region: str = '') -> int | None:
+        """Restituisce l'id della città o None se assente/ambigua."""
+        candidates = self._by_name.get(normalizza_testo(name), [])
+        if region:
+            region = normalizza_testo(region)
+            candidates = [c for c in candidates if c[1] == region]
+        if len(candidates) != 1:
+            return None
+        return candidates[0][0]
+
+
+@dataclass
+class EsitoBlocco:
+    """Risultato dell'elaborazione di un blocco di righe."""
+
+    creati: int = 0
+    saltati: int = 0
+    errori: list[tuple[int, str]] = field(default_factory=list)
+
+
+@dataclass
+class Importatore:
+    """Esegue l'import a blocchi di un file di datori di lavoro."""
+
+    indice: IndiceCitta
+    workers: int = 0
+    dry_run: bool = False
+    user: AbstractBaseUser | None = None
+    _pool: ProcessPoolExecutor | None = None
+
+    def __enter__(self) -> 'Importatore':
+        """Avvia il pool di processi per la validazione."""
+        if self.workers > 0:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Chiude il pool di processi."""
+        if self._pool is not None:
+            self._pool.shutdown()
+
+    def _valida(self, chunk: list[dict[str, str]]) -> list[str | None]:
+        if self._pool is None:
+            return [valida_riga(row) for row in chunk]
+        chunksize = max(1, len(chunk) // (self.workers * 4))
+        return list(self._pool.map(valida_riga, chunk, chunksize=chunksize))
+
+    def importa_blocco(
+        self, chunk: list[dict[str, str]], first_line: int
+    ) -> EsitoBlocco:
+        """Valida, risolve e scrive un blocco di righe."""
+        esito = EsitoBlocco()
+        valid_rows: list[tuple[dict[str, str], int]] = []
+        for offset, (row, error) in enumerate(
+            zip(chunk, self._valida(chunk), strict=True)
+        ):
+            city_id = None
+            if error is None:
+                city_id = self.indice.risolvi(row['citta'], row['regione'])
+            if city_id is not None:
+                valid_rows.append((row, city_id))
+            else:
+                esito.errori.append((
+                    first_line + offset,
+                    error or f'città non trovata o ambigua: {row["citta"]}',
+                ))
+
+        valid_rows = self._escludi_esistenti(valid_rows)
+        esito.saltati = len(chunk) - len(esito.errori) - len(valid_rows)
+        esito.creati = len(valid_rows)
+        if not self.dry_run and valid_rows:
+            self._scrivi(valid_rows)
+        return esito
+
+    def _escludi_esistenti(self, rows):
+        """Scarta le righe già importate (stessa P.IVA o Codice Fiscale)."""
+        p_ive = {row['p_iva'] for row, _ in rows if row['p_iva']}
+        codici = {
+            row['codice_fiscale'].upper()
+            for row, _ in rows
+            if row['codice_fiscale']
+        }
+        existing_p_iva = set(
+            DatoreLavoro.objects.filter(p_iva__in=p_ive).values_list(
+                'p_iva', flat=True
+            )
+        )
+        existing_cf = set(
+            DatoreLavoro.objects.filter(codice_fiscale__in=codici).values_list(
+                'codice_fiscale', flat=True
+            )
+        )
+        kept = []
+        for row, city_id in rows:
+            p_iva = row['p_iva']
+            codice = row['codice_fiscale'].upper()
+            if p_iva in existing_p_iva or codice in existing_cf:
+                continue
+            # Duplicati all'interno dello stesso file
+            if p_iva:
+                existing_p_iva.add(p_iva)
+            if codice:
+                existing_cf.add(codice)
+            kept.append((row, city_id))
+        return kept
+
+    def _scrivi(self, rows) -> None:
+        datori = []
+        sedi = []
+        for row, city_id in rows:
+            datori.append(
+                DatoreLavoro(
+                    ragione_sociale=row['ragione_sociale'],
+                    p_iva=row['p_iva'],
+                    codice_fiscale=row['codice_fiscale'].upper(),
+                    stato_verifica_p_iva=(
+                        StatoVerificaPartitaIva.PENDING if row['p_iva'] else ''
+                    ),
+                )
+            )
+            sedi.append(
+                Sede(
+                    nome=row['sede_nome'] or 'Sede legale',
+                    indirizzo=row['indirizzo'],
+                    citta_id=city_id,
+                )
+            )
+        with transaction.atomic():
+            DatoreLavoro.objects.audited_bulk_create(datori, user=self.user)
+            Sede.objects.audited_bulk_create(sedi, user=self.user)
+            DatoreLavoroSede.objects.audited_bulk_create(
+                (
+                    DatoreLavoroSede(
+                        datore_lavoro=datore, sede=sede, is_sede_legale=True
+                    )
+                    for datore, sede in zip(datori, sedi, strict=True)
+                ),
+                user=self.user,
+            )
+            # bulk_create non passa da save(): accoda qui le verifiche VIES
+            VerificaPartitaIva.objects.bulk_create(
+                VerificaPartitaIva(datore_lavoro=datore, p_iva=datore.p_iva)
+                for datore in datori
+                if datore.p_iva
+            )
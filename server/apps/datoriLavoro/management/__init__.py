@@ -0,0 +1 @@
+# Management commands for datoriLavoro app
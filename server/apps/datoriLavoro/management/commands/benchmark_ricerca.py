@@ -0,0 +1,112 @@
+"""
+Management command to benchmark the admin search on employers.
+
+Fills the table with synthetic rows inside a transaction that is rolled
+back at the end, then compares Django's default ``icontains`` search
+with the trigram search of ``server.common.admin``.
+"""
+
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import connection, transaction
+from django.test import RequestFactory, override_settings
+
+from server.admin import custom_admin_site
+from server.apps.datoriLavoro.admin import DatoreLavoroAdmin
+from server.apps.datoriLavoro.models import DatoreLavoro
+
+_POPULATE_SQL = """
+INSERT INTO {table} (
+    id, created_at, updated_at, created_by_fullname, updated_by_fullname,
+    version, is_active, ragione_sociale, p_iva, codice_fiscale,
+    stato_verifica_p_iva
+)
+SELECT
+    gen_random_uuid(), now(), now(), '', '', 1, true,
+    (ARRAY['Società', 'Cooperativa', 'Trasporti', 'Edilizia', 'Studio',
+           'Pasticceria', 'Officina', 'Agricola'])[1 + mod(i, 8)]
+    || ' ' ||
+    (ARRAY['Forlì', 'Cantù', 'Rossi', 'Bianchi', 'Nardò', 'Verdi',
+           'Esposito', 'Romano', 'Galli', 'Conti'])[1 + mod(i / 8, 10)]
+    || ' ' || i,
+    lpad(i::text, 11, '0'),
+    '',
+    ''
+FROM generate_series(1, %s) AS i
+"""
+
+
+class Command(BaseCommand):
+    """Benchmark of the DatoreLavoroAdmin search on a large table."""
+
+    help = 'Benchmarks the admin search on synthetic employers (rolled back)'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Define CLI arguments for the management command."""
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=500_000,
+            help='Synthetic employers to insert.',
+        )
+        parser.add_argument(
+            '--term',
+            action='append',
+            dest='terms',
+            default=None,
+            help='Search term (repeatable).',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Runs per term and search mode.',
+        )
+
+    def handle(self, *args, **options):
+        """Execute the command."""
+        terms = options['terms'] or ['forli', 'cantu rossi', '0001234']
+        table = connection.ops.quote_name(
+            DatoreLavoro._meta.db_table  # noqa: SLF001
+        )
+        with transaction.atomic():
+            start = time.perf_counter()
+            with connection.cursor() as cursor:
+                # Il popolamento supera il timeout configurato per le query
+                cursor.execute('SET LOCAL statement_timeout = 0')
+                cursor.execute(
+                    _POPULATE_SQL.format(table=table),
+                    [options['rows']],
+                )
+                cursor.execute(f'ANALYZE {table}')
+            self.stdout.write(
+                f'Inserted {options["rows"]} rows in '
+                f'{time.perf_counter() - start:.1f}s.'
+            )
+            for term in terms:
+                default = self._measure(term, options['repeat'], trigram=False)
+                trigram = self._measure(term, options['repeat'], trigram=True)
+                self.stdout.write(
+                    f'{term!r}: icontains {default:.1f} ms, '
+                    f'trigram {trigram:.1f} ms '
+                    f'({default / trigram:.1f}x)'
+                )
+            transaction.set_rollback(True)
+
+    def _measure(self, term, repeat, *, trigram):
+        """Median time (ms) of a changelist page: count + first 100 rows."""
+        model_admin = DatoreLavoroAdmin(DatoreLavoro, custom_admin_site)
+        request = RequestFactory().get('/', {'q': term})
+        timings = []
+        with override_settings(ADMIN_TRIGRAM_SEARCH=trigram):
+            for _ in range(repeat):
+                start = time.perf_counter()
+                queryset, _ = model_admin.get_search_results(
+                    request, DatoreLavoro.objects.order_by('-pk'), term
+                )
+                queryset.count()
+                list(queryset[:100])
+                timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,84 @@
+"""
+Management command to compare UUIDv4 and UUIDv7 primary keys.
+
+Loads the same number of rows into two temporary tables, one keyed by
+``uuid.uuid4`` and one by ``server.common.models.uuid7``, and reports
+insert throughput and primary-key index size. Everything happens in a
+transaction that is rolled back at the end.
+"""
+
+import io
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import connection, transaction
+
+from server.common.models import uuid7
+
+_GENERATORS = {'v4': uuid.uuid4, 'v7': uuid7}
+
+
+class Command(BaseCommand):
+    """Insert-throughput and index-size benchmark of v4 vs v7 keys."""
+
+    help = 'Benchmarks UUIDv4 vs UUIDv7 primary keys (rolled back)'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Define CLI arguments for the management command."""
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=2_000_000,
+            help='Rows to insert per key type.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50_000,
+            help='Rows per COPY (one transaction-local batch).',
+        )
+
+    def handle(self, *args, **options):
+        """Execute the command."""
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Il caricamento supera il timeout configurato per le query
+            cursor.execute('SET LOCAL statement_timeout = 0')
+            for name, generator in _GENERATORS.items():
+                table = f'benchmark_uuid_{name}'
+                cursor.execute(
+                    f'CREATE TEMP TABLE {table} ('
+                    'id uuid PRIMARY KEY, created_at timestamptz NOT NULL'
+                    ') ON COMMIT DROP'
+                )
+                elapsed = self._load(
+                    cursor,
+                    table,
+                    generator,
+                    options['rows'],
+                    options['batch_size'],
+                )
+                cursor.execute(
+                    'SELECT pg_relation_size(%s), pg_relation_size(%s)',
+                    [f'{table}_pkey', table],
+                )
+                index_size, table_size = cursor.fetchone()
+                self.stdout.write(
+                    f'{name}: {options["rows"] / elapsed:,.0f} rows/s, '
+                    f'pkey {index_size / 2**20:,.1f} MiB '
+                    f'(table {table_size / 2**20:,.1f} MiB)'
+                )
+            transaction.set_rollback(True)
+
+    def _load(self, cursor, table, generator, rows, batch_size):
+        """COPY ``rows`` rows in batches; return the elapsed seconds."""
+        start = time.perf_counter()
+        for offset in range(0, rows, batch_size):
+            count = min(batch_size, rows - offset)
+            buffer = io.StringIO(
+                ''.join(f'{generator()}\tnow\n' for _ in range(count))
+            )
+            cursor.copy_expert(
+                f'COPY {table} (id, created_at) FROM STDIN', buffer
+            )
+        return time.perf_counter() - start
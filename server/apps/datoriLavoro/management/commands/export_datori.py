@@ -0,0 +1,111 @@
+"""
+Management command to export employers with their offices.
+
+Streams CSV or JSONL in primary-key order; see
+``datoriLavoro.esportazione`` for the output layout.
+"""
+
+import json
+from pathlib import Path
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+
+from server.apps.datoriLavoro.esportazione import (
+    FORMATI,
+    datori_da_esportare,
+    formatta,
+    intestazione,
+)
+
+
+class Command(BaseCommand):
+    """Constant-memory export of DatoreLavoro with sedi and legal office."""
+
+    help = 'Exports employers with their offices to CSV or JSONL'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Define CLI arguments for the management command."""
+        parser.add_argument('output', type=Path, help='Output file.')
+        parser.add_argument(
+            '--format',
+            choices=FORMATI,
+            default=None,
+            help='Output format (default: from the file extension).',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Rows fetched per round trip from the database cursor.',
+        )
+        parser.add_argument(
+            '--after',
+            default=None,
+            help='Export only employers with primary key greater than this.',
+        )
+        parser.add_argument(
+            '--until',
+            default=None,
+            help='Export only employers with primary key up to this one.',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue the output from the last checkpoint.',
+        )
+
+    def handle(self, *args, **options):
+        """Execute the command."""
+        output = options['output']
+        formato = options['format'] or output.suffix.lstrip('.').lower()
+        if formato not in FORMATI:
+            raise CommandError(
+                f'Unknown format {formato!r}: use --format csv|jsonl.'
+            )
+        checkpoint = output.with_name(output.name + '.checkpoint')
+        after = options['after']
+        resume = options['resume'] and checkpoint.exists()
+        if resume:
+            state = json.loads(checkpoint.read_text())
+            after = state['last_pk']
+            self.stdout.write(f'Resuming after {after}.')
+
+        queryset = datori_da_esportare(after=after, until=options['until'])
+        with output.open('a' if resume else 'w', encoding='utf-8') as handle:
+            if resume:
+                # Rows written after the checkpoint are exported again
+                handle.truncate(state['offset'])
+            else:
+                handle.write(intestazione(formato))
+            exported = self._export(
+                queryset, formato, handle, checkpoint, options['chunk_size']
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Exported {exported} employers to {output}.')
+        )
+
+    def _export(self, queryset, formato, handle, checkpoint, chunk_size):
+        """Write employers one by one, checkpointing every chunk."""
+        exported = 0
+        last_pk = None
+        for datore in queryset.iterator(chunk_size=chunk_size):
+            handle.write(formatta(datore, formato))
+            exported += 1
+            last_pk = datore.pk
+            if exported % chunk_size == 0:
+                self._checkpoint(handle, checkpoint, last_pk)
+        if last_pk is not None:
+            self._checkpoint(handle, checkpoint, last_pk)
+        return exported
+
+    def _checkpoint(self, handle, checkpoint, last_pk):
+        """Record the last exported key and the output size up to it."""
+        handle.flush()
+        checkpoint.write_text(
+            json.dumps({'last_pk': str(last_pk), 'offset': handle.tell()})
+        )
@@ -0,0 +1,140 @@
+"""
+Management command to bulk import employers and their legal offices.
+
+Streams a CSV or XLSX file in chunks; see ``datoriLavoro.importazione``
+for the expected columns.
+"""
+
+import itertools
+import json
+import time
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+
+from server.apps.datoriLavoro.importazione import (
+    FormatoNonSupportatoError,
+    Importatore,
+    IndiceCitta,
+    a_blocchi,
+    leggi_righe,
+)
+from server.common.audit import impersonate
+
+
+class Command(BaseCommand):
+    """Bulk import of DatoreLavoro and Sede rows from CSV/XLSX files."""
+
+    help = 'Imports employers and legal offices from a CSV or XLSX file'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Define CLI arguments for the management command."""
+        parser.add_argument('path', type=Path, help='CSV or XLSX file.')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Rows validated and written per transaction.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=0,
+            help='Validation processes (0 validates in-process).',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the file without writing to the database.',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Skip the rows already committed by a previous run.',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            type=Path,
+            default=None,
+            help='Checkpoint file (default: <path>.checkpoint).',
+        )
+        parser.add_argument(
+            '--user',
+            default=None,
+            help='Username recorded as creator of the imported rows.',
+        )
+
+    def handle(self, *args, **options):
+        """Execute the command."""
+        path = options['path']
+        if not path.is_file():
+            raise CommandError(f'File not found: {path}')
+        user = self._user(options['user'])
+        checkpoint = options['checkpoint'] or path.with_name(
+            path.name + '.checkpoint'
+        )
+        done = 0
+        if options['resume'] and checkpoint.exists():
+            done = json.loads(checkpoint.read_text())['rows']
+            self.stdout.write(f'Resuming after row {done}.')
+
+        start = time.perf_counter()
+        try:
+            with impersonate(user):
+                created, skipped, errors = self._import(
+                    path, checkpoint, done, options, user
+                )
+        except FormatoNonSupportatoError as exc:
+            raise CommandError(str(exc)) from exc
+        elapsed = time.perf_counter() - start
+
+        for line, error in errors:
+            self.stderr.write(f'Row {line}: {error}')
+        processed = created + skipped + len(errors)
+        rate = processed / elapsed if elapsed else 0.0
+        prefix = '[dry-run] ' if options['dry_run'] else ''
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✓ {prefix}{processed} rows in {elapsed:.2f}s '
+                f'({rate:.0f} rows/s): {created} created, '
+                f'{skipped} already present, {len(errors)} errors.'
+            )
+        )
+
+    def _user(self, username):
+        """Resolve the acting user given with ``--user``."""
+        if username is None:
+            return None
+        user_model = get_user_model()
+        try:
+            return user_model.objects.get_by_natural_key(username)
+        except user_model.DoesNotExist as exc:
+            raise CommandError(f'User not found: {username}') from exc
+
+    def _import(self, path, checkpoint, done, options, user):
+        """Import the file chunk by chunk, saving a checkpoint after each."""
+        dry_run = options['dry_run']
+        rows = itertools.islice(leggi_righe(path), done, None)
+        created = skipped = 0
+        errors = []
+        with Importatore(
+            IndiceCitta.da_database(),
+            workers=options['workers'],
+            dry_run=dry_run,
+            user=user,
+        ) as importatore:
+            for chunk in a_blocchi(rows, options['chunk_size']):
+                # +2: riga di intestazione e numerazione da 1
+                esito = importatore.importa_blocco(chunk, done + 2)
+                done += len(chunk)
+                created += esito.creati
+                skipped += esito.saltati
+                errors.extend(esito.errori)
+                if not dry_run:
+                    checkpoint.write_text(json.dumps({'rows': done}))
+        return created, skipped, errors
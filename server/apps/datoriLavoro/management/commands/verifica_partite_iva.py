@@ -0,0 +1,91 @@
+"""
+Management command to verify Partite IVA on VIES in background.
+
+Drains the ``VerificaPartitaIva`` queue filled by ``DatoreLavoro.save()``.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+
+from server.apps.datoriLavoro.verifica import (
+    OpzioniWorker,
+    accoda_in_attesa,
+    esegui_lotto,
+)
+
+
+class Command(BaseCommand):
+    """Worker that verifies queued Partite IVA against VIES."""
+
+    help = 'Verifies queued Partite IVA on VIES with retries and backoff'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Define CLI arguments for the management command."""
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.VIES_WORKER_CONCURRENCY,
+            help='Maximum number of concurrent VIES requests.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=20,
+            help='Number of jobs claimed per batch.',
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=settings.VIES_WORKER_MAX_ATTEMPTS,
+            help='Attempts before marking a P.IVA as unreachable.',
+        )
+        parser.add_argument(
+            '--backoff',
+            type=int,
+            default=settings.VIES_WORKER_BACKOFF,
+            help='Base retry delay in seconds (doubled at each attempt).',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=5.0,
+            help='Seconds to wait when the queue is empty.',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the jobs currently due and exit.',
+        )
+        parser.add_argument(
+            '--enqueue-pending',
+            action='store_true',
+            help='Enqueue pending employers that have no open job first.',
+        )
+
+    def handle(self, *args, **options):
+        """Execute the command."""
+        opzioni = OpzioniWorker(
+            concurrency=options['concurrency'],
+            batch_size=options['batch_size'],
+            max_attempts=options['max_attempts'],
+            backoff=options['backoff'],
+        )
+        if options['enqueue_pending']:
+            queued = accoda_in_attesa()
+            self.stdout.write(f'Enqueued {queued} pending P.IVA.')
+
+        processed = 0
+        while True:
+            batch = esegui_lotto(opzioni)
+            processed += batch
+            if batch:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Processed {processed} verification jobs.')
+        )
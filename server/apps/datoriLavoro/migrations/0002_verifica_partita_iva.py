@@ -0,0 +1,149 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:07
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+import server.apps.datoriLavoro.models
+
+
+def _segna_p_iva_da_verificare(apps, schema_editor):
+    """Le Partite IVA già presenti vanno verificate dal worker."""
+    datore_lavoro = apps.get_model('datoriLavoro', 'DatoreLavoro')
+    datore_lavoro.objects.exclude(p_iva='').update(
+        stato_verifica_p_iva='pending'
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('datoriLavoro', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VerificaPartitaIva',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                (
+                    'p_iva',
+                    models.CharField(max_length=11, verbose_name='Partita IVA'),
+                ),
+                ('tentativi', models.PositiveSmallIntegerField(default=0)),
+                (
+                    'prossimo_tentativo_at',
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name='prossimo tentativo',
+                    ),
+                ),
+                (
+                    'completata_at',
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name='completata il'
+                    ),
+                ),
+                (
+                    'esito',
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ('pending', 'In attesa di verifica'),
+                            ('valid', 'Valida'),
+                            ('invalid', 'Non valida'),
+                            ('unreachable', 'VIES non raggiungibile'),
+                        ],
+                        default='',
+                        max_length=11,
+                    ),
+                ),
+                ('ultimo_errore', models.TextField(blank=True, default='')),
+                (
+                    'created_at',
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name='created at'
+                    ),
+                ),
+                (
+                    'datore_lavoro',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='verifiche_p_iva',
+                        to='datoriLavoro.datorelavoro',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'Verifica Partita IVA',
+                'verbose_name_plural': 'Verifiche Partita IVA',
+            },
+        ),
+        migrations.AddField(
+            model_name='datorelavoro',
+            name='stato_verifica_p_iva',
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ('pending', 'In attesa di verifica'),
+                    ('valid', 'Valida'),
+                    ('invalid', 'Non valida'),
+                    ('unreachable', 'VIES non raggiungibile'),
+                ],
+                default='',
+                max_length=11,
+                verbose_name='Verifica VIES',
+            ),
+        ),
+        migrations.RunPython(
+            _segna_p_iva_da_verificare,
+            migrations.RunPython.noop,
+        ),
+        migrations.AlterField(
+            model_name='datorelavoro',
+            name='p_iva',
+            field=models.CharField(
+                blank=True,
+                max_length=11,
+                validators=[
+                    server.apps.datoriLavoro.models.validate_p_iva_formale
+                ],
+                verbose_name='Partita IVA',
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='datorelavoro',
+            constraint=models.CheckConstraint(
+                condition=models.Q((
+                    'stato_verifica_p_iva__in',
+                    ['', 'pending', 'valid', 'invalid', 'unreachable'],
+                )),
+                name='datorelavoro_stato_verifica_p_iva_valid',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='verificapartitaiva',
+            index=models.Index(
+                condition=models.Q(('completata_at__isnull', True)),
+                fields=['prossimo_tentativo_at'],
+                name='verifica_piva_da_eseguire',
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='verificapartitaiva',
+            constraint=models.CheckConstraint(
+                condition=models.Q((
+                    'esito__in',
+                    ['', 'pending', 'valid', 'invalid', 'unreachable'],
+                )),
+                name='verificapartitaiva_esito_valid',
+            ),
+        ),
+    ]
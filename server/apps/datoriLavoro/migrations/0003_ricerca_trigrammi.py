@@ -0,0 +1,58 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:25
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import (
+    TrigramExtension,
+    UnaccentExtension,
+)
+from django.db import migrations, models
+
+import server.common.search
+
+
+def _indice(field_name, name):
+    return django.contrib.postgres.indexes.GinIndex(
+        django.contrib.postgres.indexes.OpClass(
+            django.db.models.functions.text.Lower(
+                server.common.search.ImmutableUnaccent(models.F(field_name))
+            ),
+            name='gin_trgm_ops',
+        ),
+        name=name,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('datoriLavoro', '0002_verifica_partita_iva'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        UnaccentExtension(),
+        migrations.RunSQL(
+            server.common.search.CREA_F_UNACCENT,
+            server.common.search.ELIMINA_F_UNACCENT,
+        ),
+        migrations.AddIndex(
+            model_name='datorelavoro',
+            index=_indice('ragione_sociale', 'datore_ragione_sociale_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='datorelavoro',
+            index=_indice('p_iva', 'datore_p_iva_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='datorelavoro',
+            index=_indice('codice_fiscale', 'datore_codice_fiscale_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='sede',
+            index=_indice('nome', 'sede_nome_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='sede',
+            index=_indice('indirizzo', 'sede_indirizzo_trgm'),
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Ricalcola la sede legale dei datori toccati da un'istruzione su
+# DatoreLavoroSede. Trigger per istruzione con tabelle di transizione:
+# un bulk_create di migliaia di righe esegue una sola UPDATE.
+_CREA_TRIGGER = """
+CREATE OR REPLACE FUNCTION datorelavoro_sync_sede_legale() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    datori uuid[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT datore_lavoro_id) INTO datori FROM nuove;
+    ELSIF TG_OP = 'UPDATE' THEN
+        SELECT array_agg(DISTINCT datore_lavoro_id) INTO datori FROM (
+            SELECT datore_lavoro_id FROM nuove
+            UNION ALL
+            SELECT datore_lavoro_id FROM vecchie
+        ) AS toccati;
+    ELSE
+        SELECT array_agg(DISTINCT datore_lavoro_id) INTO datori FROM vecchie;
+    END IF;
+
+    UPDATE "datoriLavoro_datorelavoro" AS datore
+    SET sede_legale_id = (
+        SELECT rel.sede_id
+        FROM "datoriLavoro_datorelavorosede" AS rel
+        WHERE rel.datore_lavoro_id = datore.id AND rel.is_sede_legale
+        ORDER BY rel.updated_at DESC
+        LIMIT 1
+    )
+    WHERE datore.id = ANY(datori);
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE TRIGGER datorelavorosede_sede_legale_insert
+AFTER INSERT ON "datoriLavoro_datorelavorosede"
+REFERENCING NEW TABLE AS nuove
+FOR EACH STATEMENT EXECUTE FUNCTION datorelavoro_sync_sede_legale();
+
+CREATE OR REPLACE TRIGGER datorelavorosede_sede_legale_update
+AFTER UPDATE ON "datoriLavoro_datorelavorosede"
+REFERENCING OLD TABLE AS vecchie NEW TABLE AS nuove
+FOR EACH STATEMENT EXECUTE FUNCTION datorelavoro_sync_sede_legale();
+
+CREATE OR REPLACE TRIGGER datorelavorosede_sede_legale_delete
+AFTER DELETE ON "datoriLavoro_datorelavorosede"
+REFERENCING OLD TABLE AS vecchie
+FOR EACH STATEMENT EXECUTE FUNCTION datorelavoro_sync_sede_legale();
+"""
+
+_ELIMINA_TRIGGER = """
+DROP TRIGGER IF EXISTS datorelavorosede_sede_legale_insert
+    ON "datoriLavoro_datorelavorosede";
+DROP TRIGGER IF EXISTS datorelavorosede_sede_legale_update
+    ON "datoriLavoro_datorelavorosede";
+DROP TRIGGER IF EXISTS datorelavorosede_sede_legale_delete
+    ON "datoriLavoro_datorelavorosede";
+DROP FUNCTION IF EXISTS datorelavoro_sync_sede_legale();
+"""
+
+_POPOLA_SEDE_LEGALE = """
+UPDATE "datoriLavoro_datorelavoro" AS datore
+SET sede_legale_id = rel.sede_id
+FROM "datoriLavoro_datorelavorosede" AS rel
+WHERE rel.datore_lavoro_id = datore.id AND rel.is_sede_legale;
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('datoriLavoro', '0003_ricerca_trigrammi'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datorelavoro',
+            name='sede_legale',
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name='+',
+                to='datoriLavoro.sede',
+                verbose_name='Sede legale',
+            ),
+        ),
+        migrations.RunSQL(_CREA_TRIGGER, _ELIMINA_TRIGGER),
+        migrations.RunSQL(_POPOLA_SEDE_LEGALE, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:10
+
+from django.db import migrations, models
+
+# Ogni datore con almeno una sede associata deve averne esattamente una
+# legale. Il trigger di vincolo è differito: la verifica avviene al
+# commit, così lo scambio della sede legale in più istruzioni e gli
+# import in blocco passano senza controlli riga per riga lato Python.
+_CREA_VINCOLO = """
+CREATE OR REPLACE FUNCTION datorelavorosede_verifica_sede_legale()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    datori uuid[] := '{}';
+    datore uuid;
+    sedi integer;
+    legali integer;
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        datori := datori || OLD.datore_lavoro_id;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        datori := datori || NEW.datore_lavoro_id;
+    END IF;
+
+    FOREACH datore IN ARRAY datori LOOP
+        CONTINUE WHEN datore IS NULL;
+        SELECT count(*), count(*) FILTER (WHERE is_sede_legale)
+        INTO sedi, legali
+        FROM "datoriLavoro_datorelavorosede"
+        WHERE datore_lavoro_id = datore;
+
+        IF sedi > 0 AND legali <> 1 THEN
+            RAISE EXCEPTION
+                'Il datore di lavoro % deve avere esattamente una sede '
+                'legale (trovate %).', datore, legali
+                USING ERRCODE = 'check_violation',
+                      CONSTRAINT = 'datorelavorosede_una_sede_legale';
+        END IF;
+    END LOOP;
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS datorelavorosede_una_sede_legale
+    ON "datoriLavoro_datorelavorosede";
+CREATE CONSTRAINT TRIGGER datorelavorosede_una_sede_legale
+AFTER INSERT OR DELETE OR UPDATE OF datore_lavoro_id, is_sede_legale
+ON "datoriLavoro_datorelavorosede"
+DEFERRABLE INITIALLY DEFERRED
+FOR EACH ROW EXECUTE FUNCTION datorelavorosede_verifica_sede_legale();
+"""
+
+_ELIMINA_VINCOLO = """
+DROP TRIGGER IF EXISTS datorelavorosede_una_sede_legale
+    ON "datoriLavoro_datorelavorosede";
+DROP FUNCTION IF EXISTS datorelavorosede_verifica_sede_legale();
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('datoriLavoro', '0004_datorelavoro_sede_legale'),
+    ]
+
+    operations = [
+        migrations.AlterConstraint(
+            model_name='datorelavorosede',
+            name='unique_legal_office_for_each_sede',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(('is_sede_legale', True)),
+                fields=('sede', 'is_sede_legale'),
+                name='unique_legal_office_for_each_sede',
+                violation_error_message=(
+                    'Questa sede è già impostata come sede legale per '
+                    'un altro datore di lavoro.'
+                ),
+            ),
+        ),
+        migrations.RunSQL(_CREA_VINCOLO, _ELIMINA_VINCOLO),
+    ]
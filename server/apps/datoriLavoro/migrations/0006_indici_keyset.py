@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-17 05:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('datoriLavoro', '0005_vincolo_sede_legale_unica'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='datorelavoro',
+            index=models.Index(
+                fields=['created_at', 'id'], name='datore_created_at_id_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='sede',
+            index=models.Index(
+                fields=['created_at', 'id'], name='sede_created_at_id_idx'
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-17 05:40
+
+from django.db import migrations, models
+
+import server.common.models
+
+
+def _id():
+    return models.UUIDField(
+        default=server.common.models.uuid7,
+        editable=False,
+        primary_key=True,
+        serialize=False,
+        verbose_name='id',
+    )
+
+
+# Cambia solo il default lato Python: gli id esistenti (v4) restano
+# validi e convivono con i nuovi v7, nessuna riga viene riscritta.
+class Migration(migrations.Migration):
+    dependencies = [
+        ('datoriLavoro', '0006_indici_keyset'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='datorelavoro', name='id', field=_id()
+        ),
+        migrations.AlterField(model_name='sede', name='id', field=_id()),
+        migrations.AlterField(
+            model_name='datorelavorosede', name='id', field=_id()
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:10
+
+from django.db import migrations, models
+
+
+def _indice_attivi(name):
+    return models.Index(
+        condition=models.Q(('is_active', True)),
+        fields=['created_at', 'id'],
+        name=name,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('datoriLavoro', '0007_id_uuid7'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='datorelavoro',
+            index=_indice_attivi('datore_attivi_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sede',
+            index=_indice_attivi('sede_attive_keyset_idx'),
+        ),
+    ]
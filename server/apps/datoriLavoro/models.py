@@ -5,11 +5,19 @@ import codicefiscale as cf
 from django.db import models
 from django.db.models import Q, UniqueConstraint
 from django.forms import ValidationError
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from verify_vat_number.vies import get_from_eu_vies
 
+from server.apps.datoriLavoro.partita_iva import is_p_iva_formalmente_valida
+from server.apps.datoriLavoro.vies import (
+    ViesNonDisponibile,
+    normalizza_p_iva,
+    vies_cache,
+)
+from server.apps.main.logic.geo import tabella_geo
 from server.apps.main.models import CityProxy
 from server.common.models import BaseModel
+from server.common.search import indice_trigrammi
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +25,8 @@ logger = logging.getLogger(__name__)
 class Sede(BaseModel):
     """Modello per le sedi dei datori di lavoro."""
 
+    registra_storico = True
+
     nome = models.CharField(max_length=100, blank=False, default='---')
     indirizzo = models.CharField(max_length=255, blank=True, default='')
     citta = models.ForeignKey(
@@ -29,24 +39,73 @@ class Sede(BaseModel):
     def __str__(self):
         """Rappresentazione stringa della Sede."""
         result = self.nome or 'Anonima'
-        return result + ' - ' + str(self.citta)
+        # La città dalla tabella geografica in memoria, senza query; dal
+        # database solo se non c'è ancora (creata da un altro worker)
+        citta = tabella_geo().citta(self.citta_id) or self.citta
+        return result + ' - ' + str(citta)
 
     class Meta:
         verbose_name = 'Sede'
         verbose_name_plural = 'Sedi'
+        # Indici per la ricerca e la paginazione keyset dell'admin
+        # (vedi server.common.search e server.common.paginazione)
+        indexes: ClassVar[list[models.Index]] = [
+            indice_trigrammi('nome', 'sede_nome_trgm'),
+            indice_trigrammi('indirizzo', 'sede_indirizzo_trgm'),
+            models.Index(
+                fields=['created_at', 'id'], name='sede_created_at_id_idx'
+            ),
+            # Changelist predefinita: solo le sedi attive (SoloAttiviMixin)
+            models.Index(
+                fields=['created_at', 'id'],
+                name='sede_attive_keyset_idx',
+                condition=Q(is_active=True),
+            ),
+        ]
 
 
 def validate_p_iva_italiana(value):
-    """Valida che la Partita IVA sia italiana e valida."""
-    try:
-        data = get_from_eu_vies('IT' + value)
-        logger.info('P IVA VALIDA? %s', data)
+    """Valida che la Partita IVA sia italiana e valida.
 
+    I controlli formali (lunghezza, cifre, codice ufficio, cifra di
+    controllo) vengono eseguiti offline prima di interrogare VIES.
+    L'esito della verifica VIES viene memorizzato in cache
+    (vedi ``server.apps.datoriLavoro.vies``). Se VIES non è disponibile
+    (circuito aperto o timeout) basta la verifica formale.
+    """
+    if not is_p_iva_formalmente_valida(normalizza_p_iva(value)):
+        raise ValidationError(
+            _('%(value)s non è una Partita IVA italiana valida.'),
+            params={'value': value},
+        )
+    try:
+        valid = vies_cache.is_valid(value)
+    except ViesNonDisponibile:
+        logger.warning('VIES non disponibile, P.IVA %s non verificata', value)
+        return
     except Exception as exc:
         raise ValidationError(
             _('%(value)s non è una Partita IVA italiana valida.'),
             params={'value': value},
         ) from exc
+    if not valid:
+        raise ValidationError(
+            _('%(value)s non è una Partita IVA italiana valida.'),
+            params={'value': value},
+        )
+
+
+def validate_p_iva_formale(value):
+    """Valida offline la Partita IVA (senza interrogare VIES).
+
+    È il validatore usato dal campo ``DatoreLavoro.p_iva``: la verifica
+    VIES avviene in background (vedi ``server.apps.datoriLavoro.verifica``).
+    """
+    if not is_p_iva_formalmente_valida(normalizza_p_iva(value)):
+        raise ValidationError(
+            _('%(value)s non è una Partita IVA italiana valida.'),
+            params={'value': value},
+        )
 
 
 def validate_codice_fiscale(value):
@@ -58,9 +117,24 @@ def validate_codice_fiscale(value):
         )
 
 
+# Partita IVA non letta dal database (campo differito)
+_NON_CARICATA = object()
+
+
+class StatoVerificaPartitaIva(models.TextChoices):
+    """Esito della verifica VIES della Partita IVA."""
+
+    PENDING = 'pending', _('In attesa di verifica')
+    VALID = 'valid', _('Valida')
+    INVALID = 'invalid', _('Non valida')
+    UNREACHABLE = 'unreachable', _('VIES non raggiungibile')
+
+
 class DatoreLavoro(BaseModel):
     """Modello per i Datori di Lavoro."""
 
+    registra_storico = True
+
     ragione_sociale = models.CharField(
         max_length=255,
         verbose_name=_('Ragione Sociale'),
@@ -70,7 +144,14 @@ class DatoreLavoro(BaseModel):
         max_length=11,
         verbose_name=_('Partita IVA'),
         blank=True,
-        validators=[validate_p_iva_italiana],
+        validators=[validate_p_iva_formale],
+    )
+    stato_verifica_p_iva = models.CharField(
+        max_length=11,
+        choices=StatoVerificaPartitaIva,
+        blank=True,
+        default='',
+        verbose_name=_('Verifica VIES'),
     )
     codice_fiscale = models.CharField(
         max_length=16,
@@ -85,6 +166,18 @@ class DatoreLavoro(BaseModel):
         related_name='datori_lavoro',
         verbose_name=_('Sedi'),
     )
+    # Copia della sede legale per evitare la join su DatoreLavoroSede:
+    # la scrive solo il trigger ``datorelavoro_sync_sede_legale``
+    # (migrazione 0004) a ogni modifica delle sedi associate
+    sede_legale = models.ForeignKey(
+        Sede,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='+',
+        verbose_name=_('Sede legale'),
+    )
 
     def __str__(self):
         """Rappresentazione stringa del Datore di Lavoro."""
@@ -93,6 +186,48 @@ class DatoreLavoro(BaseModel):
     class Meta:
         verbose_name = 'Datore di Lavoro'
         verbose_name_plural = 'Datori di Lavoro'
+        constraints: ClassVar[list[models.CheckConstraint]] = [
+            models.CheckConstraint(
+                condition=Q(
+                    stato_verifica_p_iva__in=[
+                        '',
+                        *StatoVerificaPartitaIva.values,
+                    ]
+                ),
+                name='datorelavoro_stato_verifica_p_iva_valid',
+            ),
+        ]
+        # Indici per la ricerca e la paginazione keyset dell'admin
+        # (vedi server.common.search e server.common.paginazione)
+        indexes: ClassVar[list[models.Index]] = [
+            indice_trigrammi('ragione_sociale', 'datore_ragione_sociale_trgm'),
+            indice_trigrammi('p_iva', 'datore_p_iva_trgm'),
+            indice_trigrammi('codice_fiscale', 'datore_codice_fiscale_trgm'),
+            models.Index(
+                fields=['created_at', 'id'], name='datore_created_at_id_idx'
+            ),
+            # Changelist predefinita: solo i datori attivi (SoloAttiviMixin)
+            models.Index(
+                fields=['created_at', 'id'],
+                name='datore_attivi_keyset_idx',
+                condition=Q(is_active=True),
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Memorizza la Partita IVA caricata per rilevarne le modifiche."""
+        instance = super().from_db(db, field_names, values)
+        instance._p_iva_caricata = instance.__dict__.get(  # noqa: SLF001
+            'p_iva', _NON_CARICATA
+        )
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        """Una Partita IVA differita, letta dopo, è quella caricata."""
+        super().refresh_from_db(using, fields, from_queryset)
+        if fields is None or 'p_iva' in fields:
+            self._p_iva_caricata = self.p_iva
 
     def clean(self):
         """Validazione personalizzata per DatoreLavoro."""
@@ -105,12 +240,59 @@ class DatoreLavoro(BaseModel):
                 'Codice Fiscale.'
             )
 
+    def _p_iva_modificata(self, update_fields):
+        """Se il salvataggio scrive una Partita IVA nuova o diversa.
+
+        Se ``p_iva`` era differita al caricamento (``only``/``defer``) e
+        non è stata letta dopo, il valore di partenza non è noto: conta
+        come modificata solo se è stata assegnata.
+        """
+        if update_fields is not None and 'p_iva' not in update_fields:
+            return False
+        caricata = getattr(self, '_p_iva_caricata', None)
+        if caricata is _NON_CARICATA:
+            return 'p_iva' in self.__dict__
+        return self.p_iva != caricata
+
+    def _campi_da_salvare(self, update_fields):
+        """Un salvataggio completo aggiorna tutto tranne ``sede_legale``.
+
+        La sede legale la aggiorna il trigger: salvarla di nuovo la
+        sovrascriverebbe con il valore caricato in memoria.
+        """
+        if self._state.adding or update_fields is not None:
+            return update_fields
+        return [
+            field.name
+            for field in self._meta.concrete_fields
+            if not field.primary_key and field.name != 'sede_legale'
+        ]
+
     def save(self, *args, **kwargs):
         """Override del metodo save per personalizzare il salvataggio."""
         # Assicurati che il codice fiscale sia sempre in maiuscolo
         if self.codice_fiscale:
             self.codice_fiscale = self.codice_fiscale.upper()
+        # Una Partita IVA nuova o modificata va (ri)verificata su VIES
+        update_fields = kwargs.get('update_fields')
+        da_verificare = self._p_iva_modificata(update_fields)
+        if da_verificare:
+            self.stato_verifica_p_iva = (
+                StatoVerificaPartitaIva.PENDING if self.p_iva else ''
+            )
+            if update_fields is not None:
+                kwargs['update_fields'] = {
+                    *update_fields,
+                    'stato_verifica_p_iva',
+                }
+        kwargs['update_fields'] = self._campi_da_salvare(
+            kwargs.get('update_fields')
+        )
         super().save(*args, **kwargs)
+        if da_verificare:
+            self._p_iva_caricata = self.p_iva
+            if self.p_iva:
+                VerificaPartitaIva.accoda(self)
 
 
 class DatoreLavoroSede(BaseModel):
@@ -133,13 +315,19 @@ class DatoreLavoroSede(BaseModel):
     )
 
     class Meta:
-        # Vincoli per garantire l'integrità dei dati
+        # Vincoli per garantire l'integrità dei dati. Che ogni datore con
+        # almeno una sede ne abbia esattamente una legale lo verifica al
+        # commit il trigger ``datorelavorosede_una_sede_legale``.
         constraints: ClassVar[list[UniqueConstraint]] = [
             # Una Sede può essere "sede legale" solo per un Datore di Lavoro
             UniqueConstraint(
                 fields=['sede', 'is_sede_legale'],
                 name='unique_legal_office_for_each_sede',
                 condition=Q(is_sede_legale=True),
+                violation_error_message=_(
+                    'Questa sede è già impostata come sede legale per '
+                    'un altro datore di lavoro.'
+                ),
             ),
             # La stessa sede non può essere associata
             # due volte allo stesso datore di lavoro
@@ -152,20 +340,72 @@ class DatoreLavoroSede(BaseModel):
         verbose_name = 'Sede associata'
         verbose_name_plural = 'Sedi asscociate'
 
-    def clean(self):
-        """Validazione personalizzata per DatoreLavoroSede."""
-        # Impedisce di impostare is_sede_legale a True se la sede
-        # è già sede legale per un altro datore di lavoro.
-        if self.is_sede_legale:
-            qs = DatoreLavoroSede.objects.filter(
-                sede=self.sede, is_sede_legale=True
-            )
-            # Se stiamo modificando un'associazione esistente, escludiamola.
-            if self.pk:
-                qs = qs.exclude(pk=self.pk)
 
-            if qs.exists():
-                raise ValidationError(
-                    'Questa sede è già impostata come sede legale per '
-                    'un altro datore di lavoro.'
-                )
+class VerificaPartitaIva(models.Model):
+    """Richiesta di verifica VIES in coda per un Datore di Lavoro.
+
+    Le righe vengono prelevate dal comando ``verifica_partite_iva``;
+    ``prossimo_tentativo_at`` indica quando la richiesta è eseguibile
+    e, durante l'elaborazione, funge da lease del worker.
+    """
+
+    datore_lavoro = models.ForeignKey(
+        DatoreLavoro,
+        on_delete=models.CASCADE,
+        related_name='verifiche_p_iva',
+        db_index=True,
+    )
+    p_iva = models.CharField(max_length=11, verbose_name=_('Partita IVA'))
+    tentativi = models.PositiveSmallIntegerField(default=0)
+    prossimo_tentativo_at = models.DateTimeField(
+        default=timezone.now, verbose_name=_('prossimo tentativo')
+    )
+    completata_at = models.DateTimeField(
+        null=True, blank=True, verbose_name=_('completata il')
+    )
+    esito = models.CharField(
+        max_length=11,
+        choices=StatoVerificaPartitaIva,
+        blank=True,
+        default='',
+    )
+    ultimo_errore = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Verifica Partita IVA'
+        verbose_name_plural = 'Verifiche Partita IVA'
+        indexes: ClassVar[list[models.Index]] = [
+            # Solo le richieste ancora aperte vengono interrogate dal worker
+            models.Index(
+                fields=['prossimo_tentativo_at'],
+                name='verifica_piva_da_eseguire',
+                condition=Q(completata_at__isnull=True),
+            ),
+        ]
+        constraints: ClassVar[list[models.CheckConstraint]] = [
+            models.CheckConstraint(
+                condition=Q(
+                    esito__in=['', *StatoVerificaPartitaIva.values],
+                ),
+                name='verificapartitaiva_esito_valid',
+            ),
+        ]
+
+    @classmethod
+    def accoda(cls, datore_lavoro):
+        """Accoda la verifica della Partita IVA corrente del datore.
+
+        Le richieste ancora aperte per lo stesso datore vengono scartate:
+        conta solo l'ultima Partita IVA salvata.
+        """
+        cls.objects.filter(
+            datore_lavoro=datore_lavoro, completata_at__isnull=True
+        ).delete()
+        return cls.objects.create(
+            datore_lavoro=datore_lavoro, p_iva=datore_lavoro.p_iva
+        )
+
+    def __str__(self):
+        """Rappresentazione stringa della richiesta di verifica."""
+        return f'{self.p_iva} ({self.tentativi} tentativi)'
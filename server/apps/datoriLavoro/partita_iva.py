@@ -0,0 +1,44 @@
+"""Verifica formale (offline) della Partita IVA italiana.
+
+La Partita IVA è composta da 11 cifre: le prime 7 sono la matricola del
+contribuente, le successive 3 il codice dell'ufficio provinciale e
+l'ultima è il carattere di controllo calcolato con l'algoritmo di Luhn.
+La verifica non richiede chiamate di rete e va eseguita prima di VIES.
+"""
+
+_P_IVA_LENGTH = 11
+# Matricola mai assegnata: le prime 7 cifre tutte a zero
+_MATRICOLA_NULLA = '0000000'
+
+# Codici ufficio ammessi: 001-100 (uffici provinciali), 120 e 121
+# (Monza e Brianza, Fermo), 888 (Ministero) e 999 (soggetti esteri)
+_CODICI_UFFICIO = frozenset((*range(1, 101), 120, 121, 888, 999))
+
+
+def carattere_controllo(digits: str) -> int:
+    """Calcola la cifra di controllo (Luhn) sulle prime 10 cifre."""
+    total = 0
+    for index, char in enumerate(digits):
+        digit = int(char)
+        if index % 2:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        total += digit
+    return (10 - total % 10) % 10
+
+
+def is_p_iva_formalmente_valida(value: str) -> bool:
+    """Restituisce True se la Partita IVA supera i controlli formali.
+
+    Controlla lunghezza, solo cifre, matricola non nulla, codice ufficio
+    provinciale e cifra di controllo. Non verifica che la Partita IVA
+    sia attiva.
+    """
+    if len(value) != _P_IVA_LENGTH or not value.isascii():
+        return False
+    if not value.isdigit() or value[:7] == _MATRICOLA_NULLA:
+        return False
+    if int(value[7:10]) not in _CODICI_UFFICIO:
+        return False
+    return carattere_controllo(value[:10]) == int(value[10])
@@ -0,0 +1,140 @@
+"""Coda di verifica VIES delle Partite IVA, eseguita in background.
+
+Il salvataggio di un ``DatoreLavoro`` con Partita IVA nuova o modificata
+accoda una ``VerificaPartitaIva`` e imposta lo stato a ``pending``.
+Il comando ``verifica_partite_iva`` preleva le richieste scadute con
+``SELECT ... FOR UPDATE SKIP LOCKED`` (più worker possono girare in
+parallelo), interroga VIES con concorrenza limitata e aggiorna lo stato.
+Gli errori transitori vengono ritentati con backoff esponenziale; esauriti
+i tentativi lo stato diventa ``unreachable``.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from server.apps.datoriLavoro.models import (
+    DatoreLavoro,
+    StatoVerificaPartitaIva,
+    VerificaPartitaIva,
+)
+from server.apps.datoriLavoro.vies import vies_cache
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class OpzioniWorker:
+    """Parametri di esecuzione del worker di verifica."""
+
+    concurrency: int = 4
+    batch_size: int = 20
+    max_attempts: int = 5
+    backoff: int = 60
+    # Oltre questo tempo una richiesta prelevata e non completata
+    # torna disponibile per altri worker
+    lease: int = 300
+
+
+def preleva_verifiche(opzioni):
+    """Preleva (e riserva) un lotto di richieste da eseguire."""
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            VerificaPartitaIva.objects.select_for_update(skip_locked=True)
+            .filter(completata_at__isnull=True, prossimo_tentativo_at__lte=now)
+            .order_by('prossimo_tentativo_at')[: opzioni.batch_size]
+        )
+        VerificaPartitaIva.objects.filter(
+            pk__in=[job.pk for job in jobs]
+        ).update(prossimo_tentativo_at=now + timedelta(seconds=opzioni.lease))
+    return jobs
+
+
+def _verifica(p_iva):
+    """Restituisce (esito, errore) per una Partita IVA."""
+    try:
+        valid = vies_cache.is_valid(p_iva)
+    except Exception as exc:  # errore transitorio: VIES, rete, timeout
+        return None, repr(exc)
+    if valid:
+        return StatoVerificaPartitaIva.VALID, ''
+    return StatoVerificaPartitaIva.INVALID, ''
+
+
+def _registra_esito(job, esito, errore, opzioni):
+    """Aggiorna richiesta e datore di lavoro con l'esito della verifica."""
+    now = timezone.now()
+    job.tentativi += 1
+    job.ultimo_errore = errore
+    if esito is None:
+        if job.tentativi < opzioni.max_attempts:
+            ritardo = opzioni.backoff * 2 ** (job.tentativi - 1)
+            job.prossimo_tentativo_at = now + timedelta(seconds=ritardo)
+            job.save(
+                update_fields=[
+                    'tentativi',
+                    'ultimo_errore',
+                    'prossimo_tentativo_at',
+                ]
+            )
+            return
+        esito = StatoVerificaPartitaIva.UNREACHABLE
+
+    job.esito = esito
+    job.completata_at = now
+    with transaction.atomic():
+        job.save(
+            update_fields=[
+                'tentativi',
+                'ultimo_errore',
+                'esito',
+                'completata_at',
+            ]
+        )
+        # Se nel frattempo la Partita IVA è cambiata l'esito è obsoleto
+        DatoreLavoro.objects.filter(
+            pk=job.datore_lavoro_id, p_iva=job.p_iva
+        ).update(stato_verifica_p_iva=esito)
+
+
+def esegui_lotto(opzioni):
+    """Esegue un lotto di verifiche; restituisce il numero di richieste."""
+    jobs = preleva_verifiche(opzioni)
+    if not jobs:
+        return 0
+    # I thread fanno solo le chiamate VIES, le scritture restano qui
+    with ThreadPoolExecutor(max_workers=opzioni.concurrency) as executor:
+        esiti = list(executor.map(_verifica, [job.p_iva for job in jobs]))
+    for job, (esito, errore) in zip(jobs, esiti, strict=True):
+        _registra_esito(job, esito, errore, opzioni)
+        logger.info('Verifica P.IVA %s: %s', job.p_iva, esito or errore)
+    return len(jobs)
+
+
+def accoda_in_attesa():
+    """Accoda i datori in stato ``pending`` senza richieste aperte.
+
+    Serve per i dati preesistenti o caricati senza passare da ``save()``.
+    """
+    richieste_aperte = VerificaPartitaIva.objects.filter(
+        datore_lavoro=OuterRef('pk'), completata_at__isnull=True
+    )
+    datori = (
+        DatoreLavoro.objects.filter(
+            ~Exists(richieste_aperte),
+            stato_verifica_p_iva=StatoVerificaPartitaIva.PENDING,
+        )
+        .exclude(p_iva='')
+        .only('pk', 'p_iva')
+    )
+    jobs = VerificaPartitaIva.objects.bulk_create(
+        VerificaPartitaIva(datore_lavoro=datore, p_iva=datore.p_iva)
+        for datore in datori.iterator()
+    )
+    return len(jobs)
@@ -0,0 +1,324 @@
+"""Verifica delle Partite IVA italiane tramite VIES con cache persistente.
+
+Le risposte VIES (sia positive che negative) vengono salvate nel framework
+di cache di Django, con chiave la Partita IVA normalizzata e TTL distinti.
+Alla scadenza del TTL la voce resta servibile per una finestra di
+"stale": la risposta in cache viene restituita subito e la verifica
+viene ripetuta in background (stale-while-revalidate).
+
+Le chiamate VIES passano da un circuit breaker il cui stato è nella
+stessa cache (``VIES_CACHE_ALIAS``, su database: condivisa tra i worker
+gunicorn e il comando ``verifica_partite_iva``) e hanno un budget di
+latenza: oltre ``VIES_TIMEOUT`` secondi la richiesta non resta bloccata
+e viene sollevato ``ViesNonDisponibile``.
+"""
+
+import logging
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import caches
+from verify_vat_number.exceptions import VatNotFound
+from verify_vat_number.vies import SERVICE_URL
+from zeep import Client
+from zeep.transports import Transport
+
+from server.common.audit import nel_contesto
+
+logger = logging.getLogger(__name__)
+
+_CACHE_KEY_PREFIX = 'vies:p_iva:'
+_LOCK_KEY_PREFIX = 'vies:p_iva:lock:'
+_CIRCUIT_KEY_PREFIX = 'vies:circuit:'
+
+# Thread che eseguono le chiamate VIES: il thread chiamante attende al
+# massimo VIES_TIMEOUT secondi, il thread al più il timeout di zeep
+_vies_executor = ThreadPoolExecutor(
+    max_workers=8, thread_name_prefix='vies-client'
+)
+
+
+class ViesNonDisponibile(Exception):  # noqa: N818
+    """VIES non interrogabile: circuito aperto o budget di latenza esaurito."""
+
+
+def normalizza_p_iva(value: str) -> str:
+    """Normalizza una Partita IVA: senza spazi, senza prefisso ``IT``."""
+    return ''.join(value.split()).upper().removeprefix('IT')
+
+
+def interroga_vies(vat_number: str) -> Any:
+    """Interroga VIES per ``vat_number`` (con il prefisso del paese).
+
+    Come ``get_from_eu_vies`` di ``verify_vat_number``, che però crea il
+    client zeep senza timeout sull'operazione: una chiamata appesa
+    terrebbe occupato per sempre un thread di ``_vies_executor``. Qui
+    WSDL e ``checkVat`` scadono dopo ``VIES_TIMEOUT`` secondi. Solleva
+    ``VatNotFound`` se la Partita IVA non esiste.
+    """
+    transport = Transport(
+        timeout=settings.VIES_TIMEOUT,
+        operation_timeout=settings.VIES_TIMEOUT,
+    )
+    client = Client(wsdl=SERVICE_URL, transport=transport)
+    data = client.service.checkVat(
+        countryCode=vat_number[:2], vatNumber=vat_number[2:]
+    )
+    if not data.valid:
+        raise VatNotFound
+    return data
+
+
+def _run_in_thread(func: Callable[[], None]) -> None:
+    """Esegue ``func`` in un thread daemon (default per la rivalidazione)."""
+    threading.Thread(target=nel_contesto(func), daemon=True).start()
+
+
+class ViesCircuitBreaker:
+    """Circuit breaker per VIES con stato condiviso nella cache.
+
+    - chiuso: le chiamate passano, i fallimenti consecutivi sono contati;
+    - aperto: dopo ``VIES_CIRCUIT_FAILURE_THRESHOLD`` fallimenti le
+      chiamate vengono rifiutate subito per ``VIES_CIRCUIT_RESET_TIMEOUT``
+      secondi;
+    - semi-aperto: trascorso il timeout una sola chiamata di prova
+      (tra tutti i worker) viene lasciata passare; se riesce il circuito
+      si chiude, altrimenti si riapre.
+
+    Le transizioni sono contate in cache (vedi ``metrics``) e loggate.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    @property
+    def cache(self):
+        """Restituisce il backend di cache configurato."""
+        return caches[settings.VIES_CACHE_ALIAS]
+
+    def _key(self, name: str) -> str:
+        return _CIRCUIT_KEY_PREFIX + name
+
+    @property
+    def state(self) -> str:
+        """Stato corrente del circuito."""
+        opened_at = self.cache.get(self._key('opened_at'))
+        if opened_at is None:
+            return self.CLOSED
+        if time.time() - opened_at < settings.VIES_CIRCUIT_RESET_TIMEOUT:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def allow_request(self) -> bool:
+        """True se la chiamata può essere eseguita."""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.OPEN:
+            return False
+        # Semi-aperto: passa solo la prima chiamata di prova. Il lock
+        # scade comunque se il worker della prova non registra l'esito.
+        return self.cache.add(
+            self._key('probe'), 1, timeout=settings.VIES_TIMEOUT * 2
+        )
+
+    def record_success(self) -> None:
+        """Registra una chiamata riuscita (chiude il circuito se aperto)."""
+        if self.cache.get(self._key('opened_at')) is not None:
+            self.cache.delete_many([
+                self._key('opened_at'),
+                self._key('probe'),
+            ])
+            self._transition(self.CLOSED)
+        self.cache.delete(self._key('failures'))
+
+    def record_failure(self) -> None:
+        """Registra un fallimento (apre il circuito oltre la soglia)."""
+        if self.cache.get(self._key('opened_at')) is not None:
+            # Prova fallita in semi-apertura: si riapre il circuito
+            self._open()
+            return
+        self.cache.add(self._key('failures'), 0, timeout=None)
+        failures = self.cache.incr(self._key('failures'))
+        if failures >= settings.VIES_CIRCUIT_FAILURE_THRESHOLD:
+            self._open()
+
+    def call(self, func: Callable[[str], Any], vat_number: str) -> Any:
+        """Esegue ``func`` rispettando circuito e budget di latenza.
+
+        ``VatNotFound`` è una risposta valida di VIES e non conta come
+        fallimento; ogni altra eccezione sì.
+        """
+        if not self.allow_request():
+            raise ViesNonDisponibile('Circuito VIES aperto')
+        future = _vies_executor.submit(nel_contesto(func, vat_number))
+        try:
+            result = future.result(timeout=settings.VIES_TIMEOUT)
+        except VatNotFound:
+            self.record_success()
+            raise
+        except FutureTimeoutError as exc:
+            self.record_failure()
+            raise ViesNonDisponibile('Timeout VIES') from exc
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def metrics(self) -> dict[str, Any]:
+        """Stato e contatori delle transizioni del circuito."""
+        return {
+            'state': self.state,
+            'failures': self.cache.get(self._key('failures'), 0),
+            'opened': self.cache.get(self._key('transitions:open'), 0),
+            'closed': self.cache.get(self._key('transitions:closed'), 0),
+        }
+
+    def reset(self) -> None:
+        """Riporta il circuito allo stato chiuso e azzera le metriche."""
+        self.cache.delete_many([
+            self._key(name)
+            for name in (
+                'opened_at',
+                'probe',
+                'failures',
+                'transitions:open',
+                'transitions:closed',
+            )
+        ])
+
+    def _open(self) -> None:
+        self.cache.set(self._key('opened_at'), time.time(), timeout=None)
+        self.cache.delete_many([self._key('probe'), self._key('failures')])
+        self._transition(self.OPEN)
+
+    def _transition(self, state: str) -> None:
+        key = self._key(f'transitions:{state}')
+        self.cache.add(key, 0, timeout=None)
+        self.cache.incr(key)
+        logger.warning('Circuito VIES: %s', state)
+
+
+vies_breaker = ViesCircuitBreaker()
+
+
+class ViesLookupCache:
+    """Cache delle verifiche VIES con TTL positivo/negativo e stale.
+
+    ``fetch`` è la funzione che interroga VIES: solleva ``VatNotFound``
+    se la Partita IVA non esiste, qualunque altra eccezione è considerata
+    un errore transitorio e non viene memorizzata. Le chiamate passano
+    dal circuit breaker ``breaker``.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Any] | None = None,
+        background: Callable[[Callable[[], None]], None] = _run_in_thread,
+        breaker: ViesCircuitBreaker = vies_breaker,
+    ) -> None:
+        """Inizializza la cache con la funzione di lookup e lo scheduler."""
+        self._fetch = fetch
+        self._background = background
+        self._breaker = breaker
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        """Restituisce il backend di cache configurato."""
+        return caches[settings.VIES_CACHE_ALIAS]
+
+    @property
+    def hit_ratio(self) -> float:
+        """Percentuale di lookup serviti dalla cache (fresh o stale)."""
+        total = self.hits + self.stale_hits + self.misses
+        if not total:
+            return 0.0
+        return (self.hits + self.stale_hits) / total
+
+    def reset_stats(self) -> None:
+        """Azzera i contatori di hit/miss."""
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def is_valid(self, value: str) -> bool:
+        """Restituisce True se VIES riconosce la Partita IVA come valida.
+
+        Gli errori transitori di VIES vengono propagati al chiamante
+        solo se non esiste una voce in cache (anche scaduta).
+        """
+        p_iva = normalizza_p_iva(value)
+        entry = self.cache.get(_CACHE_KEY_PREFIX + p_iva)
+        if entry is None:
+            self.misses += 1
+            return self._refresh(p_iva)
+
+        ttl = (
+            settings.VIES_CACHE_POSITIVE_TTL
+            if entry['valid']
+            else settings.VIES_CACHE_NEGATIVE_TTL
+        )
+        if time.time() - entry['checked_at'] < ttl:
+            self.hits += 1
+        else:
+            self.stale_hits += 1
+            self._schedule_revalidation(p_iva)
+        return entry['valid']
+
+    def invalidate(self, value: str) -> None:
+        """Rimuove dalla cache la voce relativa alla Partita IVA."""
+        self.cache.delete(_CACHE_KEY_PREFIX + normalizza_p_iva(value))
+
+    def _lookup(self, p_iva: str) -> bool:
+        fetch = self._fetch or interroga_vies
+        try:
+            data = self._breaker.call(fetch, 'IT' + p_iva)
+        except VatNotFound:
+            return False
+        logger.info('P IVA VALIDA? %s', data)
+        return True
+
+    def _refresh(self, p_iva: str) -> bool:
+        valid = self._lookup(p_iva)
+        ttl = (
+            settings.VIES_CACHE_POSITIVE_TTL
+            if valid
+            else settings.VIES_CACHE_NEGATIVE_TTL
+        )
+        self.cache.set(
+            _CACHE_KEY_PREFIX + p_iva,
+            {'valid': valid, 'checked_at': time.time()},
+            timeout=ttl + settings.VIES_CACHE_STALE_TTL,
+        )
+        return valid
+
+    def _schedule_revalidation(self, p_iva: str) -> None:
+        # Un solo worker alla volta rivalida la stessa Partita IVA
+        lock_key = _LOCK_KEY_PREFIX + p_iva
+        if not self.cache.add(lock_key, 1, timeout=60):
+            return
+
+        def revalidate() -> None:
+            try:
+                self._refresh(p_iva)
+            except Exception:
+                logger.warning(
+                    'Rivalidazione VIES fallita per %s', p_iva, exc_info=True
+                )
+            finally:
+                self.cache.delete(lock_key)
+
+        self._background(revalidate)
+
+
+vies_cache = ViesLookupCache()
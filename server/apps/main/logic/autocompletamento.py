@@ -0,0 +1,167 @@
+"""Autocompletamento dei nomi di città da un trie in memoria.
+
+Le chiavi sono i nomi delle città normalizzati con ``normalizza_testo``
+(minuscoli, senza accenti né apostrofi): il nome, ogni sua parola
+successiva alla prima ("canavese" trova "San Giorgio Canavese") e i
+nomi alternativi in alfabeto latino (separati da ``,`` o ``;``). Il
+trie è compatto: le chiavi sono in una lista ordinata e ogni nodo è
+l'intervallo delle chiavi con quel prefisso, trovato con due bisezioni;
+accanto a ogni chiave un ``array`` tiene la posizione della città nella
+classifica generale (popolazione decrescente, poi regione e nome). I
+nodi con molte chiavi hanno i primi risultati già calcolati: gli altri
+si classificano al volo.
+
+L'indice si costruisce dalla tabella geografica in memoria (più una
+query per i nomi alternativi) alla prima ricerca di ogni worker, e di
+nuovo quando la tabella viene ricaricata.
+"""
+
+import bisect
+import heapq
+import re
+import threading
+from array import array
+from collections.abc import Iterable
+
+from cities_light.models import City
+
+from server.apps.main.logic.geo import CittaGeo, TabellaGeo, tabella_geo
+from server.common.text import normalizza_testo
+
+# Nodi con la classifica precalcolata (oltre _SOGLIA chiavi) e sua
+# lunghezza
+_SOGLIA = 256
+_CLASSIFICA = 100
+_FINE = chr(0x10FFFF)
+# cities_light separa i nomi alternativi con ';', geonames con ','
+_SEPARATORI = re.compile(r'[,;]')
+
+
+def _chiavi(name: str, alternate_names: str) -> set[str]:
+    """Le chiavi di una città: nome, sue parole e nomi alternativi."""
+    nome = normalizza_testo(name)
+    parole = nome.split(' ')
+    chiavi = {' '.join(parole[index:]) for index in range(len(parole))}
+    for alternativo in _SEPARATORI.split(alternate_names):
+        chiave = normalizza_testo(alternativo)
+        # Solo alfabeto latino: gli altri non si digitano nel campo
+        if chiave.isascii() and any(char.isalpha() for char in chiave):
+            chiavi.add(chiave)
+    chiavi.discard('')
+    return chiavi
+
+
+class IndiceAutocompletamento:
+    """Trie dei nomi delle città, con i risultati in ordine di rilevanza.
+
+    Prima le città il cui nome (o nome alternativo) coincide con il
+    testo cercato, poi le altre, in ordine di popolazione.
+    """
+
+    def __init__(
+        self, tabella: TabellaGeo, nomi_alternativi: Iterable[tuple[int, str]]
+    ) -> None:
+        """Costruisce l'indice delle città di ``tabella``."""
+        self.tabella = tabella
+        self._citta = tuple(
+            sorted(
+                tabella,
+                key=lambda city: (
+                    -(city.population or 0),
+                    tabella.nome_regione(city),
+                    city.name,
+                    city.id,
+                ),
+            )
+        )
+        posizioni = {city.id: index for index, city in enumerate(self._citta)}
+        alternativi = dict(nomi_alternativi)
+        voci = sorted(
+            (chiave, posizioni[city.id])
+            for city in self._citta
+            for chiave in _chiavi(city.name, alternativi.get(city.id) or '')
+        )
+        self._chiavi = [chiave for chiave, _ in voci]
+        self._posizioni = array('l', (posizione for _, posizione in voci))
+        self._precalcolati = {}
+        self._precalcola()
+
+    @classmethod
+    def da_database(cls, tabella: TabellaGeo) -> 'IndiceAutocompletamento':
+        """Costruisce l'indice; legge dal database i nomi alternativi."""
+        return cls(
+            tabella,
+            City.objects.exclude(alternate_names='')
+            .values_list('id', 'alternate_names')
+            .iterator(chunk_size=5000),
+        )
+
+    def _precalcola(self) -> None:
+        """Visita i nodi con più di ``_SOGLIA`` chiavi, dalla radice."""
+        nodi = [('', 0, len(self._chiavi))]
+        while nodi:
+            prefisso, inizio, fine = nodi.pop()
+            if fine - inizio <= _SOGLIA:
+                continue
+            self._precalcolati[prefisso] = self._classifica(
+                prefisso, _CLASSIFICA
+            )
+            # I figli: le chiavi più lunghe, per carattere successivo
+            indice = bisect.bisect_right(self._chiavi, prefisso, inizio, fine)
+            while indice < fine:
+                figlio = self._chiavi[indice][: len(prefisso) + 1]
+                fine_figlio = bisect.bisect_left(
+                    self._chiavi, figlio + _FINE, indice, fine
+                )
+                nodi.append((figlio, indice, fine_figlio))
+                indice = fine_figlio
+
+    def _classifica(self, prefisso: str, limite: int) -> list[int]:
+        """Le prime ``limite`` posizioni delle città con il prefisso."""
+        inizio = bisect.bisect_left(self._chiavi, prefisso)
+        uguali = bisect.bisect_right(self._chiavi, prefisso, lo=inizio)
+        fine = bisect.bisect_left(self._chiavi, prefisso + _FINE, lo=uguali)
+        esatte = list(dict.fromkeys(self._posizioni[inizio:uguali]))
+        altre = set(self._posizioni[uguali:fine]).difference(esatte)
+        return (esatte + heapq.nsmallest(limite, altre))[:limite]
+
+    def cerca(
+        self, term: str, pagina: int = 1, per_pagina: int = 20
+    ) -> tuple[list[CittaGeo], bool]:
+        """Una pagina di città per ``term`` e se ce ne sono altre."""
+        prefisso = normalizza_testo(term)
+        limite = pagina * per_pagina + 1
+        posizioni = self._precalcolati.get(prefisso)
+        # Una classifica precalcolata più corta del massimo è completa
+        if posizioni is None or (
+            len(posizioni) == _CLASSIFICA and limite > _CLASSIFICA
+        ):
+            posizioni = self._classifica(prefisso, limite)
+        pagina_corrente = posizioni[(pagina - 1) * per_pagina : limite - 1]
+        return (
+            [self._citta[posizione] for posizione in pagina_corrente],
+            len(posizioni) >= limite,
+        )
+
+
+class _IndiceCorrente:
+    """L'indice del worker, ricostruito con la tabella geografica."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._indice: IndiceAutocompletamento | None = None
+
+    def get(self) -> IndiceAutocompletamento:
+        tabella = tabella_geo()
+        with self._lock:
+            if self._indice is None or self._indice.tabella is not tabella:
+                self._indice = IndiceAutocompletamento.da_database(tabella)
+            return self._indice
+
+
+_corrente = _IndiceCorrente()
+
+
+def indice_autocompletamento() -> IndiceAutocompletamento:
+    """L'indice di autocompletamento delle città di questo worker."""
+    return _corrente.get()
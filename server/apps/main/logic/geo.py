@@ -0,0 +1,271 @@
+"""Tabella geografica in memoria: paesi, regioni e città di cities_light.
+
+I dati geografici cambiano al più con un import o una localizzazione,
+ma ``str(sede)``, i filtri dell'admin e gli import li leggono di
+continuo. ``tabella_geo()`` restituisce un'istantanea immutabile di
+tutte le righe delle tre tabelle (gli import si limitano ai paesi di
+``CITIES_LIGHT_INCLUDE_COUNTRIES``, cioè all'Italia), caricata con tre
+query alla prima richiesta di ogni worker e poi letta senza query. Le
+righe sono ``NamedTuple`` (niente ``__dict__`` per riga); le città sono
+ordinate per id, cercate per bisezione su un ``array`` di id, e
+indicizzate per nome normalizzato e per regione.
+
+La versione dell'istantanea sta nella cache ``GEO_CACHE_ALIAS`` se è
+condivisa tra i worker, altrimenti nella sequenza ``main_geo_versione``
+del database: i segnali in fondo al modulo e i comandi che scrivono con
+SQL (``import_geonames``, ``translate_italian_regions``) la cambiano, e
+ogni worker la confronta con la propria al più ogni
+``GEO_CONTROLLO_VERSIONE`` secondi, ricaricando l'istantanea se è
+diversa.
+"""
+
+import bisect
+import threading
+import time
+from array import array
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from itertools import starmap
+from typing import NamedTuple
+
+from cities_light.models import City, Country, Region
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+
+from server.apps.main.models import CityProxy, CountryProxy, RegionProxy
+from server.common.cache import cache_condivisa
+from server.common.text import normalizza_testo
+
+_VERSIONE = 'geo:versione'
+
+
+class PaeseGeo(NamedTuple):
+    """Paese della tabella geografica."""
+
+    id: int
+    name: str
+    code2: str | None
+
+    def __str__(self):
+        """Il nome, come ``str()`` di ``Country``."""
+        return self.name
+
+
+class RegioneGeo(NamedTuple):
+    """Regione della tabella geografica."""
+
+    id: int
+    name: str
+    display_name: str
+    country_id: int
+
+    def __str__(self):
+        """Il nome completo, come ``str()`` di ``Region``."""
+        return self.display_name or self.name
+
+
+class CittaGeo(NamedTuple):
+    """Città della tabella geografica."""
+
+    id: int
+    name: str
+    display_name: str
+    region_id: int | None
+    country_id: int
+    population: int | None
+
+    def __str__(self):
+        """Il nome completo, come ``str()`` di ``City``."""
+        return self.display_name or self.name
+
+
+class TabellaGeo:
+    """Istantanea immutabile di paesi, regioni e città.
+
+    Le regioni restano nell'ordine per nome del database; le città sono
+    ordinate per id. I metodi non eseguono query.
+    """
+
+    def __init__(
+        self,
+        versione: int,
+        paesi: Iterable[PaeseGeo],
+        regioni: Iterable[RegioneGeo],
+        citta: Iterable[CittaGeo],
+    ) -> None:
+        """Costruisce gli indici; ``citta`` deve essere ordinata per id."""
+        self.versione = versione
+        self._paesi = {paese.id: paese for paese in paesi}
+        self._regioni = tuple(regioni)
+        self._regioni_per_id = {
+            regione.id: regione for regione in self._regioni
+        }
+        self._citta = tuple(citta)
+        self._ids = array('q', (city.id for city in self._citta))
+        per_nome = defaultdict(list)
+        per_regione = defaultdict(list)
+        for city in self._citta:
+            per_nome[normalizza_testo(city.name)].append(city)
+            per_regione[city.region_id].append(city)
+        self._per_nome = {nome: tuple(c) for nome, c in per_nome.items()}
+        self._per_regione = {id_: tuple(c) for id_, c in per_regione.items()}
+
+    @classmethod
+    def da_database(cls, versione: int) -> 'TabellaGeo':
+        """Carica l'istantanea con una query per tabella."""
+        paesi = Country.objects.values_list('id', 'name', 'code2')
+        regioni = Region.objects.order_by('name', 'id').values_list(
+            'id', 'name', 'display_name', 'country_id'
+        )
+        citta = City.objects.order_by('id').values_list(
+            'id',
+            'name',
+            'display_name',
+            'region_id',
+            'country_id',
+            'population',
+        )
+        return cls(
+            versione,
+            starmap(PaeseGeo, paesi),
+            starmap(RegioneGeo, regioni),
+            starmap(CittaGeo, citta.iterator(chunk_size=5000)),
+        )
+
+    def __len__(self) -> int:
+        """Numero di città."""
+        return len(self._citta)
+
+    def __iter__(self) -> Iterator[CittaGeo]:
+        """Le città in ordine di id."""
+        return iter(self._citta)
+
+    def paese(self, country_id: int | None) -> PaeseGeo | None:
+        """Il paese con questo id, o None."""
+        return self._paesi.get(country_id)
+
+    def regione(self, region_id: int | None) -> RegioneGeo | None:
+        """La regione con questo id, o None."""
+        return self._regioni_per_id.get(region_id)
+
+    def regioni(self) -> tuple[RegioneGeo, ...]:
+        """Tutte le regioni, ordinate per nome."""
+        return self._regioni
+
+    def citta(self, city_id: int | None) -> CittaGeo | None:
+        """La città con questo id, o None."""
+        if city_id is None:
+            return None
+        index = bisect.bisect_left(self._ids, city_id)
+        if index < len(self._ids) and self._ids[index] == city_id:
+            return self._citta[index]
+        return None
+
+    def citta_per_nome(self, name: str) -> tuple[CittaGeo, ...]:
+        """Le città con questo nome, senza badare a maiuscole e accenti."""
+        return self._per_nome.get(normalizza_testo(name), ())
+
+    def citta_della_regione(
+        self, region_id: int | None
+    ) -> tuple[CittaGeo, ...]:
+        """Le città della regione (senza regione con ``None``)."""
+        return self._per_regione.get(region_id, ())
+
+    def nome_regione(self, city: CittaGeo) -> str:
+        """Il nome della regione della città, o una stringa vuota."""
+        regione = self.regione(city.region_id)
+        return regione.name if regione else ''
+
+
+def _cache():
+    return caches[settings.GEO_CACHE_ALIAS]
+
+
+def versione_geo() -> int:
+    """Versione corrente dei dati geografici, la stessa per ogni worker."""
+    if not cache_condivisa(settings.GEO_CACHE_ALIAS):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT last_value FROM main_geo_versione')
+            (versione,) = cursor.fetchone()
+        return versione
+    versione = _cache().get(_VERSIONE)
+    if versione is None:
+        versione = time.time_ns()
+        # Se un altro worker l'ha appena creata vale la sua
+        _cache().add(_VERSIONE, versione, timeout=None)
+        versione = _cache().get(_VERSIONE, versione)
+    return versione
+
+
+class _TabellaCorrente:
+    """L'istantanea del worker, ricaricata quando cambia la versione."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._tabella: TabellaGeo | None = None
+        self._controllata_at = 0.0
+
+    def get(self) -> TabellaGeo:
+        tabella = self._tabella
+        adesso = time.monotonic()
+        if (
+            tabella is not None
+            and adesso - self._controllata_at < settings.GEO_CONTROLLO_VERSIONE
+        ):
+            return tabella
+        versione = versione_geo()
+        with self._lock:
+            if self._tabella is None or self._tabella.versione != versione:
+                self._tabella = TabellaGeo.da_database(versione)
+            self._controllata_at = adesso
+            return self._tabella
+
+    def scarta(self) -> None:
+        self._tabella = None
+
+
+_corrente = _TabellaCorrente()
+
+
+def tabella_geo() -> TabellaGeo:
+    """L'istantanea dei dati geografici di questo worker."""
+    return _corrente.get()
+
+
+def scarta_tabella_geo() -> None:
+    """Scarta l'istantanea di questo worker, senza cambiare versione."""
+    _corrente.scarta()
+
+
+def _invalida() -> None:
+    if cache_condivisa(settings.GEO_CACHE_ALIAS):
+        _cache().set(_VERSIONE, time.time_ns(), timeout=None)
+    else:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT nextval('main_geo_versione')")
+    _corrente.scarta()
+
+
+def invalida_tabella_geo() -> None:
+    """Rende obsolete le istantanee di tutti i worker.
+
+    Va chiamata dopo le scritture che non passano dai segnali (SQL,
+    ``bulk_update``). Viene ripetuta al commit: un'istantanea caricata
+    nel frattempo dentro la transazione non vedrebbe le modifiche altrui
+    né resterebbe valida dopo un rollback.
+    """
+    _invalida()
+    if connection.in_atomic_block:
+        transaction.on_commit(_invalida)
+
+
+def _dati_geo_modificati(sender, **kwargs):
+    invalida_tabella_geo()
+
+
+# I salvataggi dei proxy inviano i segnali con il proxy come sender
+for _modello in (City, Region, Country, CityProxy, RegionProxy, CountryProxy):
+    post_save.connect(_dati_geo_modificati, sender=_modello)
+    post_delete.connect(_dati_geo_modificati, sender=_modello)
@@ -0,0 +1,424 @@
+"""
+Management command to import a local geonames dump into cities_light.
+
+Works offline, without the downloads of ``cities_light``: reads
+``countryInfo.txt``, ``admin1CodesASCII.txt`` and a cities file
+(``cities500.zip`` by default) from a directory, streaming zip members
+line by line. Rows outside ``CITIES_LIGHT_INCLUDE_COUNTRIES`` (and
+cities outside ``CITIES_LIGHT_INCLUDE_CITY_TYPES``) are dropped while
+reading; the rest goes through ``COPY`` into temporary staging tables
+and is upserted into the cities_light tables in one transaction. Only
+rows that differ from the dump are written.
+
+Names localized by ``translate_italian_regions`` are kept: the geonames
+name is already among their alternate names. Run that command after an
+import that adds new countries or regions.
+"""
+
+import io
+import time
+import zipfile
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+from cities_light.settings import (
+    INCLUDE_CITY_TYPES,
+    INCLUDE_COUNTRIES,
+    ICity,
+    ICountry,
+    IRegion,
+)
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+from django.db import connection, transaction
+from django.utils.text import slugify
+
+from server.apps.main.logic.geo import invalida_tabella_geo
+
+# The current name if the dump's name is one of its alternate names
+# (the row was localized), the dump's name otherwise
+_KEEP_LOCALIZED = """
+    CASE WHEN EXCLUDED.name
+              = ANY(regexp_split_to_array(t.alternate_names, '[,;]'))
+         THEN t.name ELSE EXCLUDED.name END
+"""
+
+_STAGING = {
+    'country': (
+        'geoname_id integer, code2 text, code3 text, name text, '
+        'name_ascii text, slug text, continent text, tld text, phone text'
+    ),
+    'region': (
+        'geoname_id integer, country_code text, geoname_code text, '
+        'name text, name_ascii text, slug text'
+    ),
+    'city': (
+        'geoname_id integer, name text, name_ascii text, slug text, '
+        'alternate_names text, latitude numeric, longitude numeric, '
+        'feature_code text, country_code text, admin1_code text, '
+        'population bigint, timezone text'
+    ),
+}
+
+# Rows created by hand or by an older import without geoname ids are
+# matched by code (countries) or by country and name (regions)
+_ADOPT = {
+    'country': """
+UPDATE cities_light_country t SET geoname_id = s.geoname_id
+FROM geonames_country s
+WHERE t.geoname_id IS NULL AND t.code2 = s.code2
+""",
+    'region': """
+UPDATE cities_light_region t SET geoname_id = s.geoname_id
+FROM geonames_region s
+JOIN cities_light_country c ON c.code2 = s.country_code
+WHERE t.geoname_id IS NULL AND t.country_id = c.id
+  AND (t.name = s.name OR t.geoname_code = s.geoname_code)
+""",
+}
+
+_UPSERT = {
+    'country': (
+        """
+INSERT INTO cities_light_country AS t (
+    name, name_ascii, slug, geoname_id, alternate_names, translations,
+    code2, code3, continent, tld, phone
+)
+SELECT s.name, s.name_ascii, left(s.slug, 50), s.geoname_id, '', '{}',
+       s.code2, s.code3, s.continent, coalesce(s.tld, ''), s.phone
+FROM geonames_country s
+ON CONFLICT (geoname_id) DO UPDATE SET
+    name = """
+        + _KEEP_LOCALIZED
+        + """,
+    code2 = EXCLUDED.code2,
+    code3 = EXCLUDED.code3,
+    continent = EXCLUDED.continent,
+    tld = EXCLUDED.tld,
+    phone = EXCLUDED.phone
+WHERE (t.name, t.code2, t.code3, t.continent, t.tld, t.phone)
+    IS DISTINCT FROM ("""
+        + _KEEP_LOCALIZED
+        + """, EXCLUDED.code2, EXCLUDED.code3, EXCLUDED.continent,
+       EXCLUDED.tld, EXCLUDED.phone)
+RETURNING xmax = 0
+"""
+    ),
+    'region': (
+        """
+INSERT INTO cities_light_region AS t (
+    name, name_ascii, slug, geoname_id, alternate_names, translations,
+    display_name, geoname_code, country_id
+)
+SELECT s.name, s.name_ascii, left(s.slug, 50), s.geoname_id, '', '{}', '',
+       s.geoname_code, c.id
+FROM geonames_region s
+JOIN cities_light_country c ON c.code2 = s.country_code
+ON CONFLICT (geoname_id) DO UPDATE SET
+    name = """
+        + _KEEP_LOCALIZED
+        + """,
+    name_ascii = EXCLUDED.name_ascii,
+    geoname_code = EXCLUDED.geoname_code,
+    country_id = EXCLUDED.country_id
+WHERE (t.name, t.name_ascii, t.geoname_code, t.country_id)
+    IS DISTINCT FROM ("""
+        + _KEEP_LOCALIZED
+        + """, EXCLUDED.name_ascii, EXCLUDED.geoname_code,
+       EXCLUDED.country_id)
+RETURNING xmax = 0
+"""
+    ),
+    'city': """
+INSERT INTO cities_light_city AS t (
+    name, name_ascii, slug, geoname_id, alternate_names, translations,
+    display_name, search_names, latitude, longitude, region_id,
+    country_id, population, feature_code, timezone
+)
+SELECT s.name, s.name_ascii,
+       -- Homonyms in the same region get the geoname id in the slug
+       CASE WHEN count(*) OVER (
+                PARTITION BY s.country_code, s.admin1_code, s.slug
+            ) > 1
+            THEN left(s.slug, 38) || '-' || s.geoname_id
+            ELSE left(s.slug, 50) END,
+       s.geoname_id, coalesce(s.alternate_names, ''), '{}', '', '',
+       s.latitude, s.longitude, r.id, c.id, s.population, s.feature_code,
+       s.timezone
+FROM geonames_city s
+JOIN cities_light_country c ON c.code2 = s.country_code
+LEFT JOIN cities_light_region r
+    ON r.country_id = c.id AND r.geoname_code = s.admin1_code
+ON CONFLICT (geoname_id) DO UPDATE SET
+    name = EXCLUDED.name,
+    name_ascii = EXCLUDED.name_ascii,
+    alternate_names = EXCLUDED.alternate_names,
+    latitude = EXCLUDED.latitude,
+    longitude = EXCLUDED.longitude,
+    region_id = EXCLUDED.region_id,
+    country_id = EXCLUDED.country_id,
+    population = EXCLUDED.population,
+    feature_code = EXCLUDED.feature_code,
+    timezone = EXCLUDED.timezone
+WHERE (t.name, t.name_ascii, t.alternate_names, t.latitude, t.longitude,
+       t.region_id, t.country_id, t.population, t.feature_code,
+       t.timezone)
+    IS DISTINCT FROM (EXCLUDED.name, EXCLUDED.name_ascii,
+       EXCLUDED.alternate_names, EXCLUDED.latitude, EXCLUDED.longitude,
+       EXCLUDED.region_id, EXCLUDED.country_id, EXCLUDED.population,
+       EXCLUDED.feature_code, EXCLUDED.timezone)
+RETURNING xmax = 0
+""",
+}
+
+# Display names as cities_light computes them on save, rewritten only
+# where they differ, for the imported countries
+_DISPLAY_NAMES = [
+    """
+UPDATE cities_light_region r SET display_name = r.name || ', ' || c.name
+FROM cities_light_country c
+WHERE c.id = r.country_id
+  AND c.code2 IN (SELECT code2 FROM geonames_country)
+  AND r.display_name IS DISTINCT FROM r.name || ', ' || c.name
+""",
+    """
+UPDATE cities_light_city SET display_name = batch.display_name
+FROM (
+    SELECT ci.id,
+           ci.name || COALESCE(', ' || r.name, '') || ', ' || co.name
+               AS display_name
+    FROM cities_light_city ci
+    JOIN cities_light_country co ON co.id = ci.country_id
+    LEFT JOIN cities_light_region r ON r.id = ci.region_id
+    WHERE co.code2 IN (SELECT code2 FROM geonames_country)
+) AS batch
+WHERE cities_light_city.id = batch.id
+  AND cities_light_city.display_name IS DISTINCT FROM batch.display_name
+""",
+]
+
+
+def _read_lines(path: Path) -> Iterator[str]:
+    """Lines of a geonames file, or of the ``.txt`` member of a zip."""
+    if not zipfile.is_zipfile(path):
+        with path.open(encoding='utf-8') as lines:
+            yield from lines
+        return
+    with zipfile.ZipFile(path) as archive:
+        member = next(
+            name
+            for name in archive.namelist()
+            if name.endswith('.txt') and not name.startswith('readme')
+        )
+        with archive.open(member) as raw:
+            yield from io.TextIOWrapper(raw, encoding='utf-8')
+
+
+class _CopyStream(io.TextIOBase):
+    """File-like object that feeds ``COPY ... FROM STDIN`` from rows.
+
+    Rows (lists of fields) are joined as tab-separated lines only when
+    ``COPY`` asks for more data, so the dump is never held in memory.
+    """
+
+    def __init__(self, rows: Iterable[list[str]]) -> None:
+        """Wrap the rows; ``count`` tracks how many have been read."""
+        self._rows = iter(rows)
+        self._buffer = ''
+        self.count = 0
+
+    def read(self, size: int = 8192) -> str:
+        """Return up to ``size`` characters, as ``copy_expert`` asks."""
+        chunks = [self._buffer]
+        length = len(self._buffer)
+        for row in self._rows:
+            line = '\t'.join(row) + '\n'
+            chunks.append(line)
+            length += len(line)
+            self.count += 1
+            if length >= size:
+                break
+        data = ''.join(chunks)
+        self._buffer = data[size:]
+        return data[:size]
+
+
+def _slug(name: str, geoname_id: str) -> str:
+    """Slug of a new row, as autoslug builds it from the ASCII name."""
+    return slugify(name) or geoname_id
+
+
+def _included(country_code: str) -> bool:
+    return not INCLUDE_COUNTRIES or country_code in INCLUDE_COUNTRIES
+
+
+def _country_rows(lines: Iterable[str]) -> Iterator[list[str]]:
+    """Staging rows of ``countryInfo.txt`` for the included countries."""
+    for line in lines:
+        if line.startswith('#') or not line.strip():
+            continue
+        items = line.rstrip('\n').split('\t')
+        if not _included(items[ICountry.code2]):
+            continue
+        yield [
+            items[ICountry.geonameid],
+            items[ICountry.code2],
+            items[ICountry.code3],
+            items[ICountry.name],
+            items[ICountry.name],
+            _slug(items[ICountry.name], items[ICountry.geonameid]),
+            items[ICountry.continent],
+            items[ICountry.tld][1:],  # strip the leading dot
+            items[ICountry.phone].replace('+', ''),
+        ]
+
+
+def _region_rows(lines: Iterable[str]) -> Iterator[list[str]]:
+    """Staging rows of ``admin1CodesASCII.txt`` for the included countries."""
+    for line in lines:
+        items = line.rstrip('\n').split('\t')
+        country_code, geoname_code = items[IRegion.code].split('.')
+        if not _included(country_code):
+            continue
+        yield [
+            items[IRegion.geonameid],
+            country_code,
+            geoname_code,
+            items[IRegion.name] or items[IRegion.asciiName],
+            items[IRegion.asciiName],
+            _slug(items[IRegion.asciiName], items[IRegion.geonameid]),
+        ]
+
+
+def _city_rows(lines: Iterable[str]) -> Iterator[list[str]]:
+    """Staging rows of a cities file: included countries and types."""
+    for line in lines:
+        items = line.rstrip('\n').split('\t')
+        if not _included(items[ICity.countryCode]):
+            continue
+        if items[ICity.featureCode] not in INCLUDE_CITY_TYPES:
+            continue
+        yield [
+            items[ICity.geonameid],
+            items[ICity.name],
+            items[ICity.asciiName],
+            _slug(items[ICity.asciiName], items[ICity.geonameid]),
+            items[ICity.alternateNames],
+            items[ICity.latitude],
+            items[ICity.longitude],
+            items[ICity.featureCode],
+            items[ICity.countryCode],
+            items[ICity.admin1Code],
+            items[ICity.population],
+            items[ICity.timezone],
+        ]
+
+
+_ROWS = {
+    'country': _country_rows,
+    'region': _region_rows,
+    'city': _city_rows,
+}
+
+
+class Command(BaseCommand):
+    """Offline geonames import for cities_light through COPY."""
+
+    help = 'Imports countries, regions and cities from a local geonames dump'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Define CLI arguments for the management command."""
+        parser.add_argument(
+            'path', type=Path, help='Directory with the geonames files.'
+        )
+        parser.add_argument(
+            '--countries',
+            default='countryInfo.txt',
+            help='Countries file name.',
+        )
+        parser.add_argument(
+            '--regions',
+            default='admin1CodesASCII.txt',
+            help='Regions (admin1 codes) file name.',
+        )
+        parser.add_argument(
+            '--cities',
+            default='cities500.zip',
+            help='Cities file name (.txt or .zip).',
+        )
+
+    def handle(self, *args, **options):
+        """Execute the command."""
+        files = {
+            model: options['path'] / options[option]
+            for model, option in (
+                ('country', 'countries'),
+                ('region', 'regions'),
+                ('city', 'cities'),
+            )
+        }
+        for path in files.values():
+            if not path.is_file():
+                raise CommandError(f'File not found: {path}')
+
+        start = time.perf_counter()
+        timings = {'copy': 0.0, 'upsert': 0.0}
+        total = 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            # The import outlasts the configured statement timeout
+            cursor.execute('SET LOCAL statement_timeout = 0')
+            for model, path in files.items():
+                read, inserted, updated = self._import(
+                    cursor, model, path, timings
+                )
+                total += read
+                self.stdout.write(
+                    f'{model}: {read} read, {inserted} inserted, '
+                    f'{updated} updated'
+                )
+            phase = time.perf_counter()
+            for sql in _DISPLAY_NAMES:
+                cursor.execute(sql)
+            timings['upsert'] += time.perf_counter() - phase
+            # The upserts bypass the model signals
+            invalida_tabella_geo()
+        elapsed = time.perf_counter() - start
+
+        rate = total / elapsed if elapsed else 0.0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✓ {total} rows in {elapsed:.2f}s ({rate:.0f} rows/s): '
+                f'copy {timings["copy"]:.2f}s, '
+                f'upsert {timings["upsert"]:.2f}s.'
+            )
+        )
+
+    def _import(self, cursor, model, path, timings):
+        """COPY one file into its staging table and upsert it."""
+        table = f'geonames_{model}'
+        phase = time.perf_counter()
+        # ON COMMIT DROP does not fire inside an outer transaction
+        cursor.execute(f'DROP TABLE IF EXISTS {table}')
+        cursor.execute(
+            f'CREATE TEMP TABLE {table} ({_STAGING[model]}) ON COMMIT DROP'
+        )
+        stream = _CopyStream(_ROWS[model](_read_lines(path)))
+        # CSV with an impossible quote character: fields go in verbatim
+        cursor.copy_expert(
+            f"COPY {table} FROM STDIN WITH (FORMAT csv, DELIMITER E'\\t', "
+            "QUOTE E'\\x01')",
+            stream,
+        )
+        timings['copy'] += time.perf_counter() - phase
+
+        phase = time.perf_counter()
+        if model in _ADOPT:
+            cursor.execute(_ADOPT[model])
+        cursor.execute(_UPSERT[model])
+        written = [inserted for (inserted,) in cursor.fetchall()]
+        timings['upsert'] += time.perf_counter() - phase
+        inserted = sum(written)
+        return stream.count, inserted, len(written) - inserted
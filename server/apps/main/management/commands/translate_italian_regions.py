@@ -1,14 +1,77 @@
 """
 Management command to translate Italian geographic names.
 
-Translates country and region names from English to Italian.
+Translates country and region names from English to Italian and keeps
+the display names of Italian cities in step. The command is idempotent:
+it diffs current against target names and only writes the rows that
+change. Each run records the localization version (a hash of the target
+names) in ``LocalizzazioneGeo``. With the same version, only the cities
+of renamed regions are checked again, so a re-run after a geonames
+refresh costs time proportional to what the refresh changed.
+
+Country and regions change in one transaction. The city display names
+are then committed batch by batch, so no lock is held for the whole
+run; an interrupted run stays without ``completata_at`` and the next
+one checks every city.
 """
 
+import hashlib
+import json
+import re
+import time
 from typing import ClassVar
 
-from cities_light.models import City, Country, Region
-from django.core.management.base import BaseCommand
-from django.db import transaction
+from cities_light.models import Country, Region
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import connection, transaction
+from django.utils import timezone
+
+from server.apps.main.logic.geo import invalida_tabella_geo
+from server.apps.main.models import LocalizzazioneGeo
+
+# Italian cities whose display name differs from what cities_light
+# computes on save ("city, region, country", or "city, country" without
+# a region): all of them, or those in the given regions.
+_CITIES = """
+    FROM cities_light_city c
+    JOIN cities_light_country co ON co.id = c.country_id
+    LEFT JOIN cities_light_region r ON r.id = c.region_id
+    WHERE co.code2 = 'IT'
+      AND (%(all_regions)s OR c.region_id = ANY(%(regions)s::bigint[]))
+      AND c.display_name IS DISTINCT FROM
+          c.name || COALESCE(', ' || r.name, '') || ', ' || co.name
+"""
+
+_COUNT_CITIES = 'SELECT COUNT(*)' + _CITIES
+
+# One batch: the next cities by id after the previous batch
+_UPDATE_CITIES = (
+    """
+UPDATE cities_light_city
+SET display_name = batch.display_name
+FROM (
+    SELECT c.id,
+           c.name || COALESCE(', ' || r.name, '') || ', ' || co.name
+               AS display_name
+"""
+    + _CITIES
+    + """
+      AND c.id > %(after)s
+    ORDER BY c.id
+    LIMIT %(batch_size)s
+) AS batch
+WHERE cities_light_city.id = batch.id
+RETURNING cities_light_city.id
+"""
+)
+
+
+def _with_name(alternate_names: str | None, name: str) -> str:
+    """Add ``name`` to a comma or semicolon separated list, once."""
+    current = alternate_names or ''
+    if name in re.split(r'[,;]', current):
+        return current
+    return f'{current},{name}' if current else name
 
 
 class Command(BaseCommand):
@@ -40,110 +103,220 @@ class Command(BaseCommand):
         'Veneto': 'Veneto',
     }
 
-    def _update_region(self, english_name: str, italian_name: str) -> bool:
-        """Update a single region name."""
+    COUNTRY_CODE = 'IT'
+    COUNTRY_NAMES = ('Italy', 'Italia')
+
+    @classmethod
+    def localization_version(cls) -> str:
+        """Hash of the target names: it changes when the mapping does."""
+        targets = json.dumps(
+            [cls.COUNTRY_CODE, cls.COUNTRY_NAMES, cls.ITALIAN_REGIONS],
+            sort_keys=True,
+        )
+        return hashlib.blake2b(targets.encode(), digest_size=8).hexdigest()
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Define CLI arguments for the management command."""
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Cities updated per statement.',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Check every city, even if the version is unchanged.',
+        )
+
+    def _update_country(self) -> tuple[Country | None, bool]:
+        """Update Italy country name to Italian, if needed."""
         try:
-            region = Region.objects.get(
-                name=english_name,
-                country__code2='IT',
-            )
-        except Region.DoesNotExist:
-            self.stdout.write(
-                self.style.WARNING(f'⚠ Region not found: {english_name}')
+            country = Country.objects.get(code2=self.COUNTRY_CODE)
+        except Country.DoesNotExist:
+            self.stdout.write(self.style.WARNING('⚠ Country Italy not found'))
+            return None, False
+
+        english_name, italian_name = self.COUNTRY_NAMES
+        old_name = country.name
+        # Keep English name in alternate_names
+        alternate_names = _with_name(country.alternate_names, english_name)
+        if (old_name, country.alternate_names) == (
+            italian_name,
+            alternate_names,
+        ):
+            self.stdout.write('= Country already translated')
+            return country, False
+        country.name = italian_name
+        country.alternate_names = alternate_names
+        country.save(update_fields=['name', 'alternate_names'])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✓ Updated country: {old_name} → {italian_name}'
             )
-            return False
-        except Region.MultipleObjectsReturned:
-            self.stdout.write(
-                self.style.ERROR(f'✗ Multiple regions found: {english_name}')
+        )
+        return country, True
+
+    def _localize_region(self, region, country, english_names):
+        """Set the target names on ``region`` and return its English name.
+
+        Regions outside the mapping keep their name (``None`` is
+        returned); their display name still follows the country.
+        """
+        english_name = (
+            region.name
+            if region.name in self.ITALIAN_REGIONS
+            else english_names.get(region.name)
+        )
+        if english_name is not None:
+            region.name = self.ITALIAN_REGIONS[english_name]
+            # Keep the English name in alternate_names
+            region.alternate_names = _with_name(
+                region.alternate_names, english_name
             )
-            return False
-        else:
-            old_name = region.name
-            region.name = italian_name
-            # Update also alternate_names if needed
-            if region.alternate_names:
-                region.alternate_names = (
-                    f'{region.alternate_names},{english_name}'
-                )
-            else:
-                region.alternate_names = english_name
-            region.save()
+        region.display_name = f'{region.name}, {country.name}'
+        return english_name
+
+    def _update_regions(self, country: Country | None) -> tuple[int, set[int]]:
+        """Bring the Italian regions to their target names.
+
+        Returns how many regions changed and the ids of the renamed
+        ones; the changed rows are written with a single UPDATE.
+        """
+        english_names = {
+            italian_name: english_name
+            for english_name, italian_name in self.ITALIAN_REGIONS.items()
+        }
+        regions = Region.objects.filter(country=country) if country else []
+        found = set()
+        changed = []
+        renamed = set()
+        for region in regions:
+            old = (region.name, region.alternate_names, region.display_name)
+            found.add(self._localize_region(region, country, english_names))
+            if (
+                region.name,
+                region.alternate_names,
+                region.display_name,
+            ) == old:
+                continue
+            changed.append(region)
+            if region.name != old[0]:
+                renamed.add(region.pk)
             self.stdout.write(
                 self.style.SUCCESS(
-                    f'✓ Updated region: {old_name} → {italian_name}'
+                    f'✓ Updated region: {old[0]} → {region.name}'
                 )
             )
-            return True
 
-    def _update_country(self) -> bool:
-        """Update Italy country name to Italian."""
-        try:
-            country = Country.objects.get(code2='IT')
-        except Country.DoesNotExist:
-            self.stdout.write(self.style.WARNING('⚠ Country Italy not found'))
-            return False
-        else:
-            old_name = country.name
-            country.name = 'Italia'
-            # Keep English name in alternate_names
-            if country.alternate_names:
-                country.alternate_names = f'{country.alternate_names},Italy'
-            else:
-                country.alternate_names = 'Italy'
-            country.save()
+        for english_name in self.ITALIAN_REGIONS:
+            if english_name in found:
+                continue
             self.stdout.write(
-                self.style.SUCCESS(f'✓ Updated country: {old_name} → Italia')
+                self.style.WARNING(f'⚠ Region not found: {english_name}')
             )
-            return True
-
-    def _update_city_display_names(self) -> int:
-        """Update city display names to reflect new region names."""
-        self.stdout.write('\nUpdating city display names...')
-        cities = City.objects.filter(country__code2='IT').select_related(
-            'region', 'country'
+        Region.objects.bulk_update(
+            changed, ['name', 'alternate_names', 'display_name']
         )
+        return len(changed), renamed
 
-        total_cities = cities.count()
-        for i, city in enumerate(cities, 1):
-            city.display_name = (
-                f'{city.name}, {city.region.name}, {city.country.name}'
-            )
-            city.save(update_fields=['display_name'])
-
-            # Progress feedback every 100 cities
-            if i % 100 == 0 or i == total_cities:
-                self.stdout.write(f'  Updated {i}/{total_cities} cities...')
+    def _update_city_display_names(
+        self, batch_size: int, regions: set[int] | None
+    ) -> int:
+        """Update the out-of-date city display names.
 
-        return total_cities
+        Only the cities in ``regions`` are checked, or all of them with
+        ``regions=None``. Each batch is one UPDATE ... FROM over the next
+        ``batch_size`` cities by id, committed on its own, so locks and
+        statements stay short.
+        """
+        if regions is not None and not regions:
+            self.stdout.write('  No renamed regions: cities already up to date')
+            return 0
+        params = {
+            'all_regions': regions is None,
+            'regions': sorted(regions or ()),
+            'batch_size': batch_size,
+        }
+        with connection.cursor() as cursor:
+            cursor.execute(_COUNT_CITIES, params)
+            (total_cities,) = cursor.fetchone()
+            updated = after = 0
+            while True:
+                with transaction.atomic():
+                    cursor.execute(_UPDATE_CITIES, {**params, 'after': after})
+                    ids = [row[0] for row in cursor.fetchall()]
+                if not ids:
+                    break
+                updated += len(ids)
+                after = max(ids)
+                self.stdout.write(
+                    f'  Updated {updated}/{total_cities} cities...'
+                )
+        return updated
 
     def handle(self, *args, **options):
         """Execute the command."""
         self.stdout.write('Starting translation of Italian geographic names...')
-
-        regions_updated = 0
-        country_updated = False
+        version = self.localization_version()
+        timings = {}
 
         with transaction.atomic():
+            last = LocalizzazioneGeo.objects.order_by('-eseguita_at').first()
+
             # Update country name
             self.stdout.write('\n1. Translating country name...')
-            country_updated = self._update_country()
+            start = time.perf_counter()
+            country, country_updated = self._update_country()
+            timings['country'] = time.perf_counter() - start
 
             # Update region names
             self.stdout.write('\n2. Translating region names...')
-            for english_name, italian_name in self.ITALIAN_REGIONS.items():
-                if self._update_region(english_name, italian_name):
-                    regions_updated += 1
+            start = time.perf_counter()
+            regions_updated, renamed = self._update_regions(country)
+            timings['regions'] = time.perf_counter() - start
 
-            # Update city display_names
-            self.stdout.write('\n3. Updating city display names...')
-            cities_updated = self._update_city_display_names()
+            run = LocalizzazioneGeo.objects.create(
+                versione=version,
+                paesi=int(country_updated),
+                regioni=regions_updated,
+            )
+            # bulk_update and raw SQL bypass the model signals
+            invalida_tabella_geo()
+
+        # Update city display_names: all of them after a change of
+        # country name or version or an interrupted run, else those of
+        # renamed regions
+        self.stdout.write('\n3. Updating city display names...')
+        start = time.perf_counter()
+        full = (
+            options['full']
+            or country_updated
+            or last is None
+            or last.completata_at is None
+            or last.versione != version
+        )
+        cities_updated = self._update_city_display_names(
+            options['batch_size'], None if full else renamed
+        )
+        timings['cities'] = time.perf_counter() - start
+
+        run.citta = cities_updated
+        run.completata_at = timezone.now()
+        run.save(update_fields=['citta', 'completata_at'])
+        invalida_tabella_geo()
 
         country_msg = '1 country' if country_updated else '0 countries'
+        timing_msg = ', '.join(
+            f'{phase} {elapsed:.2f}s' for phase, elapsed in timings.items()
+        )
         self.stdout.write(
             self.style.SUCCESS(
                 f'\n✓ Translation completed successfully!'
                 f'\n  - {country_msg} translated'
                 f'\n  - {regions_updated} regions translated'
                 f'\n  - {cities_updated} city display names updated'
+                f'\n  - version {version}, {sum(timings.values()):.2f}s'
+                f' ({timing_msg})'
             )
         )
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('main', '0003_dummymodel_related'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocalizzazioneGeo',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                ('versione', models.CharField(max_length=16)),
+                (
+                    'eseguita_at',
+                    models.DateTimeField(
+                        db_index=True, default=django.utils.timezone.now
+                    ),
+                ),
+                ('paesi', models.PositiveIntegerField(default=0)),
+                ('regioni', models.PositiveIntegerField(default=0)),
+                ('citta', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'localizzazione geografica',
+                'verbose_name_plural': 'localizzazioni geografiche',
+                'get_latest_by': 'eseguita_at',
+            },
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations
+
+# Versione della tabella geografica in memoria quando la cache non è
+# condivisa tra i worker (vedi server.apps.main.logic.geo)
+_CREA_SEQUENZA = 'CREATE SEQUENCE IF NOT EXISTS main_geo_versione'
+_ELIMINA_SEQUENZA = 'DROP SEQUENCE IF EXISTS main_geo_versione'
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('main', '0004_localizzazione_geo'),
+    ]
+
+    operations = [
+        migrations.RunSQL(_CREA_SEQUENZA, _ELIMINA_SEQUENZA),
+    ]
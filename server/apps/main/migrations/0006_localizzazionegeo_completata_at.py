@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+# Le esecuzioni già registrate sono arrivate in fondo
+_COMPLETA_ESECUZIONI = """
+UPDATE main_localizzazionegeo SET completata_at = eseguita_at
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('main', '0005_versione_geo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='localizzazionegeo',
+            name='completata_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunSQL(_COMPLETA_ESECUZIONI, migrations.RunSQL.noop),
+    ]
@@ -2,6 +2,7 @@ import textwrap
 from typing import Final, final, override
 
 from django.db import models
+from django.utils import timezone
 
 #: That's how constants should be defined.
 _POST_TITLE_MAX_LENGTH: Final = 80
@@ -47,6 +48,34 @@ class DummyModel(models.Model):
         return self.name
 
 
+class LocalizzazioneGeo(models.Model):
+    """Esecuzione della localizzazione dei dati geografici.
+
+    ``translate_italian_regions`` registra a ogni esecuzione la versione
+    dei nomi di destinazione e quante righe ha cambiato: con la stessa
+    versione, l'esecuzione successiva ricontrolla solo le città delle
+    regioni rinominate. Le città si aggiornano a blocchi, ognuno nella
+    sua transazione: un'esecuzione interrotta resta senza
+    ``completata_at`` e la successiva ricontrolla tutte le città.
+    """
+
+    versione = models.CharField(max_length=16)
+    eseguita_at = models.DateTimeField(default=timezone.now, db_index=True)
+    completata_at = models.DateTimeField(null=True, blank=True)
+    paesi = models.PositiveIntegerField(default=0)
+    regioni = models.PositiveIntegerField(default=0)
+    citta = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'localizzazione geografica'
+        verbose_name_plural = 'localizzazioni geografiche'
+        get_latest_by = 'eseguita_at'
+
+    def __str__(self):
+        """Versione e data dell'esecuzione."""
+        return f'{self.versione} ({self.eseguita_at:%Y-%m-%d %H:%M})'
+
+
 # ============================================================================
 # Proxy Models for django-cities-light with Italian names
 # ============================================================================
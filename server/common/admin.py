@@ -0,0 +1,280 @@
+"""Mixin per ``ModelAdmin``: ricerca, paginazione keyset, righe attive.
+
+Include anche le ultime azioni del registro admin nella pagina di
+modifica.
+
+Vedi ``server.common.search`` per le espressioni e gli indici della
+ricerca (pg_trgm) e ``server.common.paginazione`` per conteggi stimati
+e cursori.
+"""
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.models import LogEntry
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ALL_VAR, ORDER_VAR, ChangeList
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Q, Value
+from django.db.models.functions import Greatest
+from django.utils.translation import gettext_lazy as _
+
+from server.common.paginazione import (
+    CursoreNonValidoError,
+    PaginatorStimato,
+    chiave,
+    cursore,
+    decodifica_cursore,
+    seek,
+)
+from server.common.search import contiene, normalizzato, termini
+
+SEARCH_RANK = 'search_rank'
+CURSOR_VAR = 'cursor'
+
+
+class RicercaTrigrammiMixin:
+    """Mixin per ``ModelAdmin``: ricerca indicizzata e ordinata.
+
+    Usa gli stessi ``search_fields`` della ricerca standard, senza
+    prefissi ``^``, ``=``, ``@`` e solo su campi locali o relazioni in
+    avanti (niente DISTINCT). Ogni parola deve comparire in almeno un
+    campo; i risultati sono ordinati per ``word_similarity`` del testo
+    cercato, salvo ordinamento scelto dall'utente. Con
+    ``ADMIN_TRIGRAM_SEARCH = False`` torna alla ricerca di Django.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        """Filtra con ``LIKE`` indicizzato e annota la pertinenza."""
+        search_fields = self.get_search_fields(request)
+        words = termini(search_term)
+        if not (settings.ADMIN_TRIGRAM_SEARCH and search_fields and words):
+            return super().get_search_results(request, queryset, search_term)
+
+        model = queryset.model
+        for word in words:
+            value = normalizzato(Value(word))
+            condition = Q()
+            for field_name in search_fields:
+                condition |= contiene(model, field_name, value)
+            queryset = queryset.filter(condition)
+
+        term = normalizzato(Value(' '.join(words)))
+        similarities = [
+            TrigramWordSimilarity(term, normalizzato(field_name))
+            for field_name in search_fields
+        ]
+        rank = (
+            Greatest(*similarities)
+            if len(similarities) > 1
+            else similarities[0]
+        )
+        queryset = queryset.annotate(**{SEARCH_RANK: rank})
+        # La pertinenza precede l'ordinamento predefinito, non quello
+        # scelto dall'utente cliccando su una colonna
+        if ORDER_VAR not in request.GET:
+            queryset = queryset.order_by(
+                f'-{SEARCH_RANK}', *queryset.query.order_by
+            )
+        return queryset, False
+
+
+class KeysetChangeList(ChangeList):
+    """``ChangeList`` che pagina per chiave invece che con ``OFFSET``.
+
+    Vale quando la lista è nell'ordine ``keyset_ordering`` del
+    ``ModelAdmin``; ordinando per colonna, per pertinenza della ricerca
+    o con "mostra tutti" si torna alla paginazione numerata.
+    """
+
+    keyset = False
+    url_prima = url_precedente = url_successiva = None
+
+    def get_filters_params(self, params=None):
+        """Il cursore non è un filtro sui campi."""
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        """Come per il numero di pagina, i link non conservano il cursore."""
+        new_params = {CURSOR_VAR: None, **(new_params or {})}
+        return super().get_query_string(new_params, remove)
+
+    def usa_keyset(self):
+        """``True`` se la lista è nell'ordine della chiave."""
+        ordering = tuple(self.model_admin.keyset_ordering)
+        order_by = tuple(self.queryset.query.order_by)
+        return ALL_VAR not in self.params and (
+            order_by[: len(ordering)] == ordering
+        )
+
+    def get_results(self, request):
+        """Carica la pagina indicata dal cursore in ``request.GET``."""
+        if not self.usa_keyset():
+            return super().get_results(request)
+
+        token = self.params.get(CURSOR_VAR)
+        self.result_list = self._pagina(token)
+        self._collegamenti(token, list(self.result_list))
+        self.paginator = self.model_admin.get_paginator(
+            request, self.queryset, self.list_per_page
+        )
+        self.result_count = self.paginator.count
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.can_show_all = False
+        self.multi_page = bool(self.url_successiva or self.url_precedente)
+        self.keyset = True
+        return None
+
+    def _pagina(self, token):
+        """Righe della pagina: le prime o quelle dopo/prima del cursore."""
+        ordering = self.model_admin.keyset_ordering
+        page = self.queryset
+        if token:
+            try:
+                indietro, values = decodifica_cursore(
+                    self.model, ordering, token
+                )
+            except CursoreNonValidoError as exc:
+                raise IncorrectLookupParameters(exc) from exc
+            page = seek(page, ordering, values, indietro=indietro)
+            if indietro:
+                # La subquery prende le righe più vicine alla chiave,
+                # mostrate poi nell'ordine della lista
+                page = self.queryset.filter(
+                    pk__in=page[: self.list_per_page].values('pk')
+                )
+        return page[: self.list_per_page]
+
+    def _collegamenti(self, token, rows):
+        """Link alle pagine vicine, solo se contengono righe."""
+        ordering = self.model_admin.keyset_ordering
+        if token:
+            self.url_prima = self.get_query_string()
+        if not rows:
+            return
+        last = chiave(rows[-1], ordering)
+        if seek(self.queryset, ordering, last).exists():
+            self.url_successiva = self.get_query_string({
+                CURSOR_VAR: cursore(rows[-1], ordering)
+            })
+        first = chiave(rows[0], ordering)
+        if (
+            token
+            and seek(self.queryset, ordering, first, indietro=True).exists()
+        ):
+            self.url_precedente = self.get_query_string({
+                CURSOR_VAR: cursore(rows[0], ordering, indietro=True)
+            })
+
+
+class PaginazioneKeysetMixin:
+    """Mixin per ``ModelAdmin``: liste veloci anche su tabelle grandi.
+
+    La lista è ordinata per ``keyset_ordering`` (campi non nulli con
+    la stessa direzione, l'ultimo univoco, coperti da un indice) e
+    paginata per chiave; il totale è stimato per le tabelle non filtrate
+    oltre ``ADMIN_ESTIMATED_COUNT_THRESHOLD`` righe.
+    """
+
+    keyset_ordering = ('-created_at', '-id')
+    paginator = PaginatorStimato
+    show_full_result_count = False
+    change_list_template = 'admin/keyset_change_list.html'
+
+    def get_ordering(self, request):
+        """Ordinamento predefinito della lista: la chiave di paginazione."""
+        return self.keyset_ordering
+
+    def get_changelist(self, request, **kwargs):
+        """Usa il ``ChangeList`` con paginazione keyset."""
+        return KeysetChangeList
+
+
+class AttiviListFilter(admin.SimpleListFilter):
+    """Filtro su ``is_active`` che, senza scelta, mostra le righe attive."""
+
+    title = _('stato')
+    parameter_name = 'attivi'
+
+    def lookups(self, request, model_admin):
+        """Le alternative alla scelta predefinita ("Attivi")."""
+        return [('0', _('Disattivati')), ('tutti', _('Tutti'))]
+
+    def choices(self, changelist):
+        """La voce senza parametro è "Attivi", non "Tutti"."""
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(
+                remove=[self.parameter_name]
+            ),
+            'display': _('Attivi'),
+        }
+        for lookup, title in self.lookup_choices:
+            yield {
+                'selected': self.value() == lookup,
+                'query_string': changelist.get_query_string({
+                    self.parameter_name: lookup
+                }),
+                'display': title,
+            }
+
+    def queryset(self, request, queryset):
+        """Righe attive, disattivate o tutte."""
+        value = self.value()
+        if value == 'tutti':
+            return queryset
+        return queryset.filter(is_active=value != '0')
+
+
+class SoloAttiviMixin:
+    """Mixin per ``ModelAdmin`` di ``BaseModel``: lista delle sole attive.
+
+    Le disattivate restano raggiungibili dal filtro "stato"; la lista
+    predefinita usa l'indice parziale ``WHERE is_active`` del modello,
+    da cui ``PaginatorStimato`` stima anche il totale.
+    """
+
+    def get_list_filter(self, request):
+        """Il filtro sullo stato precede gli altri."""
+        return [AttiviListFilter, *super().get_list_filter(request)]
+
+
+class AttivitaRecenteMixin:
+    """Mixin per ``ModelAdmin``: ultime azioni sull'oggetto in modifica.
+
+    Mette nel contesto della pagina di modifica ``recent_log_entries``,
+    le ultime ``attivita_recente_limite`` voci del registro admin
+    sull'oggetto. Tipo e id dell'oggetto sono coperti dall'indice
+    ``admin_log_oggetto_idx`` (migrazione ``common.0002``), che resta
+    veloce anche con milioni di voci.
+    """
+
+    attivita_recente_limite = 20
+
+    def attivita_recente(self, object_id):
+        """Voci del registro sull'oggetto, dalla più recente."""
+        # Lo stesso tipo che l'admin registra in ``log_addition`` e simili
+        content_type = ContentType.objects.get_for_model(
+            self.model, for_concrete_model=False
+        )
+        return (
+            LogEntry.objects.filter(
+                content_type=content_type, object_id=str(object_id)
+            )
+            .select_related('user')
+            .order_by('-action_time')[: self.attivita_recente_limite]
+        )
+
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        """Aggiunge le ultime azioni al contesto della modifica."""
+        extra_context = {
+            'recent_log_entries': self.attivita_recente(object_id),
+            **(extra_context or {}),
+        }
+        return super().change_view(
+            request, object_id, form_url, extra_context=extra_context
+        )
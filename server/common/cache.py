@@ -0,0 +1,19 @@
+"""Cache condivise tra i processi.
+
+Le versioni che rendono obsoleti i dati tenuti dai worker (permessi,
+tabella geografica) funzionano solo se tutti i worker leggono la stessa
+cache: ``LocMemCache`` vive nel processo e ``DummyCache`` non memorizza
+nulla, quindi un'invalidazione non arriverebbe agli altri worker.
+"""
+
+from django.conf import settings
+
+_CACHE_LOCALI = frozenset({
+    'django.core.cache.backends.dummy.DummyCache',
+    'django.core.cache.backends.locmem.LocMemCache',
+})
+
+
+def cache_condivisa(alias: str) -> bool:
+    """``True`` se la cache ``alias`` è la stessa per tutti i processi."""
+    return settings.CACHES[alias]['BACKEND'] not in _CACHE_LOCALI
@@ -0,0 +1,44 @@
+"""
+Management command to create the monthly partitions of the change history.
+
+Meant to run periodically (e.g. monthly from cron): rows of a month
+without a partition end up in the DEFAULT partition and are moved into
+the new partition when it is created.
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import connection
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    """Create the history partitions for the current and next months."""
+
+    help = (
+        'Creates the monthly partitions of the change history table '
+        '(current month plus --months ahead).'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Define CLI arguments for the management command."""
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=2,
+            help='Months ahead of the current one to prepare.',
+        )
+
+    def handle(self, *args, **options):
+        """Execute the command."""
+        today = timezone.localdate()
+        with connection.cursor() as cursor:
+            for offset in range(options['months'] + 1):
+                year, month = divmod(today.month - 1 + offset, 12)
+                month_start = date(today.year + year, month + 1, 1)
+                cursor.execute(
+                    'SELECT storico_crea_partizione(%s)', [month_start]
+                )
+                (partition,) = cursor.fetchone()
+                self.stdout.write(f'{month_start:%Y-%m}: {partition}')
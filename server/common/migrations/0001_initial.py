@@ -0,0 +1,202 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:53
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+import server.common.models
+
+# La tabella è partizionata per intervalli mensili di ``registrata_at``:
+# le interrogazioni per periodo leggono solo le partizioni interessate e
+# lo storico vecchio si archivia staccando una partizione intera. La
+# chiave di partizione deve far parte della chiave primaria, che in
+# database è quindi (id, registrata_at); per Django resta ``id``.
+# Le partizioni mensili le crea ``storico_crea_partizione`` (comando
+# ``crea_partizioni_storico``); le righe fuori da ogni mese finiscono
+# nella partizione DEFAULT.
+_CREA_TABELLA = """
+CREATE TABLE common_storicomodifica (
+    id uuid NOT NULL,
+    registrata_at timestamp with time zone NOT NULL,
+    object_id uuid NOT NULL,
+    azione varchar(9) NOT NULL,
+    versione_precedente bigint NULL,
+    versione bigint NOT NULL,
+    modifiche jsonb NOT NULL,
+    utente_fullname varchar(150) NOT NULL,
+    content_type_id integer NOT NULL,
+    utente_id bigint NULL,
+    PRIMARY KEY (id, registrata_at),
+    CONSTRAINT storicomodifica_azione_valid
+        CHECK (azione IN ('creazione', 'modifica')),
+    CONSTRAINT common_storicomodifi_content_type_id_537318e3_fk_django_co
+        FOREIGN KEY (content_type_id) REFERENCES django_content_type (id)
+        DEFERRABLE INITIALLY DEFERRED,
+    CONSTRAINT common_storicomodifi_utente_id_de5f847d_fk_accounts_
+        FOREIGN KEY (utente_id) REFERENCES accounts_customuser (id)
+        DEFERRABLE INITIALLY DEFERRED
+) PARTITION BY RANGE (registrata_at);
+
+CREATE TABLE common_storicomodifica_default
+    PARTITION OF common_storicomodifica DEFAULT;
+
+CREATE INDEX common_storicomodifica_utente_id_de5f847d
+    ON common_storicomodifica (utente_id);
+CREATE INDEX storico_oggetto_idx
+    ON common_storicomodifica (content_type_id, object_id, registrata_at);
+
+CREATE OR REPLACE FUNCTION storico_crea_partizione(mese date)
+RETURNS text
+LANGUAGE plpgsql AS $$
+DECLARE
+    inizio date := date_trunc('month', mese);
+    fine date := date_trunc('month', mese) + interval '1 month';
+    nome text := 'common_storicomodifica_' || to_char(mese, 'YYYYMM');
+BEGIN
+    IF to_regclass(nome) IS NOT NULL THEN
+        RETURN nome;
+    END IF;
+    EXECUTE format(
+        'CREATE TABLE %I (LIKE common_storicomodifica '
+        'INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', nome
+    );
+    -- Le righe del mese già finite nella partizione DEFAULT vanno
+    -- spostate, altrimenti ATTACH PARTITION fallisce
+    EXECUTE format(
+        'WITH spostate AS ('
+        '    DELETE FROM common_storicomodifica_default'
+        '    WHERE registrata_at >= $1 AND registrata_at < $2'
+        '    RETURNING *'
+        ') INSERT INTO %I SELECT * FROM spostate', nome
+    ) USING inizio, fine;
+    EXECUTE format(
+        'ALTER TABLE common_storicomodifica '
+        'ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        nome, inizio, fine
+    );
+    RETURN nome;
+END
+$$;
+
+SELECT storico_crea_partizione(current_date);
+SELECT storico_crea_partizione((current_date + interval '1 month')::date);
+"""
+
+_ELIMINA_TABELLA = """
+DROP TABLE IF EXISTS common_storicomodifica CASCADE;
+DROP FUNCTION IF EXISTS storico_crea_partizione(date);
+"""
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(_CREA_TABELLA, _ELIMINA_TABELLA),
+            ],
+            state_operations=[
+                migrations.CreateModel(
+                    name='StoricoModifica',
+                    fields=[
+                        (
+                            'id',
+                            models.UUIDField(
+                                default=server.common.models.uuid7,
+                                editable=False,
+                                primary_key=True,
+                                serialize=False,
+                            ),
+                        ),
+                        (
+                            'registrata_at',
+                            models.DateTimeField(
+                                default=django.utils.timezone.now,
+                                editable=False,
+                                verbose_name='registrata il',
+                            ),
+                        ),
+                        (
+                            'object_id',
+                            models.UUIDField(verbose_name='id oggetto'),
+                        ),
+                        (
+                            'azione',
+                            models.CharField(
+                                choices=[
+                                    ('creazione', 'creazione'),
+                                    ('modifica', 'modifica'),
+                                ],
+                                max_length=9,
+                            ),
+                        ),
+                        (
+                            'versione_precedente',
+                            models.BigIntegerField(blank=True, null=True),
+                        ),
+                        ('versione', models.BigIntegerField()),
+                        (
+                            'modifiche',
+                            models.JSONField(
+                                encoder=django.core.serializers.json.DjangoJSONEncoder
+                            ),
+                        ),
+                        (
+                            'utente_fullname',
+                            models.CharField(blank=True, max_length=150),
+                        ),
+                        (
+                            'content_type',
+                            models.ForeignKey(
+                                db_index=False,
+                                on_delete=django.db.models.deletion.CASCADE,
+                                related_name='+',
+                                to='contenttypes.contenttype',
+                            ),
+                        ),
+                        (
+                            'utente',
+                            models.ForeignKey(
+                                blank=True,
+                                null=True,
+                                on_delete=django.db.models.deletion.SET_NULL,
+                                related_name='+',
+                                to=settings.AUTH_USER_MODEL,
+                            ),
+                        ),
+                    ],
+                    options={
+                        'verbose_name': 'Modifica',
+                        'verbose_name_plural': 'Storico modifiche',
+                        'indexes': [
+                            models.Index(
+                                fields=[
+                                    'content_type',
+                                    'object_id',
+                                    'registrata_at',
+                                ],
+                                name='storico_oggetto_idx',
+                            )
+                        ],
+                        'constraints': [
+                            models.CheckConstraint(
+                                condition=models.Q((
+                                    'azione__in',
+                                    ['creazione', 'modifica'],
+                                )),
+                                name='storicomodifica_azione_valid',
+                            )
+                        ],
+                    },
+                ),
+            ],
+        ),
+    ]
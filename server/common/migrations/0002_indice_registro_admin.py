@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-17 07:20
+
+from django.db import migrations
+
+# Le ultime azioni su un oggetto (``AttivitaRecenteMixin``) filtrano il
+# registro admin per tipo e id dell'oggetto, ordinate per data: senza
+# questo indice ``object_id`` (testo) costringe a leggere tutta la
+# tabella. ``django_admin_log`` appartiene a ``django.contrib.admin``,
+# quindi l'indice si crea in SQL; CONCURRENTLY non blocca le scritture
+# sul registro già popolato, e richiede una migrazione non atomica.
+_CREA_INDICE = """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS admin_log_oggetto_idx
+ON django_admin_log (content_type_id, object_id, action_time DESC)
+"""
+_ELIMINA_INDICE = 'DROP INDEX CONCURRENTLY IF EXISTS admin_log_oggetto_idx'
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('admin', '0003_logentry_add_action_flag_choices'),
+        ('common', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunSQL(_CREA_INDICE, _ELIMINA_INDICE),
+    ]
@@ -1,11 +1,162 @@
+import os
+import threading
+import time
 import uuid
+from typing import ClassVar
 
-from concurrency.fields import IntegerVersionField
-from crum import get_current_user
+from concurrency.fields import OFFSET, IntegerVersionField
 from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from server.common import storico
+from server.common.audit import autore
+
+_uuid7_lock = threading.Lock()
+_uuid7_last = 0
+
+
+def uuid7():
+    """UUID versione 7 (RFC 9562): ordinato per istante di creazione.
+
+    I primi 48 bit sono i millisecondi Unix, i 12 di ``rand_a`` la
+    frazione di millisecondo, il resto è casuale. Chiavi generate in
+    sequenza finiscono in coda all'indice B-tree invece che in una
+    pagina qualsiasi, come accade con ``uuid4``. Nello stesso processo
+    i valori sono strettamente crescenti.
+
+    >>> first, second = uuid7(), uuid7()
+    >>> first.version, first.variant == uuid.RFC_4122
+    (7, True)
+    >>> first < second
+    True
+    """
+    global _uuid7_last  # noqa: PLW0603
+    milliseconds, rest = divmod(time.time_ns(), 1_000_000)
+    stamp = milliseconds << 12 | rest * 4096 // 1_000_000
+    with _uuid7_lock:
+        # Stesso istante (o orologio indietro): si avanza di un passo
+        stamp = _uuid7_last = max(stamp, _uuid7_last + 1)
+    random = int.from_bytes(os.urandom(8)) & ((1 << 62) - 1)
+    return uuid.UUID(
+        int=(stamp >> 12) << 80
+        | 7 << 76
+        | (stamp & 0xFFF) << 64
+        | 0b10 << 62
+        | random
+    )
+
+
+class BaseQuerySet(models.QuerySet):
+    """QuerySet dei modelli ``BaseModel`` con scritture in blocco firmate.
+
+    ``bulk_create``, ``bulk_update`` e ``update`` non passano da
+    ``save()``: le varianti ``audited_*`` compilano i campi di audit una
+    sola volta per blocco e fanno avanzare ``version`` come un
+    salvataggio, ma non lasciano righe nello storico delle modifiche.
+    I comandi di gestione passano l'utente con ``user`` (o aprono
+    ``impersonate``), altrimenti si usa quello corrente.
+    """
+
+    def attivi(self):
+        """Solo le righe con ``is_active``."""
+        return self.filter(is_active=True)
+
+    def soft_delete(self, *, user=None):
+        """Disattiva le righe con un solo ``UPDATE`` firmato.
+
+        Come ``audited_update`` non passa da ``save()``: lo storico delle
+        modifiche non registra la disattivazione.
+        """
+        return self.filter(is_active=True).audited_update(
+            user=user, is_active=False
+        )
+
+    def audited_bulk_create(self, objs, *, user=None, **kwargs):
+        """``bulk_create`` che imposta ``created_by`` e ``updated_by``.
+
+        ``version``, ``created_at`` e ``updated_at`` li imposta già
+        ``bulk_create`` tramite ``pre_save`` dei campi.
+        """
+        user, fullname = autore(user)
+        objs = list(objs)
+        if user is not None:
+            for obj in objs:
+                if obj.created_by_id is None:
+                    obj.created_by = user
+                    obj.created_by_fullname = fullname
+                obj.updated_by = user
+                obj.updated_by_fullname = fullname
+        return self.bulk_create(objs, **kwargs)
+
+    def audited_bulk_update(self, objs, fields, *, user=None, **kwargs):
+        """``bulk_update`` dei ``fields`` più ``updated_*`` e ``version``."""
+        user, fullname = autore(user)
+        now = timezone.now()
+        version = self.model._concurrencymeta.field  # noqa: SLF001
+        audit = ['updated_at', version.attname]
+        if user is not None:
+            audit += ['updated_by', 'updated_by_fullname']
+        objs = list(objs)
+        for obj in objs:
+            obj.updated_at = now
+            next_version = version._get_next_version(obj)  # noqa: SLF001
+            setattr(obj, version.attname, next_version)
+            if user is not None:
+                obj.updated_by = user
+                obj.updated_by_fullname = fullname
+        fields = [*fields, *(name for name in audit if name not in fields)]
+        return self.bulk_update(objs, fields, **kwargs)
+
+    def audited_update(self, *, user=None, **kwargs):
+        """``update(**kwargs)`` che firma le righe e ne aggiorna la versione.
+
+        La nuova versione segue ``IntegerVersionField``: il timestamp in
+        microsecondi, o la versione precedente più uno se maggiore.
+        """
+        user, fullname = autore(user)
+        stamp = int(time.time() * 1_000_000) - OFFSET
+        kwargs |= {
+            'updated_at': timezone.now(),
+            'version': Greatest(F('version') + 1, Value(stamp)),
+        }
+        if user is not None:
+            kwargs |= {'updated_by': user, 'updated_by_fullname': fullname}
+        return self.update(**kwargs)
+
+
+BaseManager = models.Manager.from_queryset(BaseQuerySet)
+
+
+class ActiveManager(BaseManager):
+    """Manager delle sole righe attive (``is_active``).
+
+    I modelli ne dichiarano un indice parziale ``WHERE is_active`` sulle
+    colonne interrogate più spesso.
+    """
+
+    def get_queryset(self):
+        """Il queryset di ``BaseManager`` filtrato su ``is_active``."""
+        return super().get_queryset().attivi()
+
+
+# Campi di servizio: non finiscono nello storico delle modifiche
+_CAMPI_NON_STORICIZZATI = frozenset({
+    'id',
+    'created_at',
+    'created_by',
+    'created_by_fullname',
+    'updated_at',
+    'updated_by',
+    'updated_by_fullname',
+    'version',
+})
+
 
 class BaseModel(models.Model):
     """
@@ -15,7 +166,7 @@ class BaseModel(models.Model):
     """
 
     id = models.UUIDField(
-        _('id'), primary_key=True, default=uuid.uuid4, editable=False
+        _('id'), primary_key=True, default=uuid7, editable=False
     )
     created_at = models.DateTimeField(_('created at'), auto_now_add=True)
     updated_at = models.DateTimeField(_('updated at'), auto_now=True)
@@ -40,9 +191,68 @@ class BaseModel(models.Model):
         default=True, verbose_name=_('ancora attivo')
     )
 
+    objects = BaseManager()
+    attivi = ActiveManager()
+
+    # Con True ogni save() registra i campi cambiati in StoricoModifica
+    registra_storico = False
+
     class Meta:
         abstract = True
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Memorizza lo stato caricato per calcolare lo storico."""
+        instance = super().from_db(db, field_names, values)
+        if cls.registra_storico:
+            instance._stato_salvato = instance._stato_storico()  # noqa: SLF001
+        return instance
+
+    def _stato_storico(self, update_fields=None):
+        """``{attname: valore}`` dei campi storicizzati e caricati."""
+        deferred = self.get_deferred_fields()
+        return {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if field.name not in _CAMPI_NON_STORICIZZATI
+            and field.attname not in deferred
+            and (
+                update_fields is None
+                or field.name in update_fields
+                or field.attname in update_fields
+            )
+        }
+
+    def _registra_storico(self, versione_precedente, update_fields, firma):
+        """Accoda la riga di storico del salvataggio appena eseguito.
+
+        Il confronto è con lo stato caricato (o salvato l'ultima volta
+        dalla stessa istanza); un salvataggio che non cambia nulla non
+        lascia traccia.
+        """
+        prima = getattr(self, '_stato_salvato', {})
+        dopo = self._stato_storico(update_fields)
+        modifiche = storico.differenze(prima, dopo)
+        self._stato_salvato = prima | dopo
+        if not modifiche:
+            return
+        user, fullname = firma
+        voce = StoricoModifica(
+            content_type=ContentType.objects.get_for_model(self),
+            object_id=self.pk,
+            azione=(
+                AzioneStorico.CREAZIONE
+                if versione_precedente is None
+                else AzioneStorico.MODIFICA
+            ),
+            versione_precedente=versione_precedente,
+            versione=self.version,
+            modifiche=modifiche,
+            utente=user,
+            utente_fullname=fullname,
+        )
+        storico.accoda(voce, using=self._state.db)
+
     def save(self, *args, **kwargs):
         """
         Overrides the default save method.
@@ -50,19 +260,107 @@ class BaseModel(models.Model):
         This automatically set the user and their full name
         for created_by and updated_by fields based on the current user context.
         """
-        user = get_current_user()
-        if user and not user.is_anonymous:
+        user, fullname = autore()
+        if user is not None:
             # Imposta created_by solo se non è già stato impostato
             if self.created_by is None:
                 self.created_by = user
-                self.created_by_fullname = (
-                    user.nome_utente
-                    if hasattr(user, 'nome_utente')
-                    else str(user)
-                )
+                self.created_by_fullname = fullname
             # L'utente che ha fatto l'ultima modifica è sempre l'utente corrente
             self.updated_by = user
-            self.updated_by_fullname = (
-                user.nome_utente if hasattr(user, 'nome_utente') else str(user)
-            )
+            self.updated_by_fullname = fullname
+        versione_precedente = None if self._state.adding else self.version
         super().save(*args, **kwargs)
+        if self.registra_storico:
+            self._registra_storico(
+                versione_precedente,
+                kwargs.get('update_fields'),
+                (user, fullname),
+            )
+
+
+class AzioneStorico(models.TextChoices):
+    """Tipo di salvataggio registrato nello storico."""
+
+    CREAZIONE = 'creazione', _('creazione')
+    MODIFICA = 'modifica', _('modifica')
+
+
+class StoricoQuerySet(models.QuerySet):
+    """Interrogazioni dello storico per oggetto e per periodo."""
+
+    def per_oggetto(self, obj):
+        """Modifiche di ``obj``, dalla più recente."""
+        return self.filter(
+            content_type=ContentType.objects.get_for_model(obj),
+            object_id=obj.pk,
+        ).order_by('-registrata_at', '-id')
+
+    def nel_periodo(self, inizio=None, fine=None):
+        """Modifiche registrate in ``[inizio, fine)``.
+
+        Un filtro su ``registrata_at`` limita la lettura alle sole
+        partizioni mensili interessate.
+        """
+        queryset = self
+        if inizio is not None:
+            queryset = queryset.filter(registrata_at__gte=inizio)
+        if fine is not None:
+            queryset = queryset.filter(registrata_at__lt=fine)
+        return queryset
+
+
+class StoricoModifica(models.Model):
+    """Campi cambiati da un salvataggio di un ``BaseModel``.
+
+    Tabella in sola aggiunta, partizionata per mese su ``registrata_at``
+    (vedi la migrazione ``0001_initial`` e il comando
+    ``crea_partizioni_storico``). ``modifiche`` è
+    ``{campo: [prima, dopo]}``, con le chiavi esterne come ``<campo>_id``.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    registrata_at = models.DateTimeField(
+        _('registrata il'), default=timezone.now, editable=False
+    )
+    content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.CASCADE,
+        related_name='+',
+        db_index=False,
+    )
+    object_id = models.UUIDField(_('id oggetto'))
+    azione = models.CharField(max_length=9, choices=AzioneStorico)
+    versione_precedente = models.BigIntegerField(null=True, blank=True)
+    versione = models.BigIntegerField()
+    modifiche = models.JSONField(encoder=DjangoJSONEncoder)
+    utente = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
+    utente_fullname = models.CharField(max_length=150, blank=True)
+
+    objects = StoricoQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Modifica'
+        verbose_name_plural = 'Storico modifiche'
+        indexes: ClassVar[list[models.Index]] = [
+            models.Index(
+                fields=['content_type', 'object_id', 'registrata_at'],
+                name='storico_oggetto_idx',
+            ),
+        ]
+        constraints: ClassVar[list[models.CheckConstraint]] = [
+            models.CheckConstraint(
+                condition=models.Q(azione__in=AzioneStorico.values),
+                name='storicomodifica_azione_valid',
+            ),
+        ]
+
+    def __str__(self):
+        """Oggetto, azione e istante della modifica."""
+        return f'{self.get_azione_display()} {self.object_id}'
@@ -0,0 +1,172 @@
+"""Paginazione per tabelle grandi: conteggi stimati e chiavi di seek.
+
+``COUNT(*)`` su una tabella di milioni di righe la scansiona tutta ed
+``OFFSET`` legge e scarta tutte le righe delle pagine precedenti. Qui:
+
+- il totale di un queryset non filtrato (o filtrato con la condizione
+  di un indice parziale) viene letto da ``pg_class.reltuples``
+  (aggiornato da ``ANALYZE``/autovacuum) quando supera
+  ``ADMIN_ESTIMATED_COUNT_THRESHOLD``;
+- le pagine successive si ottengono con ``(created_at, id) < (..., ...)``
+  sull'ultima riga mostrata (keyset), che usa l'indice sulle stesse
+  colonne qualunque sia la profondità della pagina.
+
+Il ``ChangeList`` per l'admin è in ``server.common.admin``.
+"""
+
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import F, Field, Func, Value
+from django.utils.functional import cached_property
+
+
+def _indice_parziale(queryset):
+    """Nome dell'indice parziale con la stessa condizione dei filtri.
+
+    Per esempio ``WHERE is_active`` della lista predefinita di
+    ``SoloAttiviMixin``; ``None`` se nessun indice corrisponde.
+    """
+    model = queryset.model
+    for index in model._meta.indexes:  # noqa: SLF001
+        if index.condition is None:
+            continue
+        condizione = model._base_manager.filter(index.condition).query.where  # noqa: SLF001
+        if condizione == queryset.query.where:
+            return index.name
+    return None
+
+
+def stima_righe(queryset):
+    """Righe stimate da ``pg_class`` per un queryset senza filtri.
+
+    Se i filtri sono la condizione di un indice parziale si stimano le
+    righe dell'indice. Restituisce ``None`` se il queryset ha altri
+    filtri, è distinto o composto, o se la tabella non è mai stata
+    analizzata.
+    """
+    query = queryset.query
+    if query.distinct or query.combinator:
+        return None
+    connection = connections[queryset.db]
+    table = connection.ops.quote_name(queryset.model._meta.db_table)  # noqa: SLF001
+    relation = table
+    if query.where:
+        index = _indice_parziale(queryset)
+        if index is None:
+            return None
+        relation = connection.ops.quote_name(index)
+    with connection.cursor() as cursor:
+        # ANALYZE aggiorna anche le righe stimate degli indici parziali
+        cursor.execute(
+            'SELECT t.reltuples::bigint, r.reltuples::bigint '
+            'FROM pg_class t, pg_class r '
+            'WHERE t.oid = %s::regclass AND r.oid = %s::regclass',
+            [table, relation],
+        )
+        analizzata, reltuples = cursor.fetchone()
+    return reltuples if analizzata >= 0 else None
+
+
+class PaginatorStimato(Paginator):
+    """``Paginator`` che stima il totale delle tabelle grandi non filtrate.
+
+    Sotto la soglia, o con filtri che non sono la condizione di un indice
+    parziale, il conteggio resta esatto.
+    """
+
+    @cached_property
+    def stima(self):
+        """Totale letto da ``pg_class``, o ``None`` se va contato."""
+        stima = stima_righe(self.object_list)
+        if stima is None or stima <= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+            return None
+        return stima
+
+    @cached_property
+    def count(self):
+        """Totale degli oggetti, stimato per le tabelle grandi."""
+        if self.stima is None:
+            return super().count
+        return self.stima
+
+
+class CursoreNonValidoError(ValueError):
+    """Il cursore della pagina non è decodificabile."""
+
+
+def _campi(ordering):
+    """``('-created_at', '-id')`` -> ``(['created_at', 'id'], True)``.
+
+    >>> _campi(('name', 'id'))
+    (['name', 'id'], False)
+    >>> _campi(('-created_at', 'id'))
+    Traceback (most recent call last):
+        ...
+    ValueError: Keyset con direzioni miste: ('-created_at', 'id')
+    """
+    discendente = {name.startswith('-') for name in ordering}
+    if len(discendente) != 1:
+        msg = f'Keyset con direzioni miste: {ordering!r}'
+        raise ValueError(msg)
+    return [name.lstrip('-') for name in ordering], discendente.pop()
+
+
+def chiave(obj, ordering):
+    """Valori di ``obj`` per i campi di ``ordering``."""
+    names, _ = _campi(ordering)
+    opts = obj._meta  # noqa: SLF001
+    return [getattr(obj, opts.get_field(name).attname) for name in names]
+
+
+def cursore(obj, ordering, *, indietro=False):
+    """Codifica la chiave di ``obj`` per la pagina dopo (o prima) di lui."""
+    names, _ = _campi(ordering)
+    opts = obj._meta  # noqa: SLF001
+    values = [opts.get_field(name).value_to_string(obj) for name in names]
+    payload = json.dumps([indietro, values], separators=(',', ':'))
+    # Senza padding: il cursore finisce nella query string
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decodifica_cursore(model, ordering, token):
+    """``(indietro, valori)`` dal cursore; ``CursoreNonValidoError``."""
+    names, _ = _campi(ordering)
+    fields = [model._meta.get_field(name) for name in names]  # noqa: SLF001
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        indietro, values = json.loads(base64.urlsafe_b64decode(padded))
+        if len(values) != len(fields):
+            raise CursoreNonValidoError(token)
+        return bool(indietro), [
+            field.to_python(value)
+            for field, value in zip(fields, values, strict=True)
+        ]
+    except (binascii.Error, TypeError, ValueError, ValidationError) as exc:
+        raise CursoreNonValidoError(token) from exc
+
+
+def _riga(values):
+    """``ROW(a, b)``: Postgres la confronta in ordine lessicografico."""
+    return Func(*values, function='ROW', output_field=Field())
+
+
+def seek(queryset, ordering, values, *, indietro=False):
+    """Righe di ``queryset`` che seguono (o precedono) la chiave ``values``.
+
+    ``queryset`` deve essere ordinato per ``ordering``; a ritroso anche
+    l'ordinamento viene invertito, così ``[:n]`` prende le righe più
+    vicine alla chiave.
+    """
+    names, discendente = _campi(ordering)
+    lookup = 'gt' if discendente == indietro else 'lt'
+    key = _riga([F(name) for name in names])
+    queryset = queryset.alias(keyset=key).filter(**{
+        f'keyset__{lookup}': _riga([Value(value) for value in values])
+    })
+    return queryset.reverse() if indietro else queryset
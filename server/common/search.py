@@ -0,0 +1,81 @@
+"""Ricerca admin su PostgreSQL con indici trigram (``pg_trgm``).
+
+La ricerca predefinita dell'admin genera ``UPPER(campo) LIKE UPPER(%s)``,
+che non può usare indici e obbliga a scansionare la tabella. Qui ogni
+campo viene confrontato come ``LOWER(f_unaccent(campo))``: la stessa
+espressione degli indici GIN ``gin_trgm_ops`` creati nelle migrazioni,
+per cui il ``LIKE`` usa l'indice ed è insensibile a maiuscole e accenti.
+
+``f_unaccent`` è un wrapper ``IMMUTABLE`` di ``unaccent`` (che non può
+comparire in un indice) creato dalla migrazione che installa le
+estensioni. Il mixin per l'admin è in ``server.common.admin``.
+"""
+
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models import F, Func, Q, TextField
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.functions import Lower
+from django.db.models.lookups import Contains
+from django.utils.text import smart_split, unescape_string_literal
+
+CREA_F_UNACCENT = """
+CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;
+"""
+ELIMINA_F_UNACCENT = 'DROP FUNCTION IF EXISTS f_unaccent(text);'
+
+
+class ImmutableUnaccent(Func):
+    """``f_unaccent(testo)``: ``unaccent`` utilizzabile negli indici."""
+
+    function = 'f_unaccent'
+    output_field = TextField()
+
+
+def normalizzato(expression):
+    """Espressione confrontata dalla ricerca e indicizzata.
+
+    Accetta il nome di un campo o un'espressione.
+    """
+    if isinstance(expression, str):
+        expression = F(expression)
+    return Lower(ImmutableUnaccent(expression))
+
+
+def indice_trigrammi(field_name, name):
+    """Indice GIN ``gin_trgm_ops`` sull'espressione usata dalla ricerca."""
+    return GinIndex(
+        OpClass(normalizzato(field_name), name='gin_trgm_ops'), name=name
+    )
+
+
+def termini(search_term):
+    """Divide il testo cercato come fa l'admin di Django.
+
+    >>> termini('rossi "via roma"')
+    ['rossi', 'via roma']
+    """
+    result = []
+    for bit in smart_split(search_term):
+        if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+            bit = unescape_string_literal(bit)  # noqa: PLW2901
+        result.append(bit)
+    return result
+
+
+def contiene(model, field_name, value):
+    """Condizione ``campo LIKE %valore%`` sull'espressione indicizzata.
+
+    I campi correlati (``citta__name``) diventano una subquery
+    ``citta_id IN (...)``: così la condizione resta sulla tabella
+    principale e si combina in OR con gli indici dei campi locali.
+    """
+    if LOOKUP_SEP in field_name:
+        name, rest = field_name.split(LOOKUP_SEP, 1)
+        related = model._meta.get_field(name).related_model  # noqa: SLF001
+        subquery = related._default_manager.filter(  # noqa: SLF001
+            contiene(related, rest, value)
+        ).values('pk')
+        return Q(**{f'{name}__in': subquery})
+    return Q(Contains(normalizzato(field_name), value))
@@ -0,0 +1,72 @@
+"""Storico delle modifiche dei ``BaseModel``: raccolta e scrittura in blocco.
+
+``BaseModel.save()`` confronta i campi con lo stato caricato dal
+database e, per i modelli con ``registra_storico = True``, prepara una
+riga di ``StoricoModifica`` senza scriverla. Le righe di una transazione
+sono raccolte in un lotto, registrato con ``transaction.on_commit``, e
+scritte con un solo ``bulk_create`` appena la transazione più esterna
+va a buon fine, dalla stessa connessione. Le righe salvate in un
+savepoint hanno un lotto proprio, che Django scarta se il savepoint
+viene annullato. Fuori da una transazione la riga si scrive subito.
+
+Le scritture in blocco di ``BaseQuerySet`` (``audited_update``,
+``soft_delete``, ``audited_bulk_create``, ``audited_bulk_update``) non
+passano da ``save()`` e non lasciano righe di storico.
+"""
+
+from django.db import transaction
+
+
+def differenze(prima, dopo):
+    """Campi di ``dopo`` cambiati rispetto a ``prima``.
+
+    Un campo assente da ``prima`` (oggetto appena creato) risulta
+    sempre cambiato, con ``None`` come valore precedente.
+
+    >>> differenze({'nome': 'Acme', 'citta_id': 1}, {'citta_id': 2})
+    {'citta_id': [1, 2]}
+    >>> differenze({}, {'nome': 'Acme'})
+    {'nome': [None, 'Acme']}
+    """
+    return {
+        name: [prima.get(name), value]
+        for name, value in dopo.items()
+        if name not in prima or prima[name] != value
+    }
+
+
+def scrivi(voci):
+    """Scrive le righe di storico con un solo ``bulk_create``."""
+    type(voci[0]).objects.bulk_create(voci)
+
+
+class _Lotto:
+    """Righe di storico di un livello di transazione, scritte al commit."""
+
+    def __init__(self, voce):
+        self.voci = [voce]
+        self.scritto = False
+
+    def __call__(self):
+        self.scritto = True
+        scrivi(self.voci)
+
+
+def accoda(voce, using=None):
+    """Accoda ``voce`` per la scrittura al commit della transazione.
+
+    Le righe accodate allo stesso livello di savepoint finiscono nello
+    stesso lotto: si cerca tra le callback ``on_commit`` già registrate.
+    """
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        scrivi([voce])
+        return
+    savepoint_ids = set(connection.savepoint_ids)
+    for sids, func, _robust in reversed(connection.run_on_commit):
+        if sids == savepoint_ids and isinstance(func, _Lotto):
+            if not func.scritto:
+                func.voci.append(voce)
+                return
+            break
+    transaction.on_commit(_Lotto(voce), using=using)
@@ -0,0 +1,23 @@
+"""Utility per il confronto di testi (nomi di città, ragioni sociali)."""
+
+import re
+import unicodedata
+
+_SPACES = re.compile(r'\s+')
+# Apostrofi e trattini sono scritti in modi diversi nei file di origine
+_SEPARATORS = str.maketrans(dict.fromkeys("'\u2019`-", ' '))
+
+
+def normalizza_testo(value: str) -> str:
+    """Normalizza un testo per confronti insensibili a maiuscole e accenti.
+
+    >>> normalizza_testo("  Sant'Antonino di SUSA ")
+    'sant antonino di susa'
+    >>> normalizza_testo('Forlì-Cesena')
+    'forli cesena'
+    """
+    decomposed = unicodedata.normalize('NFKD', value.casefold())
+    folded = ''.join(
+        char for char in decomposed if not unicodedata.combining(char)
+    )
+    return _SPACES.sub(' ', folded.translate(_SEPARATORS)).strip()
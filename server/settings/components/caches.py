@@ -7,6 +7,14 @@ CACHES = {
         # like https://github.com/jazzband/django-redis
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     },
+    # Esiti VIES e circuit breaker: persistenti e condivisi tra i worker
+    # (la tabella si crea con ``manage.py createcachetable``)
+    'vies': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'vies_cache',
+        # Una voce per Partita IVA: il default (300) scarterebbe esiti validi
+        'OPTIONS': {'MAX_ENTRIES': 100_000},
+    },
 }
 
 
@@ -51,6 +51,7 @@ DJANGO_CORE_APPS: tuple[str, ...] = (
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.admin',
+    'django.contrib.postgres',
 )
 
 INSTALLED_APPS: tuple[str, ...] = (
@@ -98,6 +99,7 @@ JAZZMIN_SETTINGS = {
         # Nazioni (CountryProxy) - use FA5 icon
         'cities_light.CountryProxy': 'fas fa-globe-europe',
         'cities_light.RegionProxy': 'fas fa-map-marker-alt',
+        'main.LocalizzazioneGeo': 'fas fa-language',
         # Pareri app models (TODO: verificare app_label corretto)
         'pareri.TipoOrigine': 'fas fa-building-columns',
         'pareri.EspertoRadioprotezione': 'fas fa-radiation',
@@ -113,9 +115,11 @@ JAZZMIN_SETTINGS = {
         'axes.AccessFailureLog': 'fas fa-ban',
         # Admin app (voci di Log)
         'admin.LogEntry': 'fas fa-history',
+        'common.StoricoModifica': 'fas fa-stream',
         # DatoriLavoro app (use FA5-compatible icon)
         'datoriLavoro.Sede': 'fas fa-map-marker-alt',
         'datoriLavoro.DatoreLavoro': 'fas fa-user-tie',
+        'datoriLavoro.VerificaPartitaIva': 'fas fa-check-double',
     },
     'show_logout': False,
 }
@@ -171,8 +175,9 @@ MIDDLEWARE: tuple[str, ...] = (
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     # Axes:
     'axes.middleware.AxesMiddleware',
-    # CRUM - Current Request User Middleware:
-    'crum.CurrentRequestUserMiddleware',
+    # Utente corrente in una ContextVar (sostituisce il thread locale di
+    # crum) e nome per le colonne di audit, risolto una volta a richiesta:
+    'server.common.audit.ContestoAuditMiddleware',
     # django-browser-reload
     'django_browser_reload.middleware.BrowserReloadMiddleware',
 )
@@ -282,7 +287,16 @@ MEDIA_ROOT = BASE_DIR.joinpath('media')
 
 AUTHENTICATION_BACKENDS = (
     'axes.backends.AxesBackend',
-    'django.contrib.auth.backends.ModelBackend',
+    # ModelBackend con i permessi nella cache condivisa
+    'server.apps.accounts.backends.CachedModelBackend',
+)
+
+# Cache dei permessi per utente (server.apps.accounts.backends): va
+# condivisa tra i worker perché l'invalidazione valga per tutti; con
+# LocMemCache o DummyCache i permessi si leggono dal database
+PERMISSIONS_CACHE_ALIAS = config('PERMISSIONS_CACHE_ALIAS', default='default')
+PERMISSIONS_CACHE_TTL = config(
+    'PERMISSIONS_CACHE_TTL', cast=int, default=60 * 60
 )
 
 # Use the project's custom user model defined in accounts app
@@ -348,6 +362,54 @@ AUTHORIZED_APPS: list[str] = [
     app.strip() for app in _ADMIN_AUTHORIZED_APPS.split(',') if app.strip()
 ]
 
+# Ricerca admin con indici trigram e senza accenti (server.common.search);
+# con False si torna alla ricerca `icontains` predefinita di Django
+ADMIN_TRIGRAM_SEARCH = config('ADMIN_TRIGRAM_SEARCH', cast=bool, default=True)
+
+# Oltre questa soglia le liste admin non filtrate mostrano il totale
+# stimato da pg_class invece di un COUNT(*) (server.common.paginazione)
+ADMIN_ESTIMATED_COUNT_THRESHOLD = config(
+    'ADMIN_ESTIMATED_COUNT_THRESHOLD', cast=int, default=100_000
+)
+
+
+# VIES (verifica Partite IVA)
+# ============================================================================
+
+# Alias della cache usata per memorizzare gli esiti delle verifiche VIES e
+# lo stato del circuit breaker: va condivisa tra i processi, altrimenti
+# ogni worker ripete le chiamate e riscopre da solo un disservizio
+VIES_CACHE_ALIAS = config('VIES_CACHE_ALIAS', default='vies')
+# TTL (secondi) per Partite IVA valide e non valide
+VIES_CACHE_POSITIVE_TTL = config(
+    'VIES_CACHE_POSITIVE_TTL', cast=int, default=60 * 60 * 24 * 30
+)
+VIES_CACHE_NEGATIVE_TTL = config(
+    'VIES_CACHE_NEGATIVE_TTL', cast=int, default=60 * 60 * 24
+)
+# Finestra (secondi) in cui una voce scaduta viene ancora servita
+# mentre la verifica viene ripetuta in background
+VIES_CACHE_STALE_TTL = config(
+    'VIES_CACHE_STALE_TTL', cast=int, default=60 * 60 * 24 * 7
+)
+# Budget di latenza (secondi) per una singola chiamata VIES
+VIES_TIMEOUT = config('VIES_TIMEOUT', cast=float, default=5.0)
+# Circuit breaker: fallimenti consecutivi prima dell'apertura e secondi
+# di apertura prima della chiamata di prova (semi-apertura)
+VIES_CIRCUIT_FAILURE_THRESHOLD = config(
+    'VIES_CIRCUIT_FAILURE_THRESHOLD', cast=int, default=5
+)
+VIES_CIRCUIT_RESET_TIMEOUT = config(
+    'VIES_CIRCUIT_RESET_TIMEOUT', cast=int, default=60
+)
+# Worker di verifica in background (comando `verifica_partite_iva`)
+VIES_WORKER_CONCURRENCY = config('VIES_WORKER_CONCURRENCY', cast=int, default=4)
+VIES_WORKER_MAX_ATTEMPTS = config(
+    'VIES_WORKER_MAX_ATTEMPTS', cast=int, default=5
+)
+# Ritardo base (secondi) tra i tentativi, raddoppiato a ogni errore
+VIES_WORKER_BACKOFF = config('VIES_WORKER_BACKOFF', cast=int, default=60)
+
 
 # Django-cities-light configuration
 # https://django-cities-light.readthedocs.io/
@@ -365,6 +427,15 @@ CITIES_LIGHT_CITY_SOURCES = [
 # Enable geocoding features
 CITIES_LIGHT_ENABLE_GEOCODING = True
 
+# Tabella geografica in memoria (server.apps.main.logic.geo): la versione
+# sta in questa cache se è condivisa tra i worker (altrimenti nel
+# database) e ogni worker la controlla al massimo una volta ogni
+# GEO_CONTROLLO_VERSIONE secondi
+GEO_CACHE_ALIAS = config('GEO_CACHE_ALIAS', default='default')
+GEO_CONTROLLO_VERSIONE = config(
+    'GEO_CONTROLLO_VERSIONE', cast=float, default=5.0
+)
+
 # Ignore auto-named migrations from third party apps
 # (for django-test-migrations)
 DTM_IGNORED_MIGRATIONS = [
@@ -25,3 +25,15 @@ def admin_user(django_user_model):
     username_field = django_user_model.USERNAME_FIELD
     kwargs = {username_field: 'admin@aslcn1.it', 'password': 'pw'}
     return django_user_model.objects.create_superuser(**kwargs)
+
+
+@pytest.fixture(autouse=True)
+def _tabella_geo():
+    """Each test starts without the in-memory geo table of the previous.
+
+    The rows of a test are rolled back without signals, so a table
+    loaded during a test would survive it.
+    """
+    from server.apps.main.logic.geo import scarta_tabella_geo  # noqa: PLC0415
+
+    scarta_tabella_geo()
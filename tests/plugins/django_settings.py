@@ -25,7 +25,7 @@ def _password_hashers(settings: LazySettings) -> None:
 def _auth_backends(settings: LazySettings) -> None:
     """Deactivates security backend from Axes app."""
     settings.AUTHENTICATION_BACKENDS = (
-        'django.contrib.auth.backends.ModelBackend',
+        'server.apps.accounts.backends.CachedModelBackend',
     )
 
 
@@ -35,3 +35,13 @@ def _debug(settings: LazySettings) -> None:
     settings.DEBUG = False
     for template in settings.TEMPLATES:
         template['OPTIONS']['debug'] = True
+
+
+@pytest.fixture(autouse=True)
+def _vies_cache(settings: LazySettings) -> None:
+    """Keeps VIES results and breaker in the in-memory default cache.
+
+    The tests clear it between runs; the ones for the shared database
+    cache select the ``vies`` alias themselves.
+    """
+    settings.VIES_CACHE_ALIAS = 'default'
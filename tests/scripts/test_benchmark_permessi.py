@@ -0,0 +1,21 @@
+import pytest
+from django.core.management import CommandError, call_command
+
+from server.apps.accounts.models import CustomUser
+
+pytestmark = pytest.mark.django_db
+
+
+def test_benchmark_permessi_reports_both_backends(capfd):
+    """Test: riporta le query dell'indice admin per entrambi i backend."""
+    CustomUser.objects.create_user('bench@aslcn1.it')
+    call_command('benchmark_permessi', 'bench@aslcn1.it', '--repeat', '2')
+    out, _ = capfd.readouterr()
+    assert 'ModelBackend: first request' in out
+    assert 'CachedModelBackend: first request' in out
+
+
+def test_benchmark_permessi_user_not_found():
+    """Test: un utente inesistente è un errore del comando."""
+    with pytest.raises(CommandError, match='User not found'):
+        call_command('benchmark_permessi', 'nessuno@aslcn1.it')
@@ -39,9 +39,9 @@ def test_save_populates_username_and_audit(monkeypatch):
     admin_user.last_name = 'User'
     admin_user.set_password('pw')
     admin_user.save()
-    # monkeypatch the get_current_user used inside models module
+    # monkeypatch the get_current_user used by the audit context
     monkeypatch.setattr(
-        'server.apps.accounts.models.get_current_user',
+        'server.common.audit.get_current_user',
         lambda: admin_user,
     )
 
@@ -195,7 +195,7 @@ def test_model_clean_rejects_wrong_domain():
 def test_save_without_current_user(monkeypatch):
     """If there's no current user, created_by stays None but username is set."""
     monkeypatch.setattr(
-        'server.apps.accounts.models.get_current_user',
+        'server.common.audit.get_current_user',
         lambda: None,
     )
     u = CustomUser.objects.create_user('nocurrent@aslcn1.it')
@@ -267,7 +267,7 @@ def test_save_updates_updated_by(monkeypatch):
     assert u.pk is not None
 
     monkeypatch.setattr(
-        'server.apps.accounts.models.get_current_user',
+        'server.common.audit.get_current_user',
         lambda: admin,
     )
     u.first_name = 'Z'
@@ -280,7 +280,7 @@ def test_save_with_anonymous_current_user(monkeypatch):
     """If current user is anonymous, no audit fields are set."""
     anon = type('Anon', (), {'is_anonymous': True})()
     monkeypatch.setattr(
-        'server.apps.accounts.models.get_current_user',
+        'server.common.audit.get_current_user',
         lambda: anon,
     )
     u = CustomUser.objects.create_user('anon@aslcn1.it')
@@ -328,7 +328,7 @@ def test_created_by_fullname_uses_str_when_no_nome_utente(monkeypatch):
     # Make hasattr always return False during this save so the code
     # uses str(user)
     monkeypatch.setattr(
-        'server.apps.accounts.models.get_current_user',
+        'server.common.audit.get_current_user',
         lambda: admin,
     )
     monkeypatch.setattr(builtins, 'hasattr', lambda obj, name: False)
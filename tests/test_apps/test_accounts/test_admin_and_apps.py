@@ -3,7 +3,11 @@
 
 import pytest
 from django.contrib import admin
+from django.contrib.auth.models import Group, Permission
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
+from server.apps.accounts.admin import CustomUserAdmin
 from server.apps.accounts.apps import AccountsConfig
 from server.apps.accounts.models import CustomUser
 
@@ -28,3 +32,69 @@ def test_customuser_registered_in_admin():
     # registration code and ensure no exception is raised. The public
     # API doesn't expose list_display lookups, so we avoid inspecting it
     # to keep the test lint-clean and future-proof.
+
+
+def _users_with_groups(count):
+    """Create users with one group and one direct permission each."""
+    permission = Permission.objects.get(codename='view_datorelavoro')
+    group = Group.objects.create(name=f'Gruppo {count}')
+    group.permissions.add(permission)
+    for index in range(count):
+        user = CustomUser.objects.create_user(
+            f'utente{count}.{index}@aslcn1.it'
+        )
+        user.groups.add(group)
+        user.user_permissions.add(permission)
+
+
+def _changelist(rf, admin_user):
+    request = rf.get('/admin/accounts/customuser/')
+    request.user = admin_user
+    model_admin = CustomUserAdmin(CustomUser, admin.site)
+    with CaptureQueriesContext(connection) as queries:
+        response = model_admin.changelist_view(request)
+        response.render()
+    return response, queries.captured_queries
+
+
+def test_changelist_loads_only_displayed_fields(rf, admin_user):
+    """The changelist loads neither relations nor hidden columns."""
+    _users_with_groups(2)
+    # The first render caches the admin's own permissions
+    _changelist(rf, admin_user)
+    response, few = _changelist(rf, admin_user)
+    _users_with_groups(6)
+    response, many = _changelist(rf, admin_user)
+
+    assert len(many) == len(few)
+    assert not [
+        query
+        for query in many
+        if 'permission' in query['sql'] or 'customuser_groups' in query['sql']
+    ]
+    rows = list(response.context_data['cl'].result_list)
+    assert len(rows) == 9
+    for row in rows:
+        assert {'password', 'created_by_fullname', 'last_login'} <= (
+            row.get_deferred_fields()
+        )
+        assert not hasattr(row, '_prefetched_objects_cache')
+
+
+def test_change_view_prefetches_permissions(rf, admin_user):
+    """The change view object comes with groups and permissions loaded."""
+    _users_with_groups(1)
+    user = CustomUser.objects.get(email='utente1.0@aslcn1.it')
+    model_admin = CustomUserAdmin(CustomUser, admin.site)
+    request = rf.get('/')
+    request.user = admin_user
+
+    obj = model_admin.get_object(request, str(user.pk))
+    with CaptureQueriesContext(connection) as queries:
+        groups = [group.permissions.all()[0] for group in obj.groups.all()]
+        [permission.content_type for permission in obj.user_permissions.all()]
+
+    assert not obj.get_deferred_fields()
+    assert groups[0].content_type.app_label == 'datoriLavoro'
+    assert not queries.captured_queries
+    assert model_admin.get_object(request, '0') is None
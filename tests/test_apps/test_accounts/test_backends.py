@@ -0,0 +1,166 @@
+"""Test per la cache dei permessi (``CachedModelBackend``)."""
+
+import pytest
+from django.contrib.auth.models import AnonymousUser, Group, Permission
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from server.admin import custom_admin_site
+from server.apps.accounts.backends import (
+    CachedModelBackend,
+    invalida_permessi,
+    versione_permessi,
+)
+from server.apps.accounts.models import CustomUser
+
+pytestmark = pytest.mark.django_db
+
+_VIEW_DATORE = 'datoriLavoro.view_datorelavoro'
+
+
+@pytest.fixture(autouse=True)
+def _cache_condivisa(settings, tmp_path):
+    """I permessi in una cache vista da tutti i processi (su file)."""
+    settings.CACHES = {
+        **settings.CACHES,
+        'permessi': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(tmp_path / 'permessi'),
+        },
+    }
+    settings.PERMISSIONS_CACHE_ALIAS = 'permessi'
+
+
+@pytest.fixture
+def gruppo():
+    """Gruppo che può vedere i datori di lavoro."""
+    group = Group.objects.create(name='Lettori')
+    group.permissions.add(
+        Permission.objects.get(
+            content_type__app_label='datoriLavoro',
+            codename='view_datorelavoro',
+        )
+    )
+    return group
+
+
+@pytest.fixture
+def operatore(gruppo):
+    """Utente staff con i permessi del gruppo."""
+    user = CustomUser.objects.create_user('lettore@aslcn1.it')
+    user.groups.add(gruppo)
+    return user
+
+
+def _ricarica(user):
+    """L'utente come lo carica una nuova richiesta."""
+    return CustomUser.objects.get(pk=user.pk)
+
+
+def _permessi(user):
+    return _ricarica(user).get_all_permissions()
+
+
+def test_admin_index_reuses_cached_permissions(operatore):
+    """Dalla seconda richiesta l'indice admin non rilegge i permessi."""
+    conteggi = []
+    for _ in range(2):
+        request = RequestFactory().get('/admin/')
+        request.user = _ricarica(operatore)
+        with CaptureQueriesContext(connection) as queries:
+            custom_admin_site.index(request).render()
+        conteggi.append([
+            query['sql']
+            for query in queries.captured_queries
+            if 'auth_permission' in query['sql']
+        ])
+
+    assert conteggi[0]
+    assert not conteggi[1]
+
+
+def test_group_permission_changes_invalidate(operatore, gruppo):
+    """Permessi del gruppo, gruppi e permessi diretti aggiornano la cache."""
+    assert _VIEW_DATORE in _permessi(operatore)
+
+    gruppo.permissions.clear()
+    assert _VIEW_DATORE not in _permessi(operatore)
+
+    operatore.user_permissions.add(
+        Permission.objects.get(codename='view_datorelavoro')
+    )
+    assert _VIEW_DATORE in _permessi(operatore)
+
+    operatore.user_permissions.clear()
+    gruppo.permissions.add(Permission.objects.get(codename='view_sede'))
+    operatore.groups.remove(gruppo)
+    assert not _permessi(operatore)
+
+
+def test_group_and_superuser_changes_invalidate(operatore, gruppo):
+    """Eliminare il gruppo o promuovere l'utente cambia i permessi."""
+    assert _permessi(operatore) == {_VIEW_DATORE}
+
+    gruppo.delete()
+    assert not _permessi(operatore)
+
+    CustomUser.objects.filter(pk=operatore.pk).update(is_superuser=True)
+    assert _VIEW_DATORE in _permessi(operatore)
+
+
+def test_uncached_cases():
+    """Anonimi, inattivi e permessi per oggetto non passano dalla cache."""
+    backend = CachedModelBackend()
+    inattivo = CustomUser.objects.create_user(
+        'inattivo@aslcn1.it', is_active=False
+    )
+
+    assert backend.get_all_permissions(AnonymousUser()) == set()
+    assert backend.get_all_permissions(inattivo) == set()
+    assert backend.get_all_permissions(inattivo, obj=inattivo) == set()
+
+
+def test_version_changes_again_at_commit(
+    operatore, gruppo, django_capture_on_commit_callbacks
+):
+    """Al commit la versione cambia di nuovo.
+
+    Così i permessi ricalcolati da un'altra richiesta prima del commit,
+    con le righe vecchie, non valgono per la nuova versione.
+    """
+    with (
+        django_capture_on_commit_callbacks(execute=True),
+        transaction.atomic(),
+    ):
+        gruppo.permissions.clear()
+        # Un'altra richiesta legge ancora il gruppo con il permesso
+        caches['permessi'].set(
+            f'permessi:{operatore.pk}:0',
+            (versione_permessi(), {_VIEW_DATORE}),
+        )
+
+    assert not _permessi(operatore)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_invalidate_in_autocommit():
+    """Fuori da una transazione la versione cambia subito."""
+    versione = versione_permessi()
+
+    invalida_permessi()
+
+    assert versione_permessi() != versione
+
+
+def test_local_cache_reads_the_database(operatore, settings):
+    """Con una cache del processo i permessi non vengono memorizzati."""
+    settings.PERMISSIONS_CACHE_ALIAS = 'default'
+    assert _permessi(operatore) == {_VIEW_DATORE}
+
+    with CaptureQueriesContext(connection) as queries:
+        assert _permessi(operatore) == {_VIEW_DATORE}
+
+    assert any('auth_permission' in q['sql'] for q in queries.captured_queries)
+    assert not caches['default'].get(f'permessi:{operatore.pk}:0')
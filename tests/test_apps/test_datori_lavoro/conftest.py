@@ -0,0 +1,45 @@
+"""Fixture condivise dai test dell'app datoriLavoro."""
+
+import time
+
+import pytest
+from django.core.cache import cache
+from verify_vat_number.exceptions import (
+    ServiceTemporarilyUnavailable,
+    VatNotFound,
+)
+
+
+class FakeVies:
+    """Sostituto locale di ``interroga_vies`` con latenza simulata."""
+
+    def __init__(self, valid=(), latency=0.0):
+        """Imposta le Partite IVA considerate valide e la latenza."""
+        self.valid = set(valid)
+        self.latency = latency
+        self.calls = 0
+        self.unavailable = False
+
+    def __call__(self, vat_number):
+        """Simula una chiamata VIES."""
+        self.calls += 1
+        time.sleep(self.latency)
+        if self.unavailable:
+            raise ServiceTemporarilyUnavailable('VIES down')
+        if vat_number[2:] not in self.valid:
+            raise VatNotFound
+        return {'company_name': 'ACME'}
+
+
+@pytest.fixture
+def clear_cache():
+    """Svuota la cache prima e dopo il test."""
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def fake_vies():
+    """VIES finto con una sola Partita IVA valida (``00743110157``)."""
+    return FakeVies(valid={'00743110157'})
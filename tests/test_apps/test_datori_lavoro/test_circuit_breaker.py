@@ -0,0 +1,162 @@
+"""Test per il circuit breaker e il budget di latenza delle chiamate VIES."""
+
+import time
+
+import pytest
+from verify_vat_number.exceptions import (
+    ServiceTemporarilyUnavailable,
+    VatNotFound,
+)
+
+from server.apps.datoriLavoro import models as datori_models
+from server.apps.datoriLavoro.vies import (
+    ViesCircuitBreaker,
+    ViesLookupCache,
+    ViesNonDisponibile,
+)
+
+_VALID = '00743110157'
+_INVALID = '12345670017'
+
+pytestmark = pytest.mark.usefixtures('clear_cache')
+
+
+@pytest.fixture(autouse=True)
+def _circuit_settings(settings):
+    """Soglie basse per test rapidi."""
+    settings.VIES_CIRCUIT_FAILURE_THRESHOLD = 2
+    settings.VIES_CIRCUIT_RESET_TIMEOUT = 60
+    settings.VIES_TIMEOUT = 1.0
+
+
+@pytest.fixture
+def breaker():
+    """Circuit breaker con stato nella cache di default."""
+    return ViesCircuitBreaker()
+
+
+def _fail(breaker, fake_vies, times):
+    fake_vies.unavailable = True
+    for _ in range(times):
+        with pytest.raises(ServiceTemporarilyUnavailable):
+            breaker.call(fake_vies, 'IT' + _VALID)
+    fake_vies.unavailable = False
+
+
+def test_circuit_opens_after_threshold(breaker, fake_vies):
+    """Superata la soglia il circuito rifiuta senza chiamare VIES."""
+    _fail(breaker, fake_vies, 1)
+    assert breaker.state == ViesCircuitBreaker.CLOSED
+    _fail(breaker, fake_vies, 1)
+    assert breaker.state == ViesCircuitBreaker.OPEN
+
+    with pytest.raises(ViesNonDisponibile):
+        breaker.call(fake_vies, 'IT' + _VALID)
+    assert fake_vies.calls == 2
+    assert breaker.metrics() == {
+        'state': ViesCircuitBreaker.OPEN,
+        'failures': 0,
+        'opened': 1,
+        'closed': 0,
+    }
+
+
+def test_success_resets_failure_count(breaker, fake_vies):
+    """I fallimenti contano solo se consecutivi."""
+    _fail(breaker, fake_vies, 1)
+    breaker.call(fake_vies, 'IT' + _VALID)
+    _fail(breaker, fake_vies, 1)
+
+    assert breaker.state == ViesCircuitBreaker.CLOSED
+
+
+def test_vat_not_found_is_not_a_failure(breaker, fake_vies):
+    """Una P.IVA inesistente è una risposta valida di VIES."""
+    for _ in range(3):
+        with pytest.raises(VatNotFound):
+            breaker.call(fake_vies, 'IT' + _INVALID)
+
+    assert breaker.state == ViesCircuitBreaker.CLOSED
+
+
+def test_half_open_probe_closes_circuit(breaker, fake_vies, settings):
+    """Una sola chiamata di prova; se riesce il circuito si chiude."""
+    _fail(breaker, fake_vies, 2)
+    settings.VIES_CIRCUIT_RESET_TIMEOUT = 0
+    assert breaker.state == ViesCircuitBreaker.HALF_OPEN
+
+    assert breaker.allow_request() is True
+    # Un altro worker non può fare una seconda prova contemporanea
+    assert breaker.allow_request() is False
+
+    breaker.record_success()
+    assert breaker.state == ViesCircuitBreaker.CLOSED
+    assert breaker.metrics()['closed'] == 1
+
+
+def test_half_open_probe_failure_reopens(breaker, fake_vies, settings):
+    """Se la chiamata di prova fallisce il circuito si riapre."""
+    _fail(breaker, fake_vies, 2)
+    settings.VIES_CIRCUIT_RESET_TIMEOUT = 0
+    _fail(breaker, fake_vies, 1)
+    settings.VIES_CIRCUIT_RESET_TIMEOUT = 60
+
+    assert breaker.state == ViesCircuitBreaker.OPEN
+    assert breaker.metrics()['opened'] == 2
+
+
+def test_latency_budget(breaker, fake_vies, settings):
+    """Oltre ``VIES_TIMEOUT`` il chiamante non resta bloccato."""
+    settings.VIES_TIMEOUT = 0.05
+    fake_vies.latency = 0.5
+
+    start = time.perf_counter()
+    with pytest.raises(ViesNonDisponibile):
+        breaker.call(fake_vies, 'IT' + _VALID)
+
+    assert time.perf_counter() - start < 0.4
+    assert breaker.metrics()['failures'] == 1
+
+
+def test_reset(breaker, fake_vies):
+    """``reset`` chiude il circuito e azzera le metriche."""
+    _fail(breaker, fake_vies, 2)
+    breaker.reset()
+
+    assert breaker.metrics() == {
+        'state': ViesCircuitBreaker.CLOSED,
+        'failures': 0,
+        'opened': 0,
+        'closed': 0,
+    }
+
+
+def test_validator_falls_back_to_offline_check(monkeypatch, breaker, fake_vies):
+    """A circuito aperto basta la verifica formale, senza attese."""
+    monkeypatch.setattr(
+        datori_models,
+        'vies_cache',
+        ViesLookupCache(fetch=fake_vies, breaker=breaker),
+    )
+    _fail(breaker, fake_vies, 2)
+
+    # P.IVA formalmente corretta, sconosciuta a VIES: accettata
+    datori_models.validate_p_iva_italiana(_INVALID)
+    assert fake_vies.calls == 2
+
+
+@pytest.mark.django_db
+def test_state_is_shared_through_the_database_cache(fake_vies, settings):
+    """Nella cache su database il circuito è lo stesso per ogni worker."""
+    settings.VIES_CACHE_ALIAS = 'vies'
+    worker, altro_worker = ViesCircuitBreaker(), ViesCircuitBreaker()
+    _fail(worker, fake_vies, 2)
+
+    assert altro_worker.state == ViesCircuitBreaker.OPEN
+    with pytest.raises(ViesNonDisponibile):
+        altro_worker.call(fake_vies, 'IT' + _VALID)
+
+    # Una sola chiamata di prova in tutto il deployment
+    settings.VIES_CIRCUIT_RESET_TIMEOUT = 0
+    assert worker.allow_request() is True
+    assert altro_worker.allow_request() is False
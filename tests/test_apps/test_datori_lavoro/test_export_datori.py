@@ -0,0 +1,140 @@
+"""Test per l'export in streaming dei datori di lavoro."""
+
+import csv
+import io
+import json
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from server.admin import custom_admin_site
+from server.apps.datoriLavoro.admin import DatoreLavoroAdmin
+from server.apps.datoriLavoro.models import (
+    DatoreLavoro,
+    DatoreLavoroSede,
+    Sede,
+)
+from server.apps.main.models import CityProxy, CountryProxy, RegionProxy
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def datori():
+    """Tre datori: due con sedi (una legale), uno senza sedi."""
+    country = CountryProxy.objects.create(
+        name='Italia', code2='IT', code3='ITA', slug='italia'
+    )
+    region = RegionProxy.objects.create(
+        name='Lazio', country=country, slug='lazio'
+    )
+    roma = CityProxy.objects.create(
+        name='Roma', region=region, country=country, slug='roma'
+    )
+    result = []
+    for index in range(2):
+        datore = DatoreLavoro.objects.create(ragione_sociale=f'Datore {index}')
+        for nome, legale in (('Legale', True), ('Filiale', False)):
+            sede = Sede.objects.create(nome=f'{nome} {index}', citta=roma)
+            DatoreLavoroSede.objects.create(
+                datore_lavoro=datore, sede=sede, is_sede_legale=legale
+            )
+        result.append(datore)
+    result.append(DatoreLavoro.objects.create(ragione_sociale='Senza sedi'))
+    return sorted(result, key=lambda datore: datore.pk)
+
+
+def _read_jsonl(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_export_jsonl(tmp_path, datori, django_assert_max_num_queries):
+    """Un oggetto per datore, ordinati per chiave primaria."""
+    output = tmp_path / 'datori.jsonl'
+
+    # Cursore + prefetch delle sedi: il numero di query non cresce
+    with django_assert_max_num_queries(4):
+        call_command('export_datori', str(output), stdout=io.StringIO())
+
+    records = _read_jsonl(output)
+    assert [r['id'] for r in records] == [str(d.pk) for d in datori]
+    with_sedi = [r for r in records if r['sedi']]
+    assert len(with_sedi) == 2
+    for record in with_sedi:
+        assert record['sede_legale']['nome'].startswith('Legale')
+        assert record['sede_legale']['regione'] == 'Lazio'
+        assert len(record['sedi']) == 2
+
+
+def test_export_csv_one_row_per_sede(tmp_path, datori):
+    """Nel CSV una riga per sede, una sola riga per i datori senza sedi."""
+    output = tmp_path / 'datori.csv'
+
+    call_command('export_datori', str(output), stdout=io.StringIO())
+
+    with output.open() as handle:
+        rows = list(csv.DictReader(handle))
+    assert len(rows) == 5
+    assert sum(row['is_sede_legale'] == 'True' for row in rows) == 2
+    assert [row['sede_id'] for row in rows].count('') == 1
+
+
+def test_export_resume_and_range(tmp_path, datori):
+    """L'export riprende dall'ultima chiave salvata nel checkpoint."""
+    output = tmp_path / 'datori.jsonl'
+    call_command(
+        'export_datori',
+        str(output),
+        '--until',
+        str(datori[0].pk),
+        stdout=io.StringIO(),
+    )
+    checkpoint = tmp_path / 'datori.jsonl.checkpoint'
+    state = json.loads(checkpoint.read_text())
+    assert state == {
+        'last_pk': str(datori[0].pk),
+        'offset': output.stat().st_size,
+    }
+    # Righe scritte dopo il checkpoint da un export interrotto
+    with output.open('a') as handle:
+        handle.write('{"id": "interrotto"}\n{"id"')
+
+    call_command(
+        'export_datori',
+        str(output),
+        '--resume',
+        '--chunk-size',
+        '1',
+        stdout=io.StringIO(),
+    )
+
+    assert [r['id'] for r in _read_jsonl(output)] == [str(d.pk) for d in datori]
+    assert json.loads(checkpoint.read_text()) == {
+        'last_pk': str(datori[-1].pk),
+        'offset': output.stat().st_size,
+    }
+
+
+def test_export_unknown_format(tmp_path):
+    """Serve un formato riconoscibile."""
+    with pytest.raises(CommandError):
+        call_command('export_datori', str(tmp_path / 'datori.xml'))
+
+
+@pytest.mark.parametrize(
+    ('action', 'content_type'),
+    [('esporta_csv', 'text/csv'), ('esporta_jsonl', 'application/x-ndjson')],
+)
+def test_admin_export_action_streams(rf, datori, action, content_type):
+    """L'azione admin restituisce una risposta in streaming."""
+    model_admin = DatoreLavoroAdmin(DatoreLavoro, custom_admin_site)
+    queryset = DatoreLavoro.objects.filter(ragione_sociale='Datore 0')
+
+    response = getattr(model_admin, action)(rf.post('/'), queryset)
+
+    assert response.streaming
+    assert response['Content-Type'].startswith(content_type)
+    assert 'attachment' in response['Content-Disposition']
+    content = b''.join(response.streaming_content).decode()
+    assert 'Legale 0' in content
+    assert 'Datore 1' not in content
@@ -27,13 +27,13 @@ class TestDatoreLavoroForm:
         )
         assert form.is_valid(), form.errors
 
-    @patch('server.apps.datoriLavoro.models.get_from_eu_vies', autospec=True)
+    @patch('server.apps.datoriLavoro.vies.interroga_vies', autospec=True)
     def test_form_valid_with_p_iva(self, mock_vies):
         """Test che il form sia valido con P.IVA."""
         mock_vies.return_value = {'valid': True}
         form = DatoreLavoroForm(
             data={
-                'p_iva': '12345678901',
+                'p_iva': '00743110157',
             }
         )
         assert form.is_valid(), form.errors
@@ -0,0 +1,206 @@
+"""Test per l'import massivo ``import_datori``."""
+
+import io
+import json
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from server.apps.datoriLavoro.importazione import IndiceCitta, valida_riga
+from server.apps.datoriLavoro.models import (
+    DatoreLavoro,
+    DatoreLavoroSede,
+    Sede,
+    StatoVerificaPartitaIva,
+    VerificaPartitaIva,
+)
+from server.apps.main.models import CityProxy, CountryProxy, RegionProxy
+
+_HEADER = 'Ragione Sociale;P IVA;Codice Fiscale;Sede Nome;Indirizzo;Città\n'
+_ROWS = (
+    'Acme;00743110157;;Sede;Via Roma 1;Roma\n'
+    'Beta;12345670017;;;Via Po 2;san dona di piave\n'
+    'Gamma;;RSSMRA85T10A562S;;;ROMA\n'
+)
+
+
+@pytest.fixture
+def cities(db):
+    """Crea alcune città, tra cui due omonime in regioni diverse."""
+    country = CountryProxy.objects.create(
+        name='Italia', code2='IT', code3='ITA', slug='italia'
+    )
+    lazio, veneto = (
+        RegionProxy.objects.create(name=name, country=country, slug=name)
+        for name in ('Lazio', 'Veneto')
+    )
+    for name, region in (
+        ('Roma', lazio),
+        ('San Donà di Piave', veneto),
+        ('Castello', lazio),
+        ('Castello', veneto),
+    ):
+        CityProxy.objects.create(
+            name=name, region=region, country=country, slug=name
+        )
+
+
+def _write(tmp_path, content, name='datori.csv'):
+    path = tmp_path / name
+    path.write_text(content, encoding='utf-8')
+    return path
+
+
+def test_import_creates_employers_and_legal_offices(tmp_path, cities):
+    """Ogni riga crea datore, sede legale e verifica VIES in coda."""
+    path = _write(tmp_path, _HEADER + _ROWS)
+
+    call_command('import_datori', str(path), '--chunk-size', '2')
+
+    assert DatoreLavoro.objects.count() == 3
+    assert DatoreLavoroSede.objects.filter(is_sede_legale=True).count() == 3
+    beta = DatoreLavoro.objects.get(ragione_sociale='Beta')
+    assert beta.stato_verifica_p_iva == StatoVerificaPartitaIva.PENDING
+    assert beta.sedi.get().citta.name == 'San Donà di Piave'
+    assert VerificaPartitaIva.objects.count() == 2
+    assert json.loads((tmp_path / 'datori.csv.checkpoint').read_text()) == {
+        'rows': 3
+    }
+
+
+def test_import_reports_errors_and_skips_duplicates(tmp_path, cities):
+    """Righe non valide segnalate, righe già presenti saltate."""
+    DatoreLavoro.objects.create(p_iva='00743110157')
+    path = _write(
+        tmp_path,
+        _HEADER
+        + _ROWS
+        + 'Delta;12345678903;;;;Roma\n'
+        + 'Epsilon;;XYZ;;;Roma\n'
+        + 'Zeta;;;;;\n'
+        + 'Eta;76543210157;;;;Atlantide\n'
+        + 'Theta;11111111206;;;;Castello\n'
+        + ';;;;;\n'
+        + 'Beta bis;12345670017;;;;Roma\n',
+    )
+
+    call_command(
+        'import_datori',
+        str(path),
+        stdout=(out := io.StringIO()),
+        stderr=(err := io.StringIO()),
+    )
+
+    assert DatoreLavoro.objects.count() == 3
+    assert 'Row 5: Partita IVA non valida' in err.getvalue()
+    assert 'Row 9: città non trovata o ambigua: Castello' in err.getvalue()
+    assert '2 created, 2 already present, 6 errors' in out.getvalue()
+
+
+def test_dry_run_does_not_write(tmp_path, cities):
+    """In dry-run nulla viene scritto, nemmeno il checkpoint."""
+    path = _write(tmp_path, _HEADER + _ROWS)
+
+    call_command('import_datori', str(path), '--dry-run', stdout=io.StringIO())
+
+    assert not DatoreLavoro.objects.exists()
+    assert not (tmp_path / 'datori.csv.checkpoint').exists()
+
+
+def test_resume_skips_committed_rows(tmp_path, cities):
+    """Con ``--resume`` si riparte dall'ultimo blocco confermato."""
+    path = _write(tmp_path, _HEADER + _ROWS)
+    checkpoint = tmp_path / 'state.json'
+    checkpoint.write_text(json.dumps({'rows': 2}))
+
+    call_command(
+        'import_datori',
+        str(path),
+        '--resume',
+        '--checkpoint',
+        str(checkpoint),
+        stdout=io.StringIO(),
+    )
+
+    assert list(
+        DatoreLavoro.objects.values_list('ragione_sociale', flat=True)
+    ) == ['Gamma']
+    assert json.loads(checkpoint.read_text()) == {'rows': 3}
+
+
+def test_process_pool_validation(tmp_path, cities):
+    """La validazione può girare in un pool di processi."""
+    path = _write(tmp_path, _HEADER.replace(';', ',') + _ROWS.replace(';', ','))
+
+    call_command(
+        'import_datori', str(path), '--workers', '2', stdout=io.StringIO()
+    )
+
+    assert DatoreLavoro.objects.count() == 3
+
+
+def test_xlsx_import(tmp_path, cities):
+    """I file XLSX sono letti in streaming con openpyxl."""
+    openpyxl = pytest.importorskip('openpyxl')
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    for line in (_HEADER + _ROWS).splitlines():
+        sheet.append([value or None for value in line.split(';')])
+    path = tmp_path / 'datori.xlsx'
+    workbook.save(path)
+
+    call_command('import_datori', str(path), stdout=io.StringIO())
+
+    assert DatoreLavoro.objects.count() == 3
+
+
+@pytest.mark.parametrize('name', ['missing.csv', 'datori.json'])
+def test_invalid_input(tmp_path, name):
+    """File mancanti o in formati non supportati."""
+    _write(tmp_path, '{}', name='datori.json')
+
+    with pytest.raises(CommandError):
+        call_command('import_datori', str(tmp_path / name))
+
+
+def test_city_index_disambiguates_by_region():
+    """Gli omonimi si risolvono con la regione."""
+    indice = IndiceCitta([(1, 'Castello', 'Lazio'), (2, 'Castello', None)])
+
+    assert indice.risolvi('castello') is None
+    assert indice.risolvi('CASTELLO', 'lazio') == 1
+    assert indice.risolvi('Nessuna') is None
+
+
+def test_valida_riga_is_offline():
+    """La validazione non richiede database né rete."""
+    row = dict.fromkeys(
+        ('ragione_sociale', 'p_iva', 'codice_fiscale', 'citta'), ''
+    )
+    assert valida_riga(row) is not None
+    assert (
+        valida_riga({**row, 'ragione_sociale': 'Acme', 'citta': 'Roma'}) is None
+    )
+
+
+def test_import_records_acting_user(tmp_path, cities, admin_user):
+    """Con ``--user`` le righe importate sono firmate da quell'utente."""
+    path = _write(tmp_path, _HEADER + _ROWS)
+
+    call_command(
+        'import_datori',
+        str(path),
+        '--user',
+        admin_user.get_username(),
+        stdout=io.StringIO(),
+    )
+
+    assert set(DatoreLavoro.objects.values_list('created_by', flat=True)) == {
+        admin_user.pk
+    }
+    assert set(Sede.objects.values_list('created_by', flat=True)) == {
+        admin_user.pk
+    }
+
+    with pytest.raises(CommandError, match='User not found'):
+        call_command('import_datori', str(path), '--user', 'nessuno')
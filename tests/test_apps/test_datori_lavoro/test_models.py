@@ -95,10 +95,8 @@ class TestDatoreLavoro:
 class TestDatoreLavoroSede:
     """Test per il modello DatoreLavoroSede."""
 
-    def test_datore_lavoro_sede_clean_prevents_duplicate_legal_office(
-        self, city
-    ):
-        """Test che clean() impedisca duplicati di sede legale."""
+    def test_datore_lavoro_sede_prevents_duplicate_legal_office(self, city):
+        """Test che la validazione impedisca duplicati di sede legale."""
         sede = Sede.objects.create(nome='Sede 1', citta=city)
         datore1 = DatoreLavoro.objects.create(ragione_sociale='Datore 1')
         datore2 = DatoreLavoro.objects.create(ragione_sociale='Datore 2')
@@ -118,16 +116,21 @@ class TestDatoreLavoroSede:
         )
 
         with pytest.raises(ValidationError) as exc_info:
-            assoc2.clean()
+            assoc2.validate_constraints()
         assert 'sede legale' in str(exc_info.value).lower()
 
-    def test_datore_lavoro_sede_clean_allows_non_legal_duplicate(self, city):
-        """Test che clean() permetta sedi non legali duplicate."""
+    def test_datore_lavoro_sede_allows_non_legal_duplicate(self, city):
+        """Test che la validazione permetta sedi non legali duplicate."""
         sede = Sede.objects.create(nome='Sede 1', citta=city)
         datore1 = DatoreLavoro.objects.create(ragione_sociale='Datore 1')
         datore2 = DatoreLavoro.objects.create(ragione_sociale='Datore 2')
 
         # Due associazioni NON legali alla stessa sede
+        DatoreLavoroSede.objects.create(
+            datore_lavoro=datore1,
+            sede=Sede.objects.create(nome='Sede legale', citta=city),
+            is_sede_legale=True,
+        )
         DatoreLavoroSede.objects.create(
             datore_lavoro=datore1,
             sede=sede,
@@ -139,7 +142,7 @@ class TestDatoreLavoroSede:
             sede=sede,
             is_sede_legale=False,
         )
-        assoc2.clean()  # Non deve sollevare eccezioni
+        assoc2.validate_constraints()  # Non deve sollevare eccezioni
 
 
 def test_validate_codice_fiscale_valid():
@@ -0,0 +1,105 @@
+"""Test per la verifica formale (offline) della Partita IVA."""
+
+import random
+
+import pytest
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+
+from server.apps.datoriLavoro import models as datori_models
+from server.apps.datoriLavoro.partita_iva import (
+    carattere_controllo,
+    is_p_iva_formalmente_valida,
+)
+from server.apps.datoriLavoro.vies import ViesLookupCache
+
+
+@pytest.mark.parametrize(
+    'value',
+    [
+        '00743110157',  # ufficio 015 (Milano)
+        '12345670017',  # ufficio 001
+        '11111111206',  # ufficio 120
+        '01234568887',  # ufficio 888
+    ],
+)
+def test_valid_p_iva(value):
+    """Partite IVA formalmente corrette."""
+    assert is_p_iva_formalmente_valida(value)
+
+
+@pytest.mark.parametrize(
+    'value',
+    [
+        '',
+        '0074311015',  # troppo corta
+        '007431101570',  # troppo lunga
+        '0074311015A',  # non numerica
+        '\uff10' * 11,  # cifre non ASCII
+        '00743110158',  # cifra di controllo errata
+        '12345678903',  # ufficio 890 inesistente
+        '00000000000',  # ufficio 000 inesistente
+        '00000000018',  # matricola nulla (ufficio e controllo corretti)
+    ],
+)
+def test_invalid_p_iva(value):
+    """Partite IVA formalmente errate."""
+    assert not is_p_iva_formalmente_valida(value)
+
+
+def test_carattere_controllo():
+    """La cifra di controllo segue l'algoritmo di Luhn."""
+    assert carattere_controllo('0074311015') == 7
+    assert carattere_controllo('1234567001') == 7
+
+
+def _realistic_import(rows=1000, error_rate=0.15, seed=42):
+    """Genera P.IVA come in un file di import, con refusi e campi sporchi."""
+    rng = random.Random(seed)  # noqa: S311
+    values = []
+    for _ in range(rows):
+        office = rng.choice((*range(1, 101), 120, 121))
+        base = f'{rng.randrange(10**7):07d}{office:03d}'
+        p_iva = base + str(carattere_controllo(base))
+        if rng.random() < error_rate:
+            # Refusi tipici: cifra sbagliata, cifra mancante, lettera
+            position = rng.randrange(len(p_iva))
+            p_iva = rng.choice((
+                p_iva[:position]
+                + str((int(p_iva[position]) + 1) % 10)
+                + p_iva[position + 1 :],
+                p_iva[:position] + p_iva[position + 1 :],
+                p_iva[:position] + 'O' + p_iva[position + 1 :],
+            ))
+        values.append(p_iva)
+    return values
+
+
+@pytest.mark.django_db
+def test_offline_check_avoids_network_calls(monkeypatch):
+    """Su un import realistico i valori errati non arrivano a VIES."""
+    calls = []
+
+    def fake_vies(vat_number):
+        calls.append(vat_number)
+        return {'company_name': 'ACME'}
+
+    cache.clear()
+    monkeypatch.setattr(
+        datori_models, 'vies_cache', ViesLookupCache(fetch=fake_vies)
+    )
+    values = _realistic_import()
+
+    rejected = 0
+    for value in values:
+        try:
+            datori_models.validate_p_iva_italiana(value)
+        except ValidationError:
+            rejected += 1
+    cache.clear()
+
+    malformed = sum(not is_p_iva_formalmente_valida(v) for v in values)
+    # Ogni valore malformato è stato scartato senza chiamata di rete
+    assert rejected == malformed
+    assert len(calls) == len(values) - malformed
+    assert malformed > 100
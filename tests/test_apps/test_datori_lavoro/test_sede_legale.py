@@ -0,0 +1,170 @@
+"""Test per la sede legale denormalizzata su DatoreLavoro."""
+
+import pytest
+from django.db import IntegrityError, connection, transaction
+
+from server.admin import custom_admin_site
+from server.apps.datoriLavoro.models import (
+    DatoreLavoro,
+    DatoreLavoroSede,
+    Sede,
+)
+from server.apps.main.models import CityProxy, CountryProxy, RegionProxy
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def sedi():
+    """Tre sedi a Roma."""
+    country = CountryProxy.objects.create(
+        name='Italia', code2='IT', code3='ITA', slug='italia'
+    )
+    region = RegionProxy.objects.create(
+        name='Lazio', country=country, slug='lazio'
+    )
+    roma = CityProxy.objects.create(
+        name='Roma', region=region, country=country, slug='roma'
+    )
+    return [
+        Sede.objects.create(nome=f'Sede {index}', citta=roma)
+        for index in range(3)
+    ]
+
+
+def _sede_legale(datore):
+    datore.refresh_from_db()
+    return datore.sede_legale
+
+
+def test_trigger_follows_legal_flag(sedi):
+    """Inserimenti, modifiche e cancellazioni aggiornano la sede legale."""
+    datore = DatoreLavoro.objects.create(ragione_sociale='Acme')
+    legale = DatoreLavoroSede.objects.create(
+        datore_lavoro=datore, sede=sedi[0], is_sede_legale=True
+    )
+    filiale = DatoreLavoroSede.objects.create(
+        datore_lavoro=datore, sede=sedi[1]
+    )
+    assert _sede_legale(datore) == sedi[0]
+
+    DatoreLavoroSede.objects.filter(pk=legale.pk).update(is_sede_legale=False)
+    DatoreLavoroSede.objects.filter(pk=filiale.pk).update(is_sede_legale=True)
+    assert _sede_legale(datore) == sedi[1]
+
+    datore.datorelavorosede_set.all().delete()
+    assert _sede_legale(datore) is None
+
+
+def test_bulk_create_sets_every_legal_office(sedi):
+    """Un solo trigger per istruzione copre tutte le righe inserite."""
+    datori = DatoreLavoro.objects.bulk_create(
+        DatoreLavoro(ragione_sociale=str(index)) for index in range(3)
+    )
+    DatoreLavoroSede.objects.bulk_create(
+        DatoreLavoroSede(datore_lavoro=datore, sede=sede, is_sede_legale=True)
+        for datore, sede in zip(datori, sedi, strict=True)
+    )
+
+    assert dict(DatoreLavoro.objects.values_list('pk', 'sede_legale_id')) == {
+        datore.pk: sede.pk for datore, sede in zip(datori, sedi, strict=True)
+    }
+
+
+def test_full_save_keeps_trigger_value(sedi):
+    """Un'istanza caricata prima del trigger non cancella la sede legale."""
+    datore = DatoreLavoro.objects.create(ragione_sociale='Acme')
+    DatoreLavoroSede.objects.create(
+        datore_lavoro=datore, sede=sedi[0], is_sede_legale=True
+    )
+
+    datore.ragione_sociale = 'Acme S.p.A.'
+    datore.save()
+
+    assert _sede_legale(datore) == sedi[0]
+    assert datore.ragione_sociale == 'Acme S.p.A.'
+
+
+def _verifica_vincoli():
+    """Esegue subito i controlli differiti, come farebbe il commit."""
+    with transaction.atomic():
+        connection.check_constraints()
+
+
+@pytest.fixture
+def datore(sedi):
+    """Datore le cui sedi vengono rimosse a fine test.
+
+    Il teardown dei test verifica i vincoli differiti: senza sedi il
+    datore torna valido anche dopo i casi che violano il vincolo.
+    """
+    datore = DatoreLavoro.objects.create(ragione_sociale='Acme')
+    yield datore
+    datore.datorelavorosede_set.all().delete()
+
+
+def test_legal_office_can_be_swapped_before_commit(sedi, datore):
+    """Il vincolo è differito: gli stati intermedi sono ammessi."""
+    DatoreLavoro.objects.create(ragione_sociale='Senza sedi')
+    legale = DatoreLavoroSede.objects.create(
+        datore_lavoro=datore, sede=sedi[0], is_sede_legale=True
+    )
+    filiale = DatoreLavoroSede.objects.create(
+        datore_lavoro=datore, sede=sedi[1], is_sede_legale=True
+    )
+    legale.is_sede_legale = False
+    legale.save()
+
+    _verifica_vincoli()
+
+    assert _sede_legale(datore) == filiale.sede
+
+
+@pytest.mark.parametrize('legali', [(), (0, 1)])
+def test_exactly_one_legal_office_at_commit(sedi, datore, legali):
+    """Nessuna o più sedi legali fanno fallire il commit."""
+    DatoreLavoroSede.objects.bulk_create(
+        DatoreLavoroSede(
+            datore_lavoro=datore, sede=sede, is_sede_legale=index in legali
+        )
+        for index, sede in enumerate(sedi)
+    )
+
+    with pytest.raises(IntegrityError, match='esattamente una sede legale'):
+        _verifica_vincoli()
+
+
+def test_deleting_legal_office_is_rejected(sedi, datore):
+    """Eliminare la sede legale lasciando le filiali viola il vincolo."""
+    legale = DatoreLavoroSede.objects.create(
+        datore_lavoro=datore, sede=sedi[0], is_sede_legale=True
+    )
+    DatoreLavoroSede.objects.create(datore_lavoro=datore, sede=sedi[1])
+    _verifica_vincoli()
+
+    legale.delete()
+
+    with pytest.raises(IntegrityError, match='esattamente una sede legale'):
+        _verifica_vincoli()
+
+
+def test_admin_protects_legal_office_with_other_sedi(rf, admin_user, sedi):
+    """L'admin rifiuta di eliminare la sede legale se restano filiali."""
+    datore = DatoreLavoro.objects.create(ragione_sociale='Acme')
+    DatoreLavoroSede.objects.create(
+        datore_lavoro=datore, sede=sedi[0], is_sede_legale=True
+    )
+    DatoreLavoroSede.objects.create(datore_lavoro=datore, sede=sedi[1])
+    model_admin = custom_admin_site.get_model_admin(Sede)
+    request = rf.post('/')
+    request.user = admin_user
+
+    *_, protected = model_admin.get_deleted_objects([sedi[0]], request)
+    assert protected == [
+        'Sede 0 - Roma: sede legale di Acme, che ha altre sedi',
+    ]
+
+    # Filiali o tutte le sedi del datore si possono eliminare
+    for sedi_eliminate in ([sedi[1]], sedi[:2]):
+        *_, protected = model_admin.get_deleted_objects(sedi_eliminate, request)
+        assert protected == []
@@ -0,0 +1,221 @@
+"""Test per la coda di verifica VIES in background."""
+
+import threading
+import time
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from server.apps.datoriLavoro import verifica
+from server.apps.datoriLavoro.models import (
+    DatoreLavoro,
+    StatoVerificaPartitaIva,
+    VerificaPartitaIva,
+)
+from server.apps.datoriLavoro.verifica import (
+    OpzioniWorker,
+    accoda_in_attesa,
+    esegui_lotto,
+)
+from server.apps.datoriLavoro.vies import ViesLookupCache
+
+_VALID = '00743110157'
+_INVALID = '12345670017'
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.usefixtures('clear_cache'),
+]
+
+
+@pytest.fixture(autouse=True)
+def _fake_vies_cache(monkeypatch, fake_vies):
+    """Il worker interroga il VIES finto."""
+    monkeypatch.setattr(
+        verifica, 'vies_cache', ViesLookupCache(fetch=fake_vies)
+    )
+
+
+def _stato(datore):
+    datore.refresh_from_db()
+    return datore.stato_verifica_p_iva
+
+
+def test_save_enqueues_verification():
+    """Il salvataggio con P.IVA accoda una verifica senza chiamare VIES."""
+    datore = DatoreLavoro.objects.create(p_iva=_VALID)
+
+    assert datore.stato_verifica_p_iva == StatoVerificaPartitaIva.PENDING
+    assert datore.verifiche_p_iva.count() == 1
+
+
+def test_save_without_p_iva_does_not_enqueue():
+    """Senza Partita IVA non c'è nulla da verificare."""
+    datore = DatoreLavoro.objects.create(ragione_sociale='Acme')
+
+    assert not datore.stato_verifica_p_iva
+    assert not VerificaPartitaIva.objects.exists()
+
+
+def test_unchanged_p_iva_is_not_enqueued_again():
+    """Salvare senza modificare la P.IVA non crea nuove richieste."""
+    DatoreLavoro.objects.create(p_iva=_VALID)
+    datore = DatoreLavoro.objects.get()
+    datore.ragione_sociale = 'Acme'
+    datore.save()
+
+    assert VerificaPartitaIva.objects.count() == 1
+
+
+@pytest.mark.parametrize('leggi', [False, True])
+def test_deferred_p_iva_is_not_enqueued_again(leggi):
+    """Una P.IVA differita (``defer``/``only``) non conta come modificata."""
+    DatoreLavoro.objects.create(p_iva=_VALID)
+    job = VerificaPartitaIva.objects.get()
+    datore = DatoreLavoro.objects.defer('p_iva').get()
+    if leggi:
+        assert datore.p_iva == _VALID
+    datore.ragione_sociale = 'Acme'
+    datore.save()
+
+    assert VerificaPartitaIva.objects.get() == job
+    assert datore.stato_verifica_p_iva == StatoVerificaPartitaIva.PENDING
+
+
+def test_deferred_p_iva_assigned_is_enqueued():
+    """Una P.IVA differita e poi assegnata va verificata."""
+    DatoreLavoro.objects.create(p_iva=_VALID)
+    datore = DatoreLavoro.objects.only('pk').get()
+    datore.p_iva = _INVALID
+    datore.save()
+
+    assert VerificaPartitaIva.objects.get().p_iva == _INVALID
+
+
+def test_p_iva_outside_update_fields_is_not_enqueued():
+    """Se ``update_fields`` non scrive la P.IVA non c'è nulla da verificare."""
+    DatoreLavoro.objects.create(p_iva=_VALID)
+    datore = DatoreLavoro.objects.get()
+    datore.p_iva = _INVALID
+    datore.ragione_sociale = 'Acme'
+    datore.save(update_fields=['ragione_sociale'])
+
+    assert VerificaPartitaIva.objects.get().p_iva == _VALID
+    assert datore.stato_verifica_p_iva == StatoVerificaPartitaIva.PENDING
+
+
+def test_changed_p_iva_replaces_open_job():
+    """Una nuova P.IVA sostituisce la richiesta ancora aperta."""
+    datore = DatoreLavoro.objects.create(p_iva=_VALID)
+    datore.p_iva = _INVALID
+    datore.save(update_fields=['p_iva'])
+
+    job = VerificaPartitaIva.objects.get()
+    assert job.p_iva == _INVALID
+    assert _stato(datore) == StatoVerificaPartitaIva.PENDING
+
+
+def test_worker_records_valid_and_invalid():
+    """Il worker aggiorna lo stato con l'esito VIES."""
+    valido = DatoreLavoro.objects.create(p_iva=_VALID)
+    non_valido = DatoreLavoro.objects.create(p_iva=_INVALID)
+
+    assert esegui_lotto(OpzioniWorker()) == 2
+    assert esegui_lotto(OpzioniWorker()) == 0
+
+    assert _stato(valido) == StatoVerificaPartitaIva.VALID
+    assert _stato(non_valido) == StatoVerificaPartitaIva.INVALID
+    assert not VerificaPartitaIva.objects.filter(
+        completata_at__isnull=True
+    ).exists()
+
+
+def test_worker_retries_with_backoff(fake_vies):
+    """Gli errori transitori vengono ritentati con backoff esponenziale."""
+    fake_vies.unavailable = True
+    datore = DatoreLavoro.objects.create(p_iva=_VALID)
+    opzioni = OpzioniWorker(max_attempts=3, backoff=10)
+
+    before = timezone.now()
+    esegui_lotto(opzioni)
+    job = VerificaPartitaIva.objects.get()
+    assert job.tentativi == 1
+    assert job.prossimo_tentativo_at >= before + timedelta(seconds=10)
+    assert 'VIES down' in job.ultimo_errore
+    assert _stato(datore) == StatoVerificaPartitaIva.PENDING
+
+    # Non ancora scaduta: il worker non la preleva
+    assert esegui_lotto(opzioni) == 0
+
+    VerificaPartitaIva.objects.update(prossimo_tentativo_at=timezone.now())
+    esegui_lotto(opzioni)
+    job.refresh_from_db()
+    assert job.prossimo_tentativo_at >= before + timedelta(seconds=20)
+
+
+def test_worker_marks_unreachable_after_max_attempts(fake_vies):
+    """Esauriti i tentativi lo stato diventa ``unreachable``."""
+    fake_vies.unavailable = True
+    datore = DatoreLavoro.objects.create(p_iva=_VALID)
+
+    esegui_lotto(OpzioniWorker(max_attempts=1))
+
+    job = VerificaPartitaIva.objects.get()
+    assert job.completata_at is not None
+    assert job.esito == StatoVerificaPartitaIva.UNREACHABLE
+    assert _stato(datore) == StatoVerificaPartitaIva.UNREACHABLE
+
+
+def test_outdated_result_does_not_overwrite_new_p_iva():
+    """L'esito di una P.IVA non più attuale non tocca il datore."""
+    datore = DatoreLavoro.objects.create(p_iva=_VALID)
+    DatoreLavoro.objects.filter(pk=datore.pk).update(p_iva=_INVALID)
+
+    esegui_lotto(OpzioniWorker())
+
+    assert _stato(datore) == StatoVerificaPartitaIva.PENDING
+
+
+def test_worker_bounds_concurrency(monkeypatch, fake_vies):
+    """Non più di ``concurrency`` chiamate VIES contemporanee."""
+    lock = threading.Lock()
+    in_flight = []
+    peak = []
+
+    def slow_vies(vat_number):
+        with lock:
+            in_flight.append(vat_number)
+            peak.append(len(in_flight))
+        time.sleep(0.02)
+        with lock:
+            in_flight.remove(vat_number)
+        return fake_vies(vat_number)
+
+    monkeypatch.setattr(
+        verifica, 'vies_cache', ViesLookupCache(fetch=slow_vies)
+    )
+    for index in range(6):
+        datore = DatoreLavoro.objects.create(ragione_sociale=str(index))
+        VerificaPartitaIva.objects.create(
+            datore_lavoro=datore, p_iva=f'{index:011d}'
+        )
+
+    assert esegui_lotto(OpzioniWorker(concurrency=2)) == 6
+    assert max(peak) <= 2
+
+
+def test_enqueue_pending_and_command(fake_vies):
+    """Il comando accoda i datori in attesa e svuota la coda."""
+    datore = DatoreLavoro.objects.create(p_iva=_VALID)
+    # Dati caricati senza passare da save(): nessuna richiesta in coda
+    VerificaPartitaIva.objects.all().delete()
+    assert accoda_in_attesa() == 1
+    assert accoda_in_attesa() == 0
+    VerificaPartitaIva.objects.all().delete()
+
+    call_command('verifica_partite_iva', '--once', '--enqueue-pending')
+
+    assert _stato(datore) == StatoVerificaPartitaIva.VALID
+    assert fake_vies.calls == 1
@@ -0,0 +1,200 @@
+"""Test per la cache delle verifiche VIES delle Partite IVA."""
+
+import time
+from unittest.mock import patch
+
+import pytest
+from django.core.exceptions import ValidationError
+from verify_vat_number.exceptions import (
+    ServiceTemporarilyUnavailable,
+    VatNotFound,
+)
+
+from server.apps.datoriLavoro import models as datori_models
+from server.apps.datoriLavoro import vies
+from server.apps.datoriLavoro.checks import cache_vies_condivisa
+from server.apps.datoriLavoro.vies import ViesLookupCache, normalizza_p_iva
+
+_VALID = '00743110157'
+_INVALID = '12345670017'
+
+pytestmark = pytest.mark.usefixtures('clear_cache')
+
+
+@pytest.fixture
+def lookup(fake_vies):
+    """Cache VIES con rivalidazione sincrona per test deterministici."""
+    return ViesLookupCache(fetch=fake_vies, background=lambda func: func())
+
+
+def test_normalizza_p_iva():
+    """Spazi e prefisso IT vengono rimossi."""
+    assert normalizza_p_iva(' it 0074 3110157 ') == _VALID
+
+
+def test_positive_and_negative_results_are_cached(lookup, fake_vies):
+    """Esiti positivi e negativi vengono memorizzati."""
+    assert lookup.is_valid(_VALID) is True
+    assert lookup.is_valid(_INVALID) is False
+    assert lookup.is_valid(f'IT{_VALID}') is True
+    assert lookup.is_valid(_INVALID) is False
+
+    assert fake_vies.calls == 2
+    assert lookup.hits == 2
+    assert lookup.misses == 2
+    assert lookup.hit_ratio == pytest.approx(0.5)
+
+
+def test_negative_ttl_is_separate(lookup, fake_vies, settings):
+    """Le voci negative scadono prima di quelle positive."""
+    settings.VIES_CACHE_NEGATIVE_TTL = 0
+    lookup.is_valid(_VALID)
+    lookup.is_valid(_INVALID)
+
+    lookup.is_valid(_VALID)
+    lookup.is_valid(_INVALID)
+
+    assert lookup.hits == 1
+    assert lookup.stale_hits == 1
+    assert fake_vies.calls == 3
+
+
+def test_stale_entry_is_served_while_revalidating(lookup, fake_vies, settings):
+    """Una voce scaduta viene servita subito e poi aggiornata."""
+    settings.VIES_CACHE_POSITIVE_TTL = 0
+    assert lookup.is_valid(_VALID) is True
+
+    fake_vies.valid.clear()
+    # La risposta stale è ancora "valida", la rivalidazione la aggiorna
+    assert lookup.is_valid(_VALID) is True
+    settings.VIES_CACHE_NEGATIVE_TTL = 3600
+    assert lookup.is_valid(_VALID) is False
+    assert fake_vies.calls == 2
+
+
+def test_revalidation_failure_keeps_stale_entry(lookup, fake_vies, settings):
+    """Un errore durante la rivalidazione non cancella la voce."""
+    settings.VIES_CACHE_POSITIVE_TTL = 0
+    lookup.is_valid(_VALID)
+    fake_vies.unavailable = True
+
+    assert lookup.is_valid(_VALID) is True
+    assert lookup.is_valid(_VALID) is True
+
+
+def test_revalidation_is_not_duplicated(fake_vies, settings):
+    """Con una rivalidazione in corso non ne parte un'altra."""
+    settings.VIES_CACHE_POSITIVE_TTL = 0
+    scheduled = []
+    lookup = ViesLookupCache(fetch=fake_vies, background=scheduled.append)
+    lookup.is_valid(_VALID)
+
+    lookup.is_valid(_VALID)
+    lookup.is_valid(_VALID)
+
+    assert len(scheduled) == 1
+
+
+def test_transient_errors_are_not_cached(lookup, fake_vies):
+    """Gli errori transitori vengono propagati e non memorizzati."""
+    fake_vies.unavailable = True
+    with pytest.raises(ServiceTemporarilyUnavailable):
+        lookup.is_valid(_VALID)
+
+    fake_vies.unavailable = False
+    assert lookup.is_valid(_VALID) is True
+
+
+def test_invalidate_and_reset_stats(lookup, fake_vies):
+    """``invalidate`` forza una nuova chiamata VIES."""
+    assert lookup.hit_ratio == 0.0
+    lookup.is_valid(_VALID)
+    lookup.invalidate(_VALID)
+    lookup.is_valid(_VALID)
+
+    assert fake_vies.calls == 2
+    lookup.reset_stats()
+    assert (lookup.hits, lookup.stale_hits, lookup.misses) == (0, 0, 0)
+
+
+def test_hit_ratio_and_latency_on_repeated_saves(fake_vies):
+    """Salvataggi ripetuti della stessa P.IVA non pagano la latenza VIES."""
+    fake_vies.latency = 0.02
+    lookup = ViesLookupCache(fetch=fake_vies)
+
+    start = time.perf_counter()
+    for _ in range(50):
+        lookup.is_valid(_VALID)
+    elapsed = time.perf_counter() - start
+
+    assert fake_vies.calls == 1
+    assert lookup.hit_ratio == pytest.approx(49 / 50)
+    # Senza cache servirebbero almeno 50 * 20ms = 1s
+    assert elapsed < 0.5
+
+
+def test_validator_uses_cache(monkeypatch, fake_vies):
+    """Il validatore del modello passa dalla cache VIES."""
+    monkeypatch.setattr(
+        datori_models,
+        'vies_cache',
+        ViesLookupCache(fetch=fake_vies),
+    )
+    datori_models.validate_p_iva_italiana(_VALID)
+    datori_models.validate_p_iva_italiana(_VALID)
+    with pytest.raises(ValidationError):
+        datori_models.validate_p_iva_italiana(_INVALID)
+
+    fake_vies.unavailable = True
+    with pytest.raises(ValidationError):
+        datori_models.validate_p_iva_italiana('76543210157')
+    assert fake_vies.calls == 3
+
+
+def test_interroga_vies_sets_network_timeouts(settings):
+    """Il client zeep scade dopo ``VIES_TIMEOUT``, WSDL e operazione."""
+    settings.VIES_TIMEOUT = 2.5
+    with patch.object(vies, 'Client', autospec=True) as client:
+        check_vat = client.return_value.service.checkVat
+        check_vat.return_value.valid = True
+
+        assert vies.interroga_vies(f'IT{_VALID}') is check_vat.return_value
+
+    transport = client.call_args.kwargs['transport']
+    assert (transport.load_timeout, transport.operation_timeout) == (2.5, 2.5)
+    check_vat.assert_called_once_with(countryCode='IT', vatNumber=_VALID)
+
+
+def test_interroga_vies_not_found():
+    """Una Partita IVA inesistente solleva ``VatNotFound``."""
+    with patch.object(vies, 'Client', autospec=True) as client:
+        client.return_value.service.checkVat.return_value.valid = False
+
+        with pytest.raises(VatNotFound):
+            vies.interroga_vies(f'IT{_INVALID}')
+
+
+@pytest.mark.django_db
+def test_results_survive_in_the_database_cache(fake_vies, settings):
+    """Gli esiti nella cache su database valgono per tutti i processi."""
+    settings.VIES_CACHE_ALIAS = 'vies'
+    ViesLookupCache(fetch=fake_vies).is_valid(_VALID)
+
+    # Un altro worker, o lo stesso dopo un riavvio
+    lookup = ViesLookupCache(fetch=fake_vies)
+
+    assert lookup.is_valid(_VALID) is True
+    assert lookup.hits == 1
+    assert fake_vies.calls == 1
+
+
+@pytest.mark.parametrize(
+    ('alias', 'warnings'), [('vies', []), ('default', ['datoriLavoro.W001'])]
+)
+def test_check_per_process_cache(settings, alias, warnings):
+    """Il controllo di sistema segnala una cache VIES per processo."""
+    settings.VIES_CACHE_ALIAS = alias
+
+    assert [
+        message.id for message in cache_vies_condivisa(app_configs=None)
+    ] == warnings
@@ -0,0 +1,155 @@
+"""Test per il trie di autocompletamento delle città."""
+
+import time
+
+import pytest
+
+from server.apps.main.logic.autocompletamento import (
+    IndiceAutocompletamento,
+    indice_autocompletamento,
+)
+from server.apps.main.logic.geo import (
+    CittaGeo,
+    PaeseGeo,
+    RegioneGeo,
+    TabellaGeo,
+    tabella_geo,
+)
+from server.apps.main.models import CityProxy, CountryProxy
+
+_CITTA = (
+    # id, nome, regione, popolazione
+    (1, 'Torino', 1, 850000),
+    (2, 'Forlì', 2, 117000),
+    (3, 'San Giorgio Canavese', 1, 2500),
+    (4, 'Castello', 2, 700),
+    (5, 'Castello', 1, 700),
+    (6, 'Castellamonte', 1, 9900),
+    (7, "Sant'Antonino di Susa", 1, 4300),
+    (8, 'Tor', None, None),
+)
+
+
+def _indice(citta=_CITTA, alternativi=()):
+    tabella = TabellaGeo(
+        1,
+        [PaeseGeo(1, 'Italia', 'IT')],
+        [
+            RegioneGeo(2, 'Emilia-Romagna', '', 1),
+            RegioneGeo(1, 'Piemonte', '', 1),
+        ],
+        [
+            CittaGeo(id_, name, f'{name}, Italia', region, 1, population)
+            for id_, name, region, population in citta
+        ],
+    )
+    return IndiceAutocompletamento(tabella, alternativi)
+
+
+def _nomi(indice, term, pagina=1, per_pagina=20):
+    citta, altre = indice.cerca(term, pagina, per_pagina)
+    return [(city.id, city.name) for city in citta], altre
+
+
+def test_prefix_accents_and_words():
+    """Prefissi di nomi e parole, senza maiuscole, accenti e apostrofi."""
+    indice = _indice()
+
+    assert _nomi(indice, 'FORLI') == ([(2, 'Forlì')], False)
+    assert _nomi(indice, 'canav')[0] == [(3, 'San Giorgio Canavese')]
+    assert _nomi(indice, 'sant antonino')[0] == [(7, "Sant'Antonino di Susa")]
+    assert _nomi(indice, 'Sant\u2019Antonino')[0] == [
+        (7, "Sant'Antonino di Susa")
+    ]
+    assert _nomi(indice, 'nessuna') == ([], False)
+
+
+def test_ranking_population_region_and_exact_match():
+    """Prima il nome esatto, poi popolazione e regione."""
+    indice = _indice()
+
+    # "Tor" coincide: precede Torino, più popolosa
+    assert _nomi(indice, 'tor')[0] == [(8, 'Tor'), (1, 'Torino')]
+    # A parità di popolazione decide la regione
+    assert _nomi(indice, 'castel')[0] == [
+        (6, 'Castellamonte'),
+        (4, 'Castello'),
+        (5, 'Castello'),
+    ]
+    assert _nomi(indice, '')[0][:2] == [(1, 'Torino'), (2, 'Forlì')]
+
+
+def test_alternate_names():
+    """I nomi alternativi in alfabeto latino trovano la città."""
+    indice = _indice(alternativi=[(1, 'Turin,Torino,Турин,TRN2,,')])
+
+    assert _nomi(indice, 'turi')[0] == [(1, 'Torino')]
+    assert _nomi(indice, 'тур') == ([], False)
+    # Più chiavi della stessa città danno un solo risultato
+    assert _nomi(indice, 't')[0] == [(1, 'Torino'), (8, 'Tor')]
+
+
+def test_alternate_names_separated_by_semicolons():
+    """Anche ';', il separatore di cities_light, divide i nomi."""
+    indice = _indice(alternativi=[(1, 'Turin;Taurinum, Augusta;Турин')])
+
+    assert _nomi(indice, 'taur')[0] == [(1, 'Torino')]
+    assert _nomi(indice, 'augusta')[0] == [(1, 'Torino')]
+    assert _nomi(indice, 'turin;')[0] == []
+
+
+def test_pages_beyond_the_precomputed_ranking():
+    """Le pagine oltre la classifica precalcolata sono calcolate."""
+    indice = _indice([(id_, f'Borgo {id_}', 1, id_) for id_ in range(1, 151)])
+
+    pagine = [_nomi(indice, 'b', pagina, 40) for pagina in (1, 2, 3, 4)]
+
+    assert [len(citta) for citta, _ in pagine] == [40, 40, 40, 30]
+    assert [altre for _, altre in pagine] == [True, True, True, False]
+    assert pagine[0][0][0] == (150, 'Borgo 150')
+    assert pagine[3][0][-1] == (1, 'Borgo 1')
+    assert [id_ for id_, _ in _nomi(indice, 'borgo 14', 1, 5)[0]] == [
+        14,
+        149,
+        148,
+        147,
+        146,
+    ]
+
+
+def test_lookup_under_a_millisecond():
+    """Con diecimila città una ricerca resta sotto il millisecondo."""
+    indice = _indice([
+        (id_, f'Comune {id_:05d}', id_ % 20, id_) for id_ in range(1, 10001)
+    ])
+    terms = ['c', 'co', 'com', 'comune 0', 'comune 01', 'comune 099']
+
+    start = time.perf_counter()
+    for _ in range(100):
+        for term in terms:
+            indice.cerca(term)
+    media = (time.perf_counter() - start) / (100 * len(terms))
+
+    assert media < 0.001
+
+
+@pytest.mark.django_db
+def test_index_follows_the_geo_table():
+    """L'indice del worker si ricostruisce quando cambia la tabella."""
+    country = CountryProxy.objects.create(
+        name='Italia', code2='IT', code3='ITA', slug='italia'
+    )
+    CityProxy.objects.create(
+        name='Torino',
+        slug='torino',
+        country=country,
+        alternate_names='Turin',
+    )
+    indice = indice_autocompletamento()
+
+    assert indice_autocompletamento() is indice
+    assert indice.tabella is tabella_geo()
+    assert _nomi(indice, 'turin')[0][0][1] == 'Torino'
+
+    CityProxy.objects.create(name='Alba', slug='alba', country=country)
+    assert _nomi(indice_autocompletamento(), 'alb')[0][0][1] == 'Alba'
@@ -0,0 +1,169 @@
+"""Test per la tabella geografica in memoria."""
+
+import pytest
+from django.core.cache import caches
+from django.db import connection
+
+from server.apps.datoriLavoro.models import Sede
+from server.apps.main.logic.geo import (
+    invalida_tabella_geo,
+    tabella_geo,
+    versione_geo,
+)
+from server.apps.main.models import CityProxy, CountryProxy, RegionProxy
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def italia():
+    """L'Italia con due regioni, tre città e una città senza regione."""
+    country = CountryProxy.objects.create(
+        name='Italia', code2='IT', code3='ITA', slug='italia'
+    )
+    piemonte = RegionProxy.objects.create(
+        name='Piemonte',
+        country=country,
+        slug='piemonte',
+        display_name='Piemonte, Italia',
+    )
+    lazio = RegionProxy.objects.create(
+        name='Lazio', country=country, slug='lazio'
+    )
+    for name, region, population in (
+        ('Torino', piemonte, 850000),
+        ('Forlì', None, 117000),
+        ('Castello', piemonte, 500),
+        ('Castello', lazio, 700),
+    ):
+        CityProxy.objects.create(
+            name=name,
+            slug=f'{name.lower()}-{population}',
+            region=region,
+            country=country,
+            display_name=f'{name}, Italia',
+            population=population,
+        )
+    return country
+
+
+def test_lookups_without_queries(italia, django_assert_num_queries):
+    """Caricata la tabella, le ricerche non interrogano il database."""
+    torino = CityProxy.objects.get(name='Torino')
+    tabella = tabella_geo()
+
+    with django_assert_num_queries(0):
+        assert tabella_geo() is tabella
+        city = tabella.citta(torino.pk)
+        assert (city.name, city.population) == ('Torino', 850000)
+        assert str(city) == str(torino) == 'Torino, Italia'
+        assert tabella.nome_regione(city) == 'Piemonte'
+        assert str(tabella.regione(city.region_id)) == 'Piemonte, Italia'
+        assert str(tabella.paese(city.country_id)) == 'Italia'
+        assert [str(region) for region in tabella.regioni()] == [
+            'Lazio',
+            'Piemonte, Italia',
+        ]
+        assert tabella.citta(None) is None
+        assert tabella.citta(torino.pk + 1000) is None
+        assert len(tabella) == len(list(tabella)) == 4
+
+        forli = tabella.citta_per_nome('FORLI')
+        assert [city.name for city in forli] == ['Forlì']
+        assert not tabella.nome_regione(forli[0])
+        assert tabella.citta_della_regione(None) == forli
+        assert {
+            tabella.nome_regione(city)
+            for city in tabella.citta_per_nome('castello')
+        } == {'Lazio', 'Piemonte'}
+        assert [
+            city.name for city in tabella.citta_della_regione(city.region_id)
+        ] == ['Torino', 'Castello']
+
+
+def test_model_changes_reload_the_table(italia):
+    """Salvare o eliminare una città rende obsoleta la tabella."""
+    tabella = tabella_geo()
+    city = CityProxy.objects.create(
+        name='Cuneo', slug='cuneo', country=italia, display_name='Cuneo'
+    )
+
+    assert tabella_geo() is not tabella
+    assert str(tabella_geo().citta(city.pk)) == 'Cuneo'
+
+    city.delete()
+    assert tabella_geo().citta(city.pk) is None
+
+
+def _altro_worker():
+    """Un altro worker cambia la versione, senza segnali in questo."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT nextval('main_geo_versione')")
+
+
+def test_other_workers_version(italia, settings):
+    """Una nuova versione vale dopo l'intervallo di controllo."""
+    tabella = tabella_geo()
+    settings.GEO_CONTROLLO_VERSIONE = 0
+    assert tabella_geo() is tabella
+
+    _altro_worker()
+    settings.GEO_CONTROLLO_VERSIONE = 3600
+    assert tabella_geo() is tabella
+    settings.GEO_CONTROLLO_VERSIONE = 0
+    assert tabella_geo() is not tabella
+
+
+def test_version_in_a_shared_cache(italia, settings, tmp_path):
+    """Con una cache condivisa la versione sta nella cache."""
+    settings.CACHES = {
+        **settings.CACHES,
+        'geo': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(tmp_path / 'geo'),
+        },
+    }
+    settings.GEO_CACHE_ALIAS = 'geo'
+    settings.GEO_CONTROLLO_VERSIONE = 0
+    versione = versione_geo()
+    assert versione_geo() == versione
+    tabella = tabella_geo()
+
+    _altro_worker()
+    assert tabella_geo() is tabella
+
+    caches['geo'].set('geo:versione', versione + 1, timeout=None)
+    assert tabella_geo() is not tabella
+    invalida_tabella_geo()
+    assert versione_geo() > versione + 1
+
+
+def test_sede_str_uses_the_table(italia, django_assert_num_queries):
+    """``str(sede)`` legge la città dalla tabella, o dal database."""
+    sede = Sede.objects.create(
+        nome='Sede', citta=CityProxy.objects.get(name='Torino')
+    )
+    sede = Sede.objects.get(pk=sede.pk)
+    tabella_geo()
+
+    with django_assert_num_queries(0):
+        assert str(sede) == 'Sede - Torino, Italia'
+
+    # Una città scritta senza segnali non è nella tabella caricata
+    (nuova,) = CityProxy.objects.bulk_create([
+        CityProxy(name='Alba', slug='alba', country=italia, display_name='A')
+    ])
+    sede = Sede.objects.create(nome='Alba', citta_id=nuova.pk)
+    sede = Sede.objects.get(pk=sede.pk)
+    with django_assert_num_queries(1):
+        assert str(sede) == 'Alba - A'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_invalidate_in_autocommit():
+    """Fuori da una transazione la versione cambia subito."""
+    versione = versione_geo()
+
+    invalida_tabella_geo()
+
+    assert versione_geo() > versione
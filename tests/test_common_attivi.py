@@ -0,0 +1,84 @@
+"""Test per righe attive, disattivazione e filtro admin su ``is_active``."""
+
+import pytest
+from django.db import connection
+
+from server.admin import custom_admin_site
+from server.apps.datoriLavoro.admin import DatoreLavoroAdmin
+from server.apps.datoriLavoro.models import DatoreLavoro
+from server.common.audit import impersonate
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def datori():
+    """Un datore attivo e uno disattivato."""
+    attivo = DatoreLavoro.objects.create(ragione_sociale='Attivo')
+    disattivato = DatoreLavoro.objects.create(
+        ragione_sociale='Disattivato', is_active=False
+    )
+    return attivo, disattivato
+
+
+def test_active_manager_and_queryset(datori):
+    """``attivi`` esclude le righe disattivate."""
+    attivo, _ = datori
+
+    assert list(DatoreLavoro.attivi.all()) == [attivo]
+    assert list(DatoreLavoro.objects.attivi()) == [attivo]
+    assert DatoreLavoro.objects.count() == len(datori)
+
+
+def test_soft_delete_signs_and_bumps_version(datori, admin_user):
+    """``soft_delete`` disattiva in blocco solo le righe ancora attive."""
+    attivo, _ = datori
+    version = attivo.version
+
+    with impersonate(admin_user):
+        assert DatoreLavoro.objects.soft_delete() == 1
+
+    attivo.refresh_from_db()
+    assert not attivo.is_active
+    assert attivo.updated_by == admin_user
+    assert attivo.version > version
+    assert not DatoreLavoro.attivi.exists()
+
+
+def test_active_rows_use_partial_index(datori):
+    """La lista predefinita dell'admin legge l'indice parziale."""
+    queryset = DatoreLavoro.attivi.order_by('-created_at', '-id')
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset.explain()
+
+    assert 'datore_attivi_keyset_idx' in plan
+
+
+def _nomi(rf, admin_user, params=None):
+    model_admin = DatoreLavoroAdmin(DatoreLavoro, custom_admin_site)
+    request = rf.get('/', params or {})
+    request.user = admin_user
+    changelist = model_admin.get_changelist_instance(request)
+    choices = [
+        choice['display']
+        for choice in changelist.filter_specs[0].choices(changelist)
+        if choice['selected']
+    ]
+    rows = [datore.ragione_sociale for datore in changelist.result_list]
+    return choices, rows
+
+
+@pytest.mark.parametrize(
+    ('params', 'expected'),
+    [
+        (None, (['Attivi'], ['Attivo'])),
+        ({'attivi': '0'}, (['Disattivati'], ['Disattivato'])),
+        ({'attivi': 'tutti'}, (['Tutti'], ['Disattivato', 'Attivo'])),
+    ],
+)
+def test_admin_lists_active_rows_by_default(
+    rf, admin_user, datori, params, expected
+):
+    """Senza filtro l'admin mostra le righe attive."""
+    assert _nomi(rf, admin_user, params) == expected
@@ -0,0 +1,72 @@
+"""Test per le ultime azioni nella pagina di modifica admin."""
+
+from datetime import timedelta
+
+import pytest
+from django.contrib import admin
+from django.contrib.admin.models import ADDITION, CHANGE, LogEntry
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.utils import timezone
+
+from server.apps.accounts.admin import CustomUserAdmin
+from server.apps.accounts.models import CustomUser
+
+pytestmark = pytest.mark.django_db
+
+
+def _voce(obj, user, minuti, action_flag=CHANGE):
+    return LogEntry.objects.create(
+        user=user,
+        content_type=ContentType.objects.get_for_model(obj),
+        object_id=str(obj.pk),
+        object_repr=str(obj),
+        action_flag=action_flag,
+        action_time=timezone.now() - timedelta(minutes=minuti),
+    )
+
+
+@pytest.fixture
+def model_admin():
+    """Admin degli utenti, che usa ``AttivitaRecenteMixin``."""
+    return CustomUserAdmin(CustomUser, admin.site)
+
+
+def test_recent_activity_filters_by_content_type(model_admin, admin_user):
+    """Solo le voci dell'oggetto, dalla più recente, fino al limite."""
+    model_admin.attivita_recente_limite = 2
+    group = Group.objects.create(name='Stesso id')
+    group.pk = admin_user.pk
+    voci = [
+        _voce(admin_user, admin_user, 30, ADDITION),
+        _voce(admin_user, admin_user, 10),
+        _voce(admin_user, admin_user, 20),
+    ]
+    # Stesso ``object_id``, altro modello
+    _voce(group, admin_user, 0)
+
+    assert list(model_admin.attivita_recente(admin_user.pk)) == [
+        voci[1],
+        voci[2],
+    ]
+
+
+def test_recent_activity_uses_index(model_admin, admin_user):
+    """La ricerca passa dall'indice su tipo, id e data."""
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+    plan = model_admin.attivita_recente(admin_user.pk).explain()
+
+    assert 'admin_log_oggetto_idx' in plan
+
+
+def test_change_view_context(rf, model_admin, admin_user):
+    """La pagina di modifica riceve le ultime azioni."""
+    voce = _voce(admin_user, admin_user, 0)
+    request = rf.get('/')
+    request.user = admin_user
+
+    response = model_admin.change_view(request, str(admin_user.pk))
+
+    assert list(response.context_data['recent_log_entries']) == [voce]
@@ -0,0 +1,127 @@
+"""Test per il contesto di audit (``server.common.audit``)."""
+
+import asyncio
+import threading
+from unittest.mock import patch
+
+import crum
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+
+from server.apps.accounts.models import CustomUser
+from server.apps.datoriLavoro.models import DatoreLavoro
+from server.common.audit import (
+    ContestoAuditMiddleware,
+    autore,
+    get_current_user,
+    impersonate,
+    nel_contesto,
+    nome_esteso,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def operatore():
+    """Utente che firma le modifiche."""
+    return CustomUser.objects.create_user(
+        'operatore@aslcn1.it', first_name='Mario', last_name='Rossi'
+    )
+
+
+def test_name_is_resolved_once_per_context(operatore):
+    """Più salvataggi nello stesso contesto calcolano il nome una volta."""
+    with (
+        patch('server.common.audit.nome_esteso', wraps=nome_esteso) as risolto,
+        impersonate(operatore),
+    ):
+        datori = [
+            DatoreLavoro.objects.create(ragione_sociale=f'Datore {index}')
+            for index in range(3)
+        ]
+        datori[0].save()
+
+    risolto.assert_called_once_with(operatore)
+    assert {datore.updated_by_fullname for datore in datori} == {'Mario Rossi'}
+    assert autore() == (None, '')
+
+
+def test_explicit_user_outside_context(operatore, admin_user):
+    """Un utente diverso da quello del contesto viene risolto a parte."""
+    with impersonate(operatore):
+        assert autore(operatore) == (operatore, 'Mario Rossi')
+        assert autore(admin_user) == (admin_user, admin_user.nome_utente)
+        assert autore(AnonymousUser()) == (None, '')
+
+
+def test_middleware_uses_request_user(rf, operatore):
+    """Durante la richiesta firma l'utente autenticato."""
+
+    def view(request):
+        datore = DatoreLavoro.objects.create(ragione_sociale='Acme')
+        return HttpResponse(datore.created_by_fullname)
+
+    request = rf.get('/')
+    request.user = operatore
+
+    response = ContestoAuditMiddleware(view)(request)
+
+    assert response.content == b'Mario Rossi'
+
+
+def test_middleware_without_user(rf):
+    """Senza ``request.user`` non firma nessuno."""
+
+    def view(request):
+        assert autore() == (None, '')
+        return HttpResponse()
+
+    ContestoAuditMiddleware(view)(rf.get('/'))
+
+
+def test_concurrent_async_requests_keep_their_user(rf, operatore, admin_user):
+    """Richieste ASGI concorrenti vedono ciascuna il proprio utente."""
+
+    async def view(request):
+        # Cede il controllo all'altra richiesta prima e dopo il thread
+        await asyncio.sleep(0.01)
+        firma = await sync_to_async(autore)()
+        await asyncio.sleep(0.01)
+        return firma, get_current_user()
+
+    middleware = ContestoAuditMiddleware(view)
+    requests = [rf.get('/') for _ in range(2)]
+    requests[0].user, requests[1].user = operatore, admin_user
+
+    async def concorrenti():
+        return await asyncio.gather(*map(middleware, requests))
+
+    assert async_to_sync(concorrenti)() == [
+        ((operatore, 'Mario Rossi'), operatore),
+        ((admin_user, admin_user.nome_utente), admin_user),
+    ]
+    assert get_current_user() is None
+
+
+def test_context_reaches_own_threads_and_crum(operatore):
+    """``nel_contesto`` porta l'utente nei thread; crum lo vede."""
+    risultati = {}
+
+    def in_thread(chiave):
+        risultati[chiave] = get_current_user()
+
+    with impersonate(operatore):
+        assert crum.get_current_user() is operatore
+        threads = [
+            threading.Thread(target=nel_contesto(in_thread, 'copiato')),
+            threading.Thread(target=in_thread, args=['nuovo']),
+        ]
+        for thread in threads:
+            thread.start()
+            thread.join()
+
+    assert risultati == {'copiato': operatore, 'nuovo': None}
+    assert crum.get_current_user() is None
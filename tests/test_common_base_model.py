@@ -15,6 +15,7 @@ from django.contrib.auth import get_user_model
 from django.db import connection, models
 from django.test import TestCase
 
+from server.apps.datoriLavoro.models import DatoreLavoro
 from server.common.models import BaseModel
 
 # ----------------------------------------------------------------------
@@ -75,6 +76,7 @@ class TestBaseModel(TestCase):
 
         # Test per i campi della BaseModel
         assert isinstance(obj.id, uuid.UUID)
+        assert obj.id.version == 7  # ordinato per istante di creazione
         assert obj.created_at is not None
         assert obj.updated_at is not None
 
@@ -111,7 +113,7 @@ class TestBaseModel(TestCase):
         user = user_model.objects.create(
             username='testuser', first_name='Test', last_name='User'
         )
-        with patch('server.common.models.get_current_user', return_value=user):
+        with patch('server.common.audit.get_current_user', return_value=user):
             obj = DummyModel()
             obj.save()
             # Il campo created_by potrebbe non essere impostato
@@ -133,7 +135,7 @@ class TestBaseModel(TestCase):
             first_name='Test',
             last_name='User',
         )
-        with patch('server.common.models.get_current_user', return_value=user):
+        with patch('server.common.audit.get_current_user', return_value=user):
             obj = DummyModel()
             obj.save()
             assert obj.created_by == user
@@ -144,7 +146,7 @@ class TestBaseModel(TestCase):
 
     def test_save_with_no_user(self):
         """Test che i campi utente restano None se non c'è utente corrente."""
-        with patch('server.common.models.get_current_user', return_value=None):
+        with patch('server.common.audit.get_current_user', return_value=None):
             obj = DummyModel()
             obj.save()
             assert obj.created_by is None
@@ -159,7 +161,7 @@ class TestBaseModel(TestCase):
             is_anonymous = True
 
         with patch(
-            'server.common.models.get_current_user',
+            'server.common.audit.get_current_user',
             return_value=AnonymousUser(),
         ):
             obj = DummyModel()
@@ -178,8 +180,106 @@ class TestBaseModel(TestCase):
             username='user2',
             email='user2@aslcn1.it',
         )
-        with patch('server.common.models.get_current_user', return_value=user2):
+        with patch('server.common.audit.get_current_user', return_value=user2):
             obj = DummyModel(created_by=user1)
             obj.save()
             assert obj.created_by == user1
             assert obj.updated_by == user2
+
+
+# ----------------------------------------------------------------------
+# 4. Scritture in blocco firmate (BaseQuerySet.audited_*)
+# ----------------------------------------------------------------------
+
+
+@pytest.fixture
+def operatore(django_user_model):
+    """Utente che esegue le scritture in blocco."""
+    return django_user_model.objects.create(
+        username='operatore',
+        email='operatore@aslcn1.it',
+        first_name='Mario',
+        last_name='Rossi',
+    )
+
+
+@pytest.mark.django_db
+def test_audited_bulk_create_stamps_explicit_user(
+    operatore, django_assert_num_queries
+):
+    """L'utente esplicito firma tutte le righe, in una sola INSERT."""
+    with django_assert_num_queries(1):
+        datori = DatoreLavoro.objects.audited_bulk_create(
+            (DatoreLavoro(ragione_sociale=str(index)) for index in range(3)),
+            user=operatore,
+        )
+
+    assert all(datore.version for datore in datori)
+    assert set(
+        DatoreLavoro.objects.values_list(
+            'created_by', 'updated_by', 'updated_by_fullname'
+        )
+    ) == {(operatore.pk, operatore.pk, 'Mario Rossi')}
+
+
+@pytest.mark.django_db
+def test_audited_bulk_create_uses_request_user(operatore, django_user_model):
+    """Senza ``user`` si usa l'utente della richiesta, se presente."""
+    autore = django_user_model.objects.create(
+        username='autore', email='autore@aslcn1.it'
+    )
+    with patch('server.common.audit.get_current_user', return_value=None):
+        (anonimo,) = DatoreLavoro.objects.audited_bulk_create([
+            DatoreLavoro(ragione_sociale='Anonimo')
+        ])
+    with patch('server.common.audit.get_current_user', return_value=operatore):
+        firmato, ripreso = DatoreLavoro.objects.audited_bulk_create([
+            DatoreLavoro(ragione_sociale='Firmato'),
+            DatoreLavoro(ragione_sociale='Ripreso', created_by=autore),
+        ])
+
+    assert anonimo.created_by is None
+    assert firmato.created_by == operatore
+    # Come in save(), un created_by già impostato non viene sovrascritto
+    assert ripreso.created_by == autore
+    assert ripreso.updated_by == operatore
+
+
+@pytest.mark.django_db
+def test_audited_bulk_update_bumps_version(operatore):
+    """``updated_*`` e ``version`` si aggiornano insieme ai campi."""
+    datori = DatoreLavoro.objects.audited_bulk_create([
+        DatoreLavoro(ragione_sociale=str(index)) for index in range(2)
+    ])
+    versions = {datore.pk: datore.version for datore in datori}
+    for datore in datori:
+        datore.ragione_sociale += ' S.p.A.'
+
+    with patch('server.common.audit.get_current_user', return_value=None):
+        DatoreLavoro.objects.audited_bulk_update(datori, ['ragione_sociale'])
+    DatoreLavoro.objects.audited_bulk_update(
+        datori, ('ragione_sociale',), user=operatore
+    )
+
+    for datore in DatoreLavoro.objects.filter(pk__in=versions):
+        assert datore.ragione_sociale.endswith(' S.p.A.')
+        assert datore.version > versions[datore.pk]
+        assert datore.updated_by == operatore
+        assert datore.updated_at > datore.created_at
+
+
+@pytest.mark.django_db
+def test_audited_update_bumps_version(operatore):
+    """``update`` firma le righe e rende obsolete le versioni caricate."""
+    datore = DatoreLavoro.objects.create(ragione_sociale='Acme')
+    with patch('server.common.audit.get_current_user', return_value=None):
+        DatoreLavoro.objects.all().audited_update(is_active=False)
+    updated = DatoreLavoro.objects.filter(pk=datore.pk).audited_update(
+        ragione_sociale='Acme S.p.A.', user=operatore
+    )
+
+    assert updated == 1
+    reloaded = DatoreLavoro.objects.get(pk=datore.pk)
+    assert reloaded.version > datore.version
+    assert reloaded.updated_by_fullname == 'Mario Rossi'
+    assert not reloaded.is_active
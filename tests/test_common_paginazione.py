@@ -0,0 +1,189 @@
+"""Test per conteggi stimati e paginazione keyset (``server.common``)."""
+
+import base64
+
+import pytest
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.auth.models import Permission
+from django.db import connection
+
+from server.admin import custom_admin_site
+from server.apps.datoriLavoro.admin import DatoreLavoroAdmin
+from server.apps.datoriLavoro.models import DatoreLavoro
+from server.common.admin import CURSOR_VAR
+from server.common.paginazione import PaginatorStimato, stima_righe
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def datore_admin():
+    """Admin dei datori con pagine da due righe."""
+    model_admin = DatoreLavoroAdmin(DatoreLavoro, custom_admin_site)
+    model_admin.list_per_page = 2
+    return model_admin
+
+
+@pytest.fixture
+def datori():
+    """Cinque datori, dal più vecchio al più recente."""
+    return [
+        DatoreLavoro.objects.create(ragione_sociale=f'Datore {index}')
+        for index in range(5)
+    ]
+
+
+def _sql(sql, params=()):
+    table = connection.ops.quote_name(DatoreLavoro._meta.db_table)  # noqa: SLF001
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(table=table), params)
+
+
+def _analyze():
+    _sql('ANALYZE {table}')
+
+
+def _mai_analizzata():
+    # Autovacuum può aver già analizzato la tabella: si riporta pg_class
+    # allo stato iniziale (l'UPDATE viene annullato dal rollback del test)
+    _sql("UPDATE pg_class SET reltuples = -1 WHERE oid = '{table}'::regclass")
+
+
+def _changelist(model_admin, admin_user, rf, params=None):
+    request = rf.get('/', params or {})
+    request.user = admin_user
+    return model_admin.get_changelist_instance(request)
+
+
+def _nomi(changelist):
+    return [datore.ragione_sociale for datore in changelist.result_list]
+
+
+def test_estimate_only_for_unfiltered_analyzed_tables(datori, settings):
+    """La stima arriva da ``pg_class`` solo sopra la soglia."""
+    queryset = DatoreLavoro.objects.order_by('pk')
+    _mai_analizzata()
+    assert stima_righe(queryset) is None
+
+    _analyze()
+    assert stima_righe(queryset) == len(datori)
+    assert stima_righe(queryset.filter(ragione_sociale='Datore 1')) is None
+    assert stima_righe(queryset.distinct()) is None
+
+    settings.ADMIN_ESTIMATED_COUNT_THRESHOLD = len(datori)
+    assert PaginatorStimato(queryset, 2).stima is None
+
+    settings.ADMIN_ESTIMATED_COUNT_THRESHOLD = 1
+    DatoreLavoro.objects.create(ragione_sociale='Non ancora analizzato')
+    paginator = PaginatorStimato(queryset, 2)
+    assert paginator.stima == len(datori)
+    assert paginator.count == len(datori)
+
+
+def test_estimate_active_rows_from_partial_index(
+    rf, admin_user, datore_admin, datori, settings
+):
+    """La lista predefinita delle righe attive stima dall'indice parziale."""
+    DatoreLavoro.objects.filter(pk=datori[0].pk).update(is_active=False)
+    attivi = DatoreLavoro.objects.filter(is_active=True)
+    _mai_analizzata()
+    assert stima_righe(attivi) is None
+
+    _analyze()
+    assert stima_righe(attivi) == len(datori) - 1
+    assert stima_righe(attivi.filter(ragione_sociale='Datore 1')) is None
+    assert stima_righe(DatoreLavoro.objects.filter(is_active=False)) is None
+
+    settings.ADMIN_ESTIMATED_COUNT_THRESHOLD = 1
+    DatoreLavoro.objects.create(ragione_sociale='Non ancora analizzato')
+    changelist = _changelist(datore_admin, admin_user, rf)
+    assert changelist.paginator.stima == len(datori) - 1
+
+
+def test_keyset_walks_forward_and_back(rf, admin_user, datore_admin, datori):
+    """Avanti e indietro per cursore si vedono tutte le righe, in ordine."""
+    changelist = _changelist(datore_admin, admin_user, rf)
+    assert changelist.keyset
+    assert changelist.result_count == len(datori)
+    assert changelist.url_precedente is None
+
+    pagine = [_nomi(changelist)]
+    while changelist.url_successiva:
+        cursor = changelist.url_successiva.split(f'{CURSOR_VAR}=')[1]
+        changelist = _changelist(
+            datore_admin, admin_user, rf, {CURSOR_VAR: cursor}
+        )
+        pagine.append(_nomi(changelist))
+    assert pagine == [
+        ['Datore 4', 'Datore 3'],
+        ['Datore 2', 'Datore 1'],
+        ['Datore 0'],
+    ]
+    assert changelist.url_prima == '?'
+
+    cursor = changelist.url_precedente.split(f'{CURSOR_VAR}=')[1]
+    changelist = _changelist(datore_admin, admin_user, rf, {CURSOR_VAR: cursor})
+    assert _nomi(changelist) == ['Datore 2', 'Datore 1']
+    assert changelist.url_successiva
+    assert changelist.url_precedente
+
+
+def test_links_drop_the_cursor(rf, admin_user, datore_admin, datori):
+    """Filtri e ordinamenti ripartono dalla prima pagina."""
+    first = _changelist(datore_admin, admin_user, rf)
+    cursor = first.url_successiva.split(f'{CURSOR_VAR}=')[1]
+
+    changelist = _changelist(datore_admin, admin_user, rf, {CURSOR_VAR: cursor})
+
+    assert CURSOR_VAR not in changelist.get_query_string({'o': '1'})
+
+
+@pytest.mark.parametrize(
+    'cursor',
+    [
+        'xyz',
+        base64.urlsafe_b64encode(b'[false,["2026-01-01"]]').decode(),
+        base64.urlsafe_b64encode(b'[false,["ieri","x"]]').decode(),
+    ],
+)
+def test_invalid_cursor(rf, admin_user, datore_admin, datori, cursor):
+    """Un cursore manomesso è un parametro di lookup non valido."""
+    with pytest.raises(IncorrectLookupParameters):
+        _changelist(datore_admin, admin_user, rf, {CURSOR_VAR: cursor})
+
+
+def test_column_ordering_uses_numbered_pages(
+    rf, admin_user, datore_admin, datori
+):
+    """Ordinando per colonna si torna alla paginazione con ``OFFSET``."""
+    changelist = _changelist(datore_admin, admin_user, rf, {'o': '1'})
+
+    assert not changelist.keyset
+    assert changelist.multi_page
+    assert _nomi(changelist) == ['Datore 0', 'Datore 1']
+
+
+def test_changelist_renders_keyset_pagination(
+    rf, admin_user, datore_admin, datori
+):
+    """Il template mostra i link per cursore al posto dei numeri."""
+    request = rf.get('/')
+    request.user = admin_user
+
+    response = datore_admin.changelist_view(request)
+    response.render()
+
+    assert f'?{CURSOR_VAR}=' in response.content.decode()
+
+
+def test_permissions_use_keyset_pagination(rf, admin_user):
+    """I permessi sono paginati per chiave, qualunque sia il loro numero."""
+    model_admin = custom_admin_site.get_model_admin(Permission)
+    request = rf.get('/')
+    request.user = admin_user
+    primi = list(Permission.objects.order_by('content_type', 'codename')[:3])
+
+    changelist = model_admin.get_changelist_instance(request)
+
+    assert changelist.keyset
+    assert list(changelist.result_list[:3]) == primi
@@ -0,0 +1,136 @@
+"""Test per la ricerca admin con indici trigram (``server.common``)."""
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from server.admin import custom_admin_site
+from server.apps.datoriLavoro.admin import DatoreLavoroAdmin, SedeAdmin
+from server.apps.datoriLavoro.models import DatoreLavoro, Sede
+from server.apps.main.models import CityProxy, CountryProxy, RegionProxy
+from server.common.admin import SEARCH_RANK
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def datore_admin():
+    """Admin dei datori di lavoro registrato sul sito personalizzato."""
+    return DatoreLavoroAdmin(DatoreLavoro, custom_admin_site)
+
+
+@pytest.fixture
+def datori():
+    """Datori con nomi accentati e simili tra loro."""
+    for nome in (
+        'Società Cooperativa Forlì',
+        'Forli Trasporti',
+        'Pasticceria Forlimpopoli',
+        'Acme',
+    ):
+        DatoreLavoro.objects.create(ragione_sociale=nome)
+
+
+def _nomi(queryset):
+    return list(queryset.values_list('ragione_sociale', flat=True))
+
+
+def test_search_is_case_and_accent_insensitive(rf, datore_admin, datori):
+    """``forli`` trova anche ``Forlì`` e ``FORLI``."""
+    queryset, may_have_duplicates = datore_admin.get_search_results(
+        rf.get('/'), DatoreLavoro.objects.all(), 'FORLI'
+    )
+
+    assert not may_have_duplicates
+    assert set(_nomi(queryset)) == {
+        'Società Cooperativa Forlì',
+        'Forli Trasporti',
+        'Pasticceria Forlimpopoli',
+    }
+    # La parola intera è più pertinente del prefisso di un'altra parola
+    assert _nomi(queryset)[-1] == 'Pasticceria Forlimpopoli'
+
+
+def test_every_word_must_match(rf, datore_admin, datori):
+    """Come nella ricerca standard, tutte le parole devono comparire."""
+    queryset, _ = datore_admin.get_search_results(
+        rf.get('/'), DatoreLavoro.objects.all(), 'societa "forlì"'
+    )
+
+    assert _nomi(queryset) == ['Società Cooperativa Forlì']
+
+
+def test_search_uses_indexed_expression(rf, datore_admin, datori):
+    """Il filtro usa la stessa espressione degli indici GIN."""
+    queryset, _ = datore_admin.get_search_results(
+        rf.get('/'), DatoreLavoro.objects.all(), 'acme'
+    )
+    with CaptureQueriesContext(connection) as queries:
+        list(queryset)
+
+    sql = queries[0]['sql']
+    assert (
+        'LOWER(f_unaccent("datoriLavoro_datorelavoro"."ragione_sociale"))'
+        in (sql)
+    )
+    assert 'LIKE' in sql
+
+
+def test_related_fields_use_subquery(rf):
+    """``citta__name`` viene cercato con una subquery sulle città."""
+    country = CountryProxy.objects.create(
+        name='Italia', code2='IT', code3='ITA', slug='italia'
+    )
+    region = RegionProxy.objects.create(
+        name='Veneto', country=country, slug='veneto'
+    )
+    city = CityProxy.objects.create(
+        name='San Donà di Piave', region=region, country=country, slug='sdp'
+    )
+    Sede.objects.create(nome='Magazzino', citta=city)
+    Sede.objects.create(nome='Sede Donà', indirizzo='Via Roma', citta=city)
+    sede_admin = SedeAdmin(Sede, custom_admin_site)
+
+    queryset, _ = sede_admin.get_search_results(
+        rf.get('/'), Sede.objects.all(), 'dona'
+    )
+
+    assert queryset.count() == 2
+    assert 'IN (SELECT' in str(queryset.query)
+
+
+def test_changelist_orders_by_rank(rf, admin_user, datore_admin, datori):
+    """Nella lista i risultati più pertinenti vengono per primi."""
+    request = rf.get('/', {'q': 'forli'})
+    request.user = admin_user
+
+    changelist = datore_admin.get_changelist_instance(request)
+
+    assert changelist.queryset.query.order_by[0] == f'-{SEARCH_RANK}'
+    assert changelist.result_count == 3
+
+
+def test_changelist_user_ordering_wins(rf, admin_user, datore_admin, datori):
+    """Se l'utente ordina per colonna la pertinenza viene ignorata."""
+    request = rf.get('/', {'q': 'forli', 'o': '1'})
+    request.user = admin_user
+
+    changelist = datore_admin.get_changelist_instance(request)
+
+    assert f'-{SEARCH_RANK}' not in changelist.queryset.query.order_by
+    assert _nomi(changelist.queryset)[0] == 'Forli Trasporti'
+
+
+def test_fallback_to_default_search(rf, datore_admin, datori, settings):
+    """Con la ricerca trigram disattivata si usa quella di Django."""
+    settings.ADMIN_TRIGRAM_SEARCH = False
+
+    queryset, _ = datore_admin.get_search_results(
+        rf.get('/'), DatoreLavoro.objects.all(), 'forli'
+    )
+
+    assert SEARCH_RANK not in queryset.query.annotations
+    assert set(_nomi(queryset)) == {
+        'Forli Trasporti',
+        'Pasticceria Forlimpopoli',
+    }
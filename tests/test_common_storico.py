@@ -0,0 +1,177 @@
+"""Test per lo storico delle modifiche dei ``BaseModel``."""
+
+import datetime as dt
+
+import pytest
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from server.admin import custom_admin_site
+from server.apps.datoriLavoro.models import DatoreLavoro
+from server.common.audit import impersonate
+from server.common.models import AzioneStorico, StoricoModifica
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def commit(django_capture_on_commit_callbacks):
+    """Esegue le callback ``on_commit`` all'uscita del blocco."""
+    return lambda: django_capture_on_commit_callbacks(execute=True)
+
+
+def test_save_records_changed_fields(commit):
+    """Creazione e modifica registrano solo i campi cambiati."""
+    with commit():
+        datore = DatoreLavoro.objects.create(ragione_sociale='Acme')
+    creata = datore.version
+    with commit():
+        datore = DatoreLavoro.objects.get(pk=datore.pk)
+        datore.ragione_sociale = 'Acme S.p.A.'
+        datore.save()
+        modificata = datore.version
+        datore.save()
+
+    modifica, creazione = StoricoModifica.objects.per_oggetto(datore)
+    assert creazione.azione == AzioneStorico.CREAZIONE
+    assert creazione.versione_precedente is None
+    assert creazione.modifiche['ragione_sociale'] == [None, 'Acme']
+    assert 'version' not in creazione.modifiche
+    assert modifica.azione == AzioneStorico.MODIFICA
+    assert modifica.modifiche == {'ragione_sociale': ['Acme', 'Acme S.p.A.']}
+    assert modifica.versione_precedente == creata
+    assert modifica.versione == modificata
+    assert str(modifica) == f'modifica {datore.pk}'
+
+
+def test_update_fields_and_deferred_fields(commit):
+    """Si confrontano solo i campi salvati e caricati."""
+    with commit():
+        datore = DatoreLavoro.objects.create(ragione_sociale='Acme')
+    with commit():
+        datore = DatoreLavoro.objects.only('ragione_sociale').get(pk=datore.pk)
+        datore.ragione_sociale = 'Beta'
+        datore.codice_fiscale = 'non salvato'
+        datore.save(update_fields=['ragione_sociale'])
+
+    modifica, _creazione = StoricoModifica.objects.per_oggetto(datore)
+    assert modifica.modifiche == {'ragione_sociale': ['Acme', 'Beta']}
+
+
+def test_records_acting_user(commit, admin_user):
+    """La riga di storico è firmata dall'utente corrente."""
+    with commit(), impersonate(admin_user):
+        datore = DatoreLavoro.objects.create(ragione_sociale='Acme')
+
+    (creazione,) = StoricoModifica.objects.per_oggetto(datore)
+    assert creazione.utente == admin_user
+    assert creazione.utente_fullname == datore.created_by_fullname
+
+
+def _crea_e_annulla():
+    with transaction.atomic():
+        DatoreLavoro.objects.create(ragione_sociale='Annullato')
+        raise RuntimeError
+
+
+def test_rolled_back_changes_are_not_recorded(commit):
+    """Un savepoint annullato non lascia righe di storico."""
+    with commit():
+        with pytest.raises(RuntimeError):
+            _crea_e_annulla()
+        DatoreLavoro.objects.create(ragione_sociale='Confermato')
+
+    (voce,) = StoricoModifica.objects.all()
+    assert voce.modifiche['ragione_sociale'] == [None, 'Confermato']
+
+
+def _insert_storico(queries):
+    return [
+        query
+        for query in queries.captured_queries
+        if query['sql'].startswith('INSERT INTO "common_storicomodifica"')
+    ]
+
+
+def test_transaction_rows_are_written_together_at_commit(commit):
+    """Le righe di una transazione si scrivono in blocco al commit."""
+    with CaptureQueriesContext(connection) as queries:
+        with commit():
+            DatoreLavoro.objects.create(ragione_sociale='Uno')
+            with transaction.atomic():
+                DatoreLavoro.objects.create(ragione_sociale='Due')
+            DatoreLavoro.objects.create(ragione_sociale='Tre')
+            assert not StoricoModifica.objects.exists()
+        assert StoricoModifica.objects.count() == 3
+        # Un lotto per la transazione e uno per il savepoint
+        assert len(_insert_storico(queries)) == 2
+
+        with commit():
+            DatoreLavoro.objects.create(ragione_sociale='Quattro')
+
+    assert len(_insert_storico(queries)) == 3
+    assert StoricoModifica.objects.count() == 4
+
+
+@pytest.mark.django_db(transaction=True)
+def test_autocommit_rows_are_written_immediately():
+    """Fuori da una transazione la riga si scrive con il salvataggio."""
+    datore = DatoreLavoro.objects.create(ragione_sociale='Acme')
+
+    assert StoricoModifica.objects.per_oggetto(datore).count() == 1
+
+
+def test_query_by_time_window(commit):
+    """``nel_periodo`` filtra per istante di registrazione."""
+    with commit():
+        datore = DatoreLavoro.objects.create(ragione_sociale='Acme')
+    registrata_at = StoricoModifica.objects.get().registrata_at
+    storico = StoricoModifica.objects.per_oggetto(datore)
+
+    assert storico.nel_periodo(inizio=registrata_at).count() == 1
+    assert not storico.nel_periodo(fine=registrata_at).exists()
+    assert storico.nel_periodo().count() == 1
+
+
+def test_partitions_take_rows_from_default(capsys):
+    """Una partizione nuova si prende le righe del mese dalla DEFAULT."""
+    datore = DatoreLavoro.objects.create(ragione_sociale='Acme')
+    futura = dt.datetime(2099, 1, 15, tzinfo=dt.UTC)
+    voce = StoricoModifica.objects.create(
+        registrata_at=futura,
+        content_type=ContentType.objects.get_for_model(datore),
+        object_id=datore.pk,
+        azione=AzioneStorico.MODIFICA,
+        versione=datore.version,
+        modifiche={},
+    )
+
+    call_command('crea_partizioni_storico', '--months', '1')
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT storico_crea_partizione('2099-01-01')")
+        cursor.execute(
+            'SELECT tableoid::regclass::text FROM common_storicomodifica '
+            'WHERE id = %s',
+            [voce.pk],
+        )
+        (partizione,) = cursor.fetchone()
+
+    assert partizione == 'common_storicomodifica_209901'
+    assert f'{timezone.localdate():%Y-%m}: ' in capsys.readouterr().out
+
+
+def test_admin_is_read_only(admin_user, commit, rf):
+    """Dall'admin lo storico non si aggiunge, modifica o elimina."""
+    with commit():
+        DatoreLavoro.objects.create(ragione_sociale='Acme')
+    voce = StoricoModifica.objects.get()
+    request = rf.get('/')
+    request.user = admin_user
+    model_admin = custom_admin_site.get_model_admin(StoricoModifica)
+
+    assert not model_admin.has_add_permission(request)
+    assert not model_admin.has_change_permission(request, voce)
+    assert not model_admin.has_delete_permission(request, voce)
@@ -7,6 +7,7 @@ import contextlib
 import importlib
 import sys
 from http import HTTPStatus
+from unittest.mock import patch
 
 import pytest
 from axes.models import AccessAttempt, AccessFailureLog, AccessLog
@@ -16,9 +17,11 @@ from django.contrib.admin import AdminSite
 from django.contrib.admin.models import LogEntry
 from django.contrib.admin.sites import all_sites
 from django.contrib.auth.models import Group
+from django.db import connection
 from django.db.models import Model
 from django.http import HttpRequest
 from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 import server.admin as admin_mod
@@ -26,7 +29,9 @@ import server.settings.environments.development as dev_settings
 from server.admin import CustomAdminSite
 from server.apps.accounts.admin import CustomUserAdmin
 from server.apps.accounts.models import CustomUser
-from server.apps.main.models import DummyModel
+from server.apps.datoriLavoro.models import VerificaPartitaIva
+from server.apps.main.models import DummyModel, LocalizzazioneGeo
+from server.common.models import StoricoModifica
 from server.settings.components.common import AUTHORIZED_APPS
 
 # Models that should have restricted (FORBIDDEN) admin add pages
@@ -34,6 +39,12 @@ _RESTRICTED_ADMIN_ADD_MODELS = frozenset([
     AccessAttempt,
     AccessLog,
     AccessFailureLog,
+    # La coda di verifica VIES viene alimentata solo dai salvataggi
+    VerificaPartitaIva,
+    # Le esecuzioni le registra solo translate_italian_regions
+    LocalizzazioneGeo,
+    # Lo storico delle modifiche viene scritto solo da BaseModel.save()
+    StoricoModifica,
 ])
 
 # Models from cities_light that are NOT registered in custom_admin_site
@@ -317,6 +328,90 @@ def test_custom_admin_get_app_list_branch_else(monkeypatch, db):
     assert len(app_list) <= len(AUTHORIZED_APPS)
 
 
+def _richiesta_admin(user):
+    request = RequestFactory().get('/admin/')
+    request.user = CustomUser.objects.get(pk=user.pk)
+    return request
+
+
+def _query_gruppi(site, request, app_label=None):
+    with CaptureQueriesContext(connection) as queries:
+        app_list = site.get_app_list(request, app_label)
+    gruppi = [q for q in queries.captured_queries if 'auth_group' in q['sql']]
+    return app_list, gruppi
+
+
+@pytest.fixture
+def cache_permessi_condivisa(settings, tmp_path):
+    """La cache dei permessi vista da tutti i processi (su file)."""
+    settings.CACHES = {
+        **settings.CACHES,
+        'permessi': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(tmp_path / 'permessi'),
+        },
+    }
+    settings.PERMISSIONS_CACHE_ALIAS = 'permessi'
+
+
+@pytest.mark.usefixtures('cache_permessi_condivisa')
+def test_custom_admin_get_app_list_cached(monkeypatch, db):
+    """La lista si calcola una volta e si ricalcola se cambiano i gruppi."""
+    monkeypatch.setattr(
+        'django.conf.settings.FULL_ACCESS_GROUP_NAME', 'FullAccess'
+    )
+    user = CustomUser.objects.create_superuser(
+        email='cached@aslcn1.it', password='pass'
+    )
+    site = admin_mod.custom_admin_site
+
+    limitata, gruppi = _query_gruppi(site, _richiesta_admin(user))
+    assert gruppi
+    assert all(app['app_label'] in AUTHORIZED_APPS for app in limitata)
+
+    # Nuova richiesta: appartenenza dalla cache, nessuna query sui gruppi
+    request = _richiesta_admin(user)
+    app_list, gruppi = _query_gruppi(site, request)
+    assert app_list == limitata
+    assert not gruppi
+    # Stessa richiesta (menu di jazzmin): la lista non viene ricalcolata
+    with patch.object(admin.AdminSite, 'get_app_list') as ricalcolo:
+        assert site.get_app_list(request) is app_list
+    ricalcolo.assert_not_called()
+
+    user.groups.add(Group.objects.create(name='FullAccess'))
+    completa, gruppi = _query_gruppi(site, _richiesta_admin(user))
+    assert gruppi
+    assert len(completa) > len(limitata)
+
+    sola, _ = _query_gruppi(site, _richiesta_admin(user), 'accounts')
+    assert [app['app_label'] for app in sola] == ['accounts']
+
+
+def test_custom_admin_full_access_without_shared_cache(monkeypatch, db):
+    """Con una cache del processo l'appartenenza si legge dal database.
+
+    Una revoca salvata da un altro worker vale subito.
+    """
+    monkeypatch.setattr(
+        'django.conf.settings.FULL_ACCESS_GROUP_NAME', 'FullAccess'
+    )
+    user = CustomUser.objects.create_superuser(
+        email='locale@aslcn1.it', password='pass'
+    )
+    user.groups.add(Group.objects.create(name='FullAccess'))
+    site = admin_mod.custom_admin_site
+    completa, gruppi = _query_gruppi(site, _richiesta_admin(user))
+    assert gruppi
+
+    # Revoca senza i segnali, come se arrivasse da un altro processo
+    user.groups.through.objects.filter(customuser=user).delete()
+    limitata, gruppi = _query_gruppi(site, _richiesta_admin(user))
+
+    assert gruppi
+    assert len(limitata) < len(completa)
+
+
 def test_admin_axes_importerror(monkeypatch):
     """Coprire il branch except ImportError in admin.py."""
     """Testa che il ramo except ImportError venga coperto.
@@ -509,7 +604,7 @@ def test_region_filter_queryset_with_value():
     region_value = str(milano.region_id)
     # Test filter with resolved region id
     region_filter = RegionFilter(
-        request, {'region': region_value}, CityProxy, city_admin
+        request, {'region': [region_value]}, CityProxy, city_admin
     )
     # Use admin queryset and scope to created country for consistency
     base_qs = city_admin.get_queryset(request).filter(country=country)
@@ -0,0 +1,103 @@
+"""Tests for the city autocomplete endpoint of the admin site."""
+
+import pytest
+from django.contrib.auth.models import Permission
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from server.admin import CittaAutocompleteSelect, custom_admin_site
+from server.apps.accounts.models import CustomUser
+from server.apps.datoriLavoro.models import Sede
+from server.apps.main.models import CityProxy, CountryProxy
+
+pytestmark = pytest.mark.django_db
+
+_SEDE_CITTA = {
+    'app_label': 'datoriLavoro',
+    'model_name': 'sede',
+    'field_name': 'citta',
+}
+
+
+@pytest.fixture
+def citta():
+    """Two Italian cities with different populations."""
+    country = CountryProxy.objects.create(
+        name='Italia', code2='IT', code3='ITA', slug='italia'
+    )
+    for name, population in (('Torino', 850000), ('Torre Pellice', 4500)):
+        CityProxy.objects.create(
+            name=name,
+            slug=name.lower().replace(' ', '-'),
+            country=country,
+            display_name=f'{name}, Italia',
+            population=population,
+        )
+
+
+def _get(client, **params):
+    return client.get(reverse('custom_admin:autocomplete_citta'), params)
+
+
+def test_autocomplete_returns_ranked_cities(admin_client, citta):
+    """Cities come from the in-memory index in select2 format."""
+    response = _get(admin_client, term='TOR', page='x', **_SEDE_CITTA)
+
+    assert response.status_code == 200
+    ids = dict(CityProxy.objects.values_list('name', 'id'))
+    assert response.json() == {
+        'results': [
+            {'id': str(ids['Torino']), 'text': 'Torino, Italia'},
+            {'id': str(ids['Torre Pellice']), 'text': 'Torre Pellice, Italia'},
+        ],
+        'pagination': {'more': False},
+    }
+    # Built once, the index answers without reading the cities
+    with CaptureQueriesContext(connection) as queries:
+        _get(admin_client, term='torr', **_SEDE_CITTA)
+    assert not [query for query in queries if 'cities_light' in query['sql']]
+    assert not _get(admin_client, term='tor', page='2', **_SEDE_CITTA).json()[
+        'results'
+    ]
+
+
+def test_autocomplete_only_for_city_fields(admin_client, citta):
+    """Fields that are not cities are refused."""
+    response = _get(admin_client, **{**_SEDE_CITTA, 'field_name': 'nome'})
+    assert response.status_code == 403
+    response = _get(
+        admin_client,
+        app_label='datoriLavoro',
+        model_name='datorelavorosede',
+        field_name='sede',
+    )
+    assert response.status_code == 403
+
+
+def test_autocomplete_permissions(client, citta):
+    """Viewing the source model is enough; no permission is refused."""
+    user = CustomUser.objects.create_user('sedi@aslcn1.it')
+    client.force_login(user)
+    assert _get(client, term='tor', **_SEDE_CITTA).status_code == 403
+
+    user.user_permissions.add(Permission.objects.get(codename='view_sede'))
+    assert _get(client, term='tor', **_SEDE_CITTA).status_code == 200
+
+    response = _get(
+        client, term='tor', app_label='auth', model_name='user', field_name='x'
+    )
+    assert response.status_code == 403
+
+
+def test_sede_form_uses_the_city_autocomplete(admin_user):
+    """The city of a Sede is chosen through the autocomplete endpoint."""
+    request = RequestFactory().get('/')
+    request.user = admin_user
+    model_admin = custom_admin_site.get_model_admin(Sede)
+
+    widget = model_admin.get_form(request).base_fields['citta'].widget.widget
+
+    assert isinstance(widget, CittaAutocompleteSelect)
+    assert widget.get_url() == reverse('custom_admin:autocomplete_citta')
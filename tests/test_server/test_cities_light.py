@@ -1,13 +1,21 @@
 """Tests for django-cities-light management commands."""
 
 from io import StringIO
-from unittest.mock import patch
 
 import pytest
-from cities_light.models import Region
 from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
-from server.apps.main.models import CityProxy, CountryProxy, RegionProxy
+from server.apps.main.management.commands.translate_italian_regions import (
+    Command,
+)
+from server.apps.main.models import (
+    CityProxy,
+    CountryProxy,
+    LocalizzazioneGeo,
+    RegionProxy,
+)
 
 
 @pytest.mark.django_db
@@ -74,35 +82,28 @@ def test_translate_italian_regions_region_not_found():
 
 
 @pytest.mark.django_db
-def test_translate_italian_regions_multiple_regions():
-    """Test handling of MultipleObjectsReturned exception.
-
-    Note: This test uses unittest.mock to simulate the rare case where
-    multiple regions with the same name exist, since the database constraint
-    prevents creating actual duplicates.
-    """
-    # Create Italy and a region
+def test_translate_italian_regions_single_region_update():
+    """Test that all regions are renamed by a single UPDATE statement."""
     country = CountryProxy.objects.create(
         name='Italy', code2='IT', code3='ITA', slug='italy'
     )
-    RegionProxy.objects.create(
-        name='The Marches', country=country, slug='marches'
-    )
-
-    # Mock to simulate MultipleObjectsReturned for only The Marches
-    original_get = Region.objects.get
-
-    def mock_get(*args, **kwargs):
-        if kwargs.get('name') == 'The Marches':
-            raise Region.MultipleObjectsReturned
-        return original_get(*args, **kwargs)
+    for name in ('The Marches', 'Piedmont', 'Apulia'):
+        RegionProxy.objects.create(
+            name=name, country=country, slug=name.lower()
+        )
 
-    with patch.object(Region.objects, 'get', side_effect=mock_get):
-        out = StringIO()
-        call_command('translate_italian_regions', stdout=out)
+    with CaptureQueriesContext(connection) as queries:
+        call_command('translate_italian_regions', stdout=StringIO())
 
-        # Should error on multiple regions
-        assert '✗ Multiple regions found: The Marches' in out.getvalue()
+    updates = [
+        query['sql']
+        for query in queries.captured_queries
+        if query['sql'].startswith('UPDATE "cities_light_region"')
+    ]
+    assert len(updates) == 1
+    region = RegionProxy.objects.get(slug='piedmont')
+    assert region.name == 'Piemonte'
+    assert region.display_name == 'Piemonte, Italia'
 
 
 @pytest.mark.django_db
@@ -154,7 +155,7 @@ def test_translate_italian_regions_many_cities_progress():
         )
 
     out = StringIO()
-    call_command('translate_italian_regions', stdout=out)
+    call_command('translate_italian_regions', batch_size=100, stdout=out)
 
     output = out.getvalue()
 
@@ -292,3 +293,171 @@ def test_translate_italian_regions_all_20_regions():
 
     apulia = RegionProxy.objects.get(slug='region-3')
     assert apulia.name == 'Puglia'
+
+
+@pytest.mark.django_db
+def test_translate_italian_regions_updates_only_stale_cities():
+    """Test that only out-of-date display names are rewritten."""
+    country = CountryProxy.objects.create(
+        name='Italia', code2='IT', code3='ITA', slug='italy'
+    )
+    region = RegionProxy.objects.create(
+        name='Piemonte', country=country, slug='piemonte'
+    )
+    CityProxy.objects.create(
+        name='Cuneo',
+        region=region,
+        country=country,
+        slug='cuneo',
+        display_name='Cuneo, Piemonte, Italia',
+    )
+    stale = CityProxy.objects.create(
+        name='Alba', region=region, country=country, slug='alba'
+    )
+    no_region = CityProxy.objects.create(
+        name='Bra', country=country, slug='bra'
+    )
+    CityProxy.objects.filter(pk__in=[stale.pk, no_region.pk]).update(
+        display_name='?'
+    )
+
+    out = StringIO()
+    call_command('translate_italian_regions', stdout=out)
+
+    stale.refresh_from_db()
+    no_region.refresh_from_db()
+    assert stale.display_name == 'Alba, Piemonte, Italia'
+    assert no_region.display_name == 'Bra, Italia'
+    output = out.getvalue()
+    assert 'Updated 2/2 cities' in output
+    assert '2 city display names updated' in output
+    assert '(country ' in output
+
+
+def _localize():
+    out = StringIO()
+    with CaptureQueriesContext(connection) as queries:
+        call_command('translate_italian_regions', stdout=out)
+    # Only the geographic rows: the run record is always completed
+    updates = [
+        query['sql']
+        for query in queries.captured_queries
+        if query['sql'].lstrip().startswith('UPDATE')
+        and 'cities_light_' in query['sql']
+    ]
+    return out.getvalue(), updates
+
+
+@pytest.fixture
+def localized_italy():
+    """Italy with two regions and their cities, localized once."""
+    country = CountryProxy.objects.create(
+        name='Italy', code2='IT', code3='ITA', slug='italy'
+    )
+    regions = [
+        RegionProxy.objects.create(
+            name=name, country=country, slug=name.lower()
+        )
+        # Not in the mapping: only its display name is localized
+        for name in ('Piedmont', 'Lombardy', 'Padania')
+    ]
+    for region, name in zip(regions, ('Cuneo', 'Milano'), strict=False):
+        CityProxy.objects.create(
+            name=name, region=region, country=country, slug=name.lower()
+        )
+    _localize()
+    return regions
+
+
+@pytest.mark.django_db
+def test_translate_italian_regions_is_idempotent(localized_italy):
+    """Test that a second run changes nothing and writes no geo rows."""
+    output, updates = _localize()
+
+    assert not updates
+    assert '0 countries translated' in output
+    assert '0 regions translated' in output
+    assert '0 city display names updated' in output
+    assert 'Region not found: Piedmont' not in output
+    region = RegionProxy.objects.get(slug='piedmont')
+    assert region.alternate_names == 'Piedmont'
+    country = CountryProxy.objects.get(code2='IT')
+    assert country.alternate_names == 'Italy'
+    other = RegionProxy.objects.get(slug='padania')
+    assert (other.name, other.display_name) == ('Padania', 'Padania, Italia')
+    assert LocalizzazioneGeo.objects.count() == 2
+    assert str(LocalizzazioneGeo.objects.latest()).startswith(
+        Command.localization_version()
+    )
+
+
+@pytest.mark.django_db
+def test_translate_italian_regions_after_refresh(localized_italy):
+    """Test that a refresh only costs the cities of renamed regions."""
+    piedmont, lombardy, _ = localized_italy
+    # A geonames refresh brings back the English name of one region
+    RegionProxy.objects.filter(pk=piedmont.pk).update(name='Piedmont')
+    CityProxy.objects.filter(region=piedmont).update(
+        display_name='Cuneo, Piedmont, Italia'
+    )
+    # Not renamed: this region's cities are not checked again
+    CityProxy.objects.filter(region=lombardy).update(display_name='?')
+
+    output, _ = _localize()
+
+    assert '✓ Updated region: Piedmont → Piemonte' in output
+    assert '1 regions translated' in output
+    assert '1 city display names updated' in output
+    assert CityProxy.objects.get(slug='cuneo').display_name == (
+        'Cuneo, Piemonte, Italia'
+    )
+    assert CityProxy.objects.get(slug='milano').display_name == '?'
+
+    # A new localization version checks every city again
+    LocalizzazioneGeo.objects.update(versione='precedente')
+    output, _ = _localize()
+
+    assert '1 city display names updated' in output
+    assert CityProxy.objects.get(slug='milano').display_name == (
+        'Milano, Lombardia, Italia'
+    )
+
+
+class _Interrupt(StringIO):
+    """Command output that stops the run after the first city batch."""
+
+    def write(self, text):
+        if 'Updated 1/' in text:
+            raise KeyboardInterrupt
+        return super().write(text)
+
+
+@pytest.mark.django_db
+def test_translate_italian_regions_interrupted(localized_italy):
+    """Test that committed batches stay and the next run checks all."""
+    piedmont, lombardy, _ = localized_italy
+    RegionProxy.objects.filter(pk=piedmont.pk).update(name='Piedmont')
+    CityProxy.objects.filter(region=piedmont).update(display_name='?')
+    # Not renamed: only a full check fixes this region's cities
+    CityProxy.objects.filter(region=lombardy).update(display_name='?')
+
+    with pytest.raises(KeyboardInterrupt):
+        call_command(
+            'translate_italian_regions', batch_size=1, stdout=_Interrupt()
+        )
+
+    # Regions and the first batch were committed before the interruption
+    assert RegionProxy.objects.get(pk=piedmont.pk).name == 'Piemonte'
+    assert CityProxy.objects.get(slug='cuneo').display_name == (
+        'Cuneo, Piemonte, Italia'
+    )
+    assert LocalizzazioneGeo.objects.latest().completata_at is None
+
+    output, _ = _localize()
+
+    assert '0 regions translated' in output
+    assert '1 city display names updated' in output
+    assert CityProxy.objects.get(slug='milano').display_name == (
+        'Milano, Lombardia, Italia'
+    )
+    assert LocalizzazioneGeo.objects.latest().completata_at is not None
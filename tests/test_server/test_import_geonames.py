@@ -0,0 +1,201 @@
+"""Tests for the offline geonames import command."""
+
+import zipfile
+from io import StringIO
+
+import pytest
+from cities_light.settings import ICity, ICountry, IRegion
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from server.apps.main.models import CityProxy, CountryProxy, RegionProxy
+
+pytestmark = pytest.mark.django_db
+
+
+def _line(size, **fields):
+    """A tab-separated geonames line with ``fields`` at their indexes."""
+    items = [''] * size
+    for index, value in fields.values():
+        items[index] = value
+    return '\t'.join(items) + '\n'
+
+
+def _country(code2, code3, name, geoname_id):
+    return _line(
+        19,
+        code2=(ICountry.code2, code2),
+        code3=(ICountry.code3, code3),
+        name=(ICountry.name, name),
+        continent=(ICountry.continent, 'EU'),
+        tld=(ICountry.tld, f'.{code2.lower()}'),
+        phone=(ICountry.phone, '+39'),
+        geonameid=(ICountry.geonameid, geoname_id),
+    )
+
+
+def _region(code, name, geoname_id):
+    return _line(
+        4,
+        code=(IRegion.code, code),
+        name=(IRegion.name, name),
+        asciiName=(IRegion.asciiName, name),
+        geonameid=(IRegion.geonameid, geoname_id),
+    )
+
+
+def _city(geoname_id, name, country, admin1, **extra):
+    fields = {
+        'geonameid': (ICity.geonameid, geoname_id),
+        'name': (ICity.name, name),
+        'asciiName': (ICity.asciiName, name),
+        'alternateNames': (ICity.alternateNames, f'{name} city'),
+        'latitude': (ICity.latitude, '45.1'),
+        'longitude': (ICity.longitude, '7.6'),
+        'featureCode': (ICity.featureCode, 'PPL'),
+        'countryCode': (ICity.countryCode, country),
+        'admin1Code': (ICity.admin1Code, admin1),
+        'population': (ICity.population, '1000'),
+        'timezone': (ICity.timezone, 'Europe/Rome'),
+    }
+    fields.update(extra)
+    return _line(19, **fields)
+
+
+@pytest.fixture
+def dump(tmp_path):
+    """A small geonames dump: Italy with two regions, and France."""
+    (tmp_path / 'countryInfo.txt').write_text(
+        '# ISO\tISO3\tISO-Numeric\n'
+        + _country('IT', 'ITA', 'Italy', '3175395')
+        + _country('FR', 'FRA', 'France', '3017382')
+        + '\n',
+        encoding='utf-8',
+    )
+    (tmp_path / 'admin1CodesASCII.txt').write_text(
+        _region('IT.09', 'Lombardy', '3174618')
+        + _region('IT.12', 'Piedmont', '3170831')
+        + _region('FR.11', 'Ile-de-France', '3012874'),
+        encoding='utf-8',
+    )
+    cities = (
+        _city('3173435', 'Milano', 'IT', '09')
+        + _city('3165524', 'Torino', 'IT', '12')
+        + _city('3000001', 'Castello', 'IT', '12')
+        + _city('3000002', 'Castello', 'IT', '12')
+        + _city('2988507', 'Paris', 'FR', '11')
+        + _city(
+            '3000003',
+            'Monte Rosa',
+            'IT',
+            '12',
+            featureCode=(ICity.featureCode, 'MT'),
+        )
+    )
+    with zipfile.ZipFile(tmp_path / 'cities500.zip', 'w') as archive:
+        archive.writestr('readme.txt', 'geonames')
+        archive.writestr('cities500.txt', cities)
+    return tmp_path
+
+
+def _run(path, *args):
+    out = StringIO()
+    call_command('import_geonames', str(path), *args, stdout=out)
+    return out.getvalue()
+
+
+def test_import_creates_included_rows(dump):
+    """Only Italian rows and populated places are imported."""
+    output = _run(dump)
+
+    assert 'country: 1 read, 1 inserted, 0 updated' in output
+    assert 'region: 2 read, 2 inserted, 0 updated' in output
+    assert 'city: 4 read, 4 inserted, 0 updated' in output
+    assert '✓ 7 rows in' in output
+    assert 'rows/s): copy' in output
+
+    country = CountryProxy.objects.get()
+    assert (country.code2, country.tld, country.phone) == ('IT', 'it', '39')
+    milano = CityProxy.objects.get(name='Milano')
+    assert milano.region.geoname_code == '09'
+    assert milano.display_name == 'Milano, Lombardy, Italy'
+    assert milano.alternate_names == 'Milano city'
+    assert RegionProxy.objects.get(slug='piedmont').display_name == (
+        'Piedmont, Italy'
+    )
+    # Homonyms in the same region get distinct slugs
+    assert set(
+        CityProxy.objects.filter(name='Castello').values_list('slug', flat=True)
+    ) == {'castello-3000001', 'castello-3000002'}
+
+
+def test_reimport_writes_nothing(dump):
+    """A second run of the same dump neither inserts nor updates."""
+    _run(dump)
+    output = _run(dump)
+
+    assert 'city: 4 read, 0 inserted, 0 updated' in output
+    assert 'region: 2 read, 0 inserted, 0 updated' in output
+
+
+def test_import_keeps_localized_names(dump):
+    """Names localized by translate_italian_regions survive an import."""
+    _run(dump)
+    call_command('translate_italian_regions', stdout=StringIO())
+    (dump / 'cities500.txt').write_text(
+        _city(
+            '3173435',
+            'Milano',
+            'IT',
+            '09',
+            population=(ICity.population, '1400000'),
+        ),
+        encoding='utf-8',
+    )
+
+    output = _run(dump, '--cities', 'cities500.txt')
+
+    assert 'region: 2 read, 0 inserted, 0 updated' in output
+    assert 'city: 1 read, 0 inserted, 1 updated' in output
+    milano = CityProxy.objects.get(name='Milano')
+    assert milano.population == 1400000
+    assert milano.display_name == 'Milano, Lombardia, Italia'
+
+
+def test_import_streams_in_chunks(dump):
+    """Files larger than one COPY chunk are read in several pieces."""
+    (dump / 'cities500.txt').write_text(
+        ''.join(
+            _city(str(4000000 + index), f'Borgo {index}', 'IT', '12')
+            for index in range(300)
+        ),
+        encoding='utf-8',
+    )
+
+    output = _run(dump, '--cities', 'cities500.txt')
+
+    assert 'city: 300 read, 300 inserted, 0 updated' in output
+    assert CityProxy.objects.filter(region__geoname_code='12').count() == 300
+
+
+def test_import_adopts_rows_without_geoname_id(dump):
+    """Countries and regions created by hand are updated, not duplicated."""
+    country = CountryProxy.objects.create(
+        name='Italy', code2='IT', code3='ITA', slug='italy'
+    )
+    RegionProxy.objects.create(
+        name='Lombardy', country=country, slug='lombardy'
+    )
+
+    output = _run(dump)
+
+    assert 'country: 1 read, 0 inserted, 1 updated' in output
+    assert 'region: 2 read, 1 inserted, 1 updated' in output
+    region = RegionProxy.objects.get(name='Lombardy')
+    assert (region.geoname_id, region.geoname_code) == (3174618, '09')
+
+
+def test_import_missing_file(tmp_path):
+    """A missing file stops the command before touching the database."""
+    with pytest.raises(CommandError, match='File not found'):
+        _run(tmp_path)